@@ -0,0 +1,92 @@
+import gzip
+import json
+
+import msgpack
+from fastapi import HTTPException
+from fastapi.responses import Response, StreamingResponse
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is used when it is missing
+    brotli = None
+
+EVENT_FIELDS = (
+    "id", "title", "description", "date", "time", "start_at", "end_at",
+    "recurrence", "location", "address",
+    "lat", "lng", "price", "features", "organiser", "category", "source",
+    "link", "source_link_hash", "content_hash", "created_at",
+)
+FORMATS = ("json", "columnar", "msgpack", "geojsonseq")
+MIN_COMPRESS_BYTES = 1024
+
+
+def parse_fields(fields: str | None) -> list[str] | None:
+    """Validate a comma-separated `fields=` projection; None means every column."""
+    if not fields:
+        return None
+    wanted = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in wanted if f not in EVENT_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return wanted
+
+
+def project(rows: list[dict], fields: list[str] | None) -> list[dict]:
+    if fields is None:
+        return rows
+    return [{f: row.get(f) for f in fields} for row in rows]
+
+
+def _compress(body: bytes, media_type: str, accept_encoding: str | None) -> Response:
+    accepted = {e.split(";")[0].strip() for e in (accept_encoding or "").split(",")}
+    headers = {"Vary": "Accept-Encoding"}
+    if len(body) >= MIN_COMPRESS_BYTES:
+        if brotli is not None and "br" in accepted:
+            body = brotli.compress(body, quality=5)
+            headers["Content-Encoding"] = "br"
+        elif "gzip" in accepted:
+            body = gzip.compress(body, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def _geojsonseq(rows: list[dict]):
+    # RFC 8142: each feature is prefixed with RS and terminated by LF
+    for row in rows:
+        props = {k: v for k, v in row.items() if k not in ("lat", "lng")}
+        feature = {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [row.get("lng"), row.get("lat")]},
+            "properties": props,
+        }
+        yield b"\x1e" + json.dumps(feature, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def encode_events(rows: list[dict], fields: list[str] | None, fmt: str,
+                  accept_encoding: str | None = None) -> Response:
+    """
+    Render event rows in the requested format:
+    - json: list of objects (the default, as before)
+    - columnar: {"count": n, "columns": {field: [values...]}}
+    - msgpack: the json list encoded as MessagePack
+    - geojsonseq: streamed GeoJSON text sequence of point features
+    """
+    if fmt == "geojsonseq":
+        if fields is not None:
+            fields = list(dict.fromkeys(fields + ["lat", "lng"]))
+        return StreamingResponse(_geojsonseq(project(rows, fields)),
+                                 media_type="application/geo+json-seq")
+
+    rows = project(rows, fields)
+    if fmt == "columnar":
+        names = fields or list(dict.fromkeys(k for row in rows for k in row))
+        payload = {"count": len(rows),
+                   "columns": {f: [row.get(f) for row in rows] for f in names}}
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        return _compress(body, "application/json", accept_encoding)
+    if fmt == "msgpack":
+        return _compress(msgpack.packb(rows, use_bin_type=True),
+                         "application/msgpack", accept_encoding)
+    body = json.dumps(rows, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return _compress(body, "application/json", accept_encoding)
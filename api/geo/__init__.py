@@ -0,0 +1,6 @@
+"""
+Geocoding shared by the API and the backend pipeline: the async provider
+chain with its caches (geo.geocoding) and the offline venue gazetteer
+(geo.gazetteer). The API imports it from api/; the backend installs it
+(`pip install -e ../api`, from backend/requirements.txt).
+"""
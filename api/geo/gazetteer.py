@@ -0,0 +1,457 @@
+"""
+Offline venue gazetteer: names, aliases and coordinates of known venues,
+matched locally before any network geocoder is asked.
+
+Build or refresh it from past successful geocodes, plus the hand-checked
+venues in venue_seeds.json, and measure it on location strings it was not
+built from:
+
+    python -m geo.gazetteer build --events ../backend/scrapers/data/normalized_events.json --supabase
+    python -m geo.gazetteer check --events ../backend/scrapers/data/normalized_events.json
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import time
+from collections import Counter, defaultdict
+
+from geo.geocoding import normalize_address
+
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "venues.json")
+# Hand-checked venues; they win over anything derived from past geocodes
+SEED_PATH = os.getenv("GAZETTEER_SEED_PATH") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "venue_seeds.json")
+# Minimum trigram (Dice) similarity for a fuzzy match
+MIN_SCORE = float(os.getenv("GAZETTEER_MIN_SCORE", 0.8))
+# Events within this many decimal places of each other share a venue (~11 m)
+COORD_PRECISION = 4
+MAX_ALIAS_SPREAD = 2
+# Geocodes further than this from the city are wrong-town matches ("Pirie St" in Port Pirie)
+REGION_CENTRE = (-34.9285, 138.6007)
+MAX_DISTANCE_KM = 120
+# A held-out lookup counts as correct within this distance of its recorded geocode
+CHECK_RADIUS_M = 250
+NAMED_VENUES = ("Adelaide Oval", "Her Majesty's Theatre", "Adelaide Festival Centre")
+
+_POSTCODE = re.compile(r"^\d{4}$")
+# Location strings that name no place; the geocoder answers them with a centroid
+_GENERIC = re.compile(r"\b(?:(?:various|multiple|several|many) (?:locations?|venues?|sites?)"
+                      r"|tba|tbc|to be (?:announced|confirmed)|online|virtual|secret location)\b")
+STREET_TYPES = {
+    "st": "street", "rd": "road", "tce": "terrace", "ave": "avenue", "av": "avenue",
+    "dr": "drive", "ln": "lane", "pl": "place", "sq": "square", "hwy": "highway",
+    "pde": "parade", "blvd": "boulevard", "ct": "court", "cres": "crescent",
+}
+_STREET_ADDRESS = re.compile(
+    r"\b(\d+[a-z]?(?: \d+[a-z]?)?) ((?:[a-z]+ ){1,3}?)(%s)\b"
+    % "|".join(sorted({*STREET_TYPES, *STREET_TYPES.values(), "mall", "way"}, key=len, reverse=True)))
+
+
+def venue_key(text: str | None) -> str:
+    """normalize_address without the trailing state/country/postcode noise, street types spelt out."""
+    tokens = [STREET_TYPES.get(t, t) for t in normalize_address(text).split()]
+    while tokens:
+        if tokens[-2:] == ["south", "australia"]:
+            tokens = tokens[:-2]
+        elif tokens[-1] in ("australia", "sa") or _POSTCODE.match(tokens[-1]):
+            tokens.pop()
+        else:
+            break
+    return " ".join(tokens)
+
+
+def is_generic(text: str | None) -> bool:
+    return bool(_GENERIC.search(normalize_address(text)))
+
+
+def is_street(key: str) -> bool:
+    """A key naming only a street ("north terrace"): too long a stretch to stand for a venue."""
+    tokens = key.split()
+    return 1 < len(tokens) <= 4 and tokens[-1] in STREET_TYPES.values() and \
+        tokens[0] != "the" and not any(t[0].isdigit() for t in tokens)  # "The Drive" is a venue
+
+
+def _numbers(key: str) -> frozenset:
+    return frozenset(t for t in key.split() if t[0].isdigit())
+
+
+def street_addresses(text: str | None) -> set[tuple[str, str, str]]:
+    """(number, street, type) for each numbered street address in text."""
+    return {(m[1], m[2].strip(), STREET_TYPES.get(m[3], m[3]))
+            for m in _STREET_ADDRESS.finditer(normalize_address(text))}
+
+
+def _distance_km(a: tuple[float, float], b: tuple[float, float]) -> float:
+    dlat = math.radians(b[0] - a[0])
+    dlng = math.radians(b[1] - a[1]) * math.cos(math.radians((a[0] + b[0]) / 2))
+    return 6371 * math.hypot(dlat, dlng)
+
+
+def _locality_candidate(text: str) -> str | None:
+    """
+    The suburb of an address that ends in a state or postcode ("..., Wayville,
+    SA 5034" -> "wayville"), when it is short and has no street in it.
+    """
+    parts = [p for p in text.split(",") if p.strip()]
+    marked = False  # a state or postcode follows the suburb
+    while parts and not venue_key(parts[-1]):
+        parts.pop()
+        marked = True
+    if not parts:
+        return None
+    tokens = venue_key(parts[-1]).split()
+    marked = marked or len(tokens) < len(normalize_address(parts[-1]).split())
+    if not marked or len(tokens) > 2 or any(
+            t[0].isdigit() or t in STREET_TYPES.values() for t in tokens):
+        return None
+    return " ".join(tokens)
+
+
+def trim_localities(key: str, localities) -> str:
+    """Drop trailing localities from a key: "58 grote street adelaide adelaide" -> "58 grote street"."""
+    trimmed = True
+    while trimmed:
+        trimmed = False
+        for locality in localities:
+            if key.endswith(" " + locality):
+                key = key[:-len(locality) - 1]
+                trimmed = True
+                break
+    return key
+
+
+def _trigrams(key: str) -> set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class Gazetteer:
+    def __init__(self, venues: list[dict], localities=(), min_score: float = MIN_SCORE):
+        self.venues = venues
+        # Suburbs and the city itself, trimmed off the end of keys and never matched alone
+        self.localities = sorted(localities, key=len, reverse=True)
+        self._locality_set = set(localities)
+        self.min_score = min_score
+        self._exact: dict[str, int] = {}
+        self._grams: dict[str, list[int]] = defaultdict(list)
+        # (alias key, trigram count, street numbers, venue)
+        self._keys: list[tuple[str, int, frozenset, int]] = []
+        for i, venue in enumerate(venues):
+            for alias in [venue["name"], *venue.get("aliases", [])]:
+                self._add(self._key(alias), i)
+        # The street address inside an alias ("Lion Arts Factory, 68 North
+        # Terrace") names the venue too, unless a whole alias already uses it
+        for i, venue in enumerate(venues):
+            for alias in [venue["name"], *venue.get("aliases", [])]:
+                for part in alias.split(",")[1:]:
+                    if street_addresses(part):
+                        self._add(self._key(part), i)
+
+    def _add(self, key: str, venue: int) -> None:
+        if not key or key in self._exact or key in self._locality_set or is_street(key):
+            return
+        self._exact[key] = venue
+        grams = _trigrams(key)
+        for g in grams:
+            self._grams[g].append(len(self._keys))
+        self._keys.append((key, len(grams), _numbers(key), venue))
+
+    @classmethod
+    def load(cls, path: str = GAZETTEER_PATH) -> "Gazetteer | None":
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["venues"], data.get("localities", ()))
+
+    def save(self, path: str = GAZETTEER_PATH) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"generated_at": time.time(), "localities": sorted(self._locality_set),
+                       "venues": self.venues}, f, ensure_ascii=False, indent=1)
+
+    def _key(self, text: str | None) -> str:
+        return trim_localities(venue_key(text), self.localities)
+
+    def _fuzzy(self, key: str) -> int | None:
+        grams = _trigrams(key)
+        numbers = _numbers(key)
+        shared = Counter(k for g in grams for k in self._grams.get(g, ()))
+        best, best_score = None, self.min_score
+        for k, n in shared.items():
+            _, count, alias_numbers, venue = self._keys[k]
+            # "68 north terrace" is not "north terrace" or "125 north terrace"
+            if alias_numbers != numbers:
+                continue
+            score = 2 * n / (len(grams) + count)
+            if score >= best_score:
+                best, best_score = venue, score
+        return best
+
+    def lookup(self, address: str | None) -> dict | None:
+        """{"lat", "lng", "venue", "seeded"} for a known venue, or None."""
+        key = self._key(address)
+        if not key or key in self._locality_set or is_street(key) or is_generic(address):
+            return None
+        i = self._exact.get(key)
+        if i is None:
+            i = self._fuzzy(key)
+        if i is None and "," in address:
+            # "Adelaide Oval, War Memorial Dr": the venue name usually leads,
+            # and "Her Majesty's Theatre, 58 Grote St" may only be known by its street
+            for part in address.split(","):
+                part_key = self._key(part)
+                if part_key and part_key not in self._locality_set and not is_street(part_key):
+                    i = self._exact.get(part_key)
+                    if i is not None:
+                        break
+        if i is None:
+            return None
+        venue = self.venues[i]
+        return {"lat": venue["lat"], "lng": venue["lng"], "venue": venue["name"],
+                "seeded": bool(venue.get("seeded"))}
+
+
+def _geocoded_text(ev: dict) -> str:
+    """The string the pipeline geocoded for an event: its address, else its location."""
+    return (ev.get("address") or ev.get("location") or "").strip()
+
+
+def find_localities(events) -> set[str]:
+    """
+    Keys seen at more than MAX_ALIAS_SPREAD places, whether as a whole
+    location ("Adelaide") or as the suburb of an address: localities, not venues.
+    """
+    places = defaultdict(set)
+    for ev in events:
+        if ev.get("lat") is None or ev.get("lng") is None:
+            continue
+        coord = (round(float(ev["lat"]), COORD_PRECISION), round(float(ev["lng"]), COORD_PRECISION))
+        for field in ("location", "address"):
+            text = (ev.get(field) or "").strip()
+            for key in (venue_key(text), _locality_candidate(text)):
+                if key:
+                    places[key].add(coord)
+    return {key for key, coords in places.items() if len(coords) > MAX_ALIAS_SPREAD}
+
+
+def _only_localities(text: str, localities: set[str]) -> bool:
+    """True for "Adelaide SA 5000" or "Various locations, Adelaide": no place finer than a suburb."""
+    keys = [venue_key(_GENERIC.sub(" ", normalize_address(part))) for part in text.split(",")]
+    return all(not key or key in localities for key in keys)
+
+
+def build_venues(events, localities: set[str] | None = None) -> list[dict]:
+    """
+    Group geocoded events by rounded coordinates into venues. Each venue's
+    name is its most common location string; every location and address
+    seen there becomes an alias.
+
+    A group is not a venue when its point is a locality centroid (something
+    geocoded there was only a suburb or "Various locations"), when it holds
+    more than one street address (a centroid the geocoder fell back to for
+    addresses it could not place), or when it lies outside the region.
+    """
+    events = list(events)
+    localities = find_localities(events) if localities is None else localities
+    by_length = sorted(localities, key=len, reverse=True)
+    groups = defaultdict(lambda: {"names": Counter(), "aliases": Counter(), "points": [],
+                                  "queries": set()})
+    dropped = Counter()
+    for ev in events:
+        lat, lng = ev.get("lat"), ev.get("lng")
+        if lat is None or lng is None:
+            continue
+        lat, lng = float(lat), float(lng)
+        if _distance_km(REGION_CENTRE, (lat, lng)) > MAX_DISTANCE_KM:
+            dropped["outside the region"] += 1
+            continue
+        group = groups[(round(lat, COORD_PRECISION), round(lng, COORD_PRECISION))]
+        group["points"].append((lat, lng))
+        group["queries"].add(_geocoded_text(ev))
+        for field in ("location", "address"):
+            text = (ev.get(field) or "").strip()
+            key = trim_localities(venue_key(text), by_length)
+            if key and not is_generic(text) and not is_street(key):
+                group["aliases"][text] += 1
+                if field == "location":
+                    group["names"][text] += 1
+
+    for coord, group in list(groups.items()):
+        if any(q and (is_generic(q) or _only_localities(q, localities)) for q in group["queries"]):
+            reason = "locality centroid"
+        elif len(set().union(*(street_addresses(a) for a in group["aliases"]))) > 1:
+            reason = "several street addresses"
+        else:
+            continue
+        dropped[reason] += len(group["points"])
+        del groups[coord]
+    if dropped:
+        print("Not venues: " + ", ".join(f"{n} events ({reason})" for reason, n in dropped.items()))
+
+    # An alias seen at a couple of venues belongs to the one it was seen at
+    # most; localities are never aliases
+    owner = {}
+    for coord, group in groups.items():
+        for alias, n in group["aliases"].items():
+            key = venue_key(alias)
+            if key not in owner or n > owner[key][1]:
+                owner[key] = (coord, n)
+    for key in localities:
+        owner.pop(key, None)
+
+    venues = []
+    for coord, group in groups.items():
+        aliases = [a for a, _ in group["aliases"].most_common()
+                   if owner.get(venue_key(a), (None,))[0] == coord]
+        if not aliases:
+            continue
+        names = [n for n, _ in group["names"].most_common() if n in aliases]
+        name = names[0] if names else aliases[0]
+        points = group["points"]
+        venues.append({
+            "name": name,
+            "aliases": [a for a in aliases if a != name],
+            "lat": round(sum(p[0] for p in points) / len(points), 7),
+            "lng": round(sum(p[1] for p in points) / len(points), 7),
+            "events": len(points),
+        })
+    venues.sort(key=lambda v: (-v["events"], v["name"]))
+    return venues
+
+
+def load_seeds(path: str = SEED_PATH) -> list[dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["venues"]
+
+
+def build_gazetteer(events, seeds=None) -> Gazetteer:
+    """Seeded venues first, so their names win over anything derived from geocodes."""
+    events = list(events)
+    seeds = load_seeds() if seeds is None else seeds
+    localities = find_localities(events)
+    seeds = [{**seed, "seeded": True} for seed in seeds]
+    return Gazetteer([*seeds, *build_venues(events, localities)], localities)
+
+
+def check(events, holdout: float, names=NAMED_VENUES, seeds=None) -> dict:
+    """
+    Build from all but a `holdout` share of the distinct geocoded strings and
+    look up events with the held-out ones. A hit is correct when it lands
+    within CHECK_RADIUS_M of the event's recorded geocode.
+    """
+    events = [ev for ev in events if ev.get("lat") is not None and ev.get("lng") is not None]
+
+    def held_out(ev):
+        digest = hashlib.sha1(venue_key(_geocoded_text(ev)).encode("utf-8")).digest()
+        return digest[0] < 256 * holdout
+
+    gazetteer = build_gazetteer([ev for ev in events if not held_out(ev)], seeds)
+    result = {"held_out": 0, "hits": 0, "correct": 0, "names": {}}
+    start = time.perf_counter()
+    for ev in events:
+        if not held_out(ev):
+            continue
+        result["held_out"] += 1
+        found = gazetteer.lookup(_geocoded_text(ev))
+        if found is None:
+            continue
+        result["hits"] += 1
+        distance = _distance_km((found["lat"], found["lng"]), (float(ev["lat"]), float(ev["lng"])))
+        if distance * 1000 <= CHECK_RADIUS_M:
+            result["correct"] += 1
+    result["micros_per_lookup"] = (time.perf_counter() - start) * 1e6 / max(1, result["held_out"])
+    for name in names:
+        result["names"][name] = gazetteer.lookup(name)
+    return result
+
+
+def _supabase_events(page_size: int = 1000) -> list[dict]:
+    from supabase import create_client
+
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_SERVICE_KEY") or os.getenv("SUPABASE_ANON_KEY")
+    if not url or not key:
+        raise SystemExit("SUPABASE_URL and SUPABASE_SERVICE_KEY (or SUPABASE_ANON_KEY) are required")
+    sb = create_client(url, key)
+    rows, start = [], 0
+    while True:
+        page = (
+            sb.table("events")
+            .select("location,address,lat,lng")
+            .not_.is_("lat", "null")
+            .not_.is_("lng", "null")
+            .order("id")
+            .range(start, start + page_size - 1)
+            .execute()
+        ).data or []
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        start += page_size
+
+
+def main():
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Build or query the offline venue gazetteer")
+    parser.add_argument("--path", default=GAZETTEER_PATH,
+                        help=f"Gazetteer file (default: {GAZETTEER_PATH})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Rebuild from past geocodes")
+    build.add_argument("--events", action="append", default=[],
+                       help="normalized_events.json file(s) to seed from")
+    build.add_argument("--supabase", action="store_true",
+                       help="Also seed from the Supabase events table")
+    evaluate = sub.add_parser("check", help="Measure hit rate and accuracy on held-out location strings")
+    evaluate.add_argument("--events", action="append", default=[],
+                          help="normalized_events.json file(s) to build and check from")
+    evaluate.add_argument("--supabase", action="store_true",
+                          help="Also use the Supabase events table")
+    evaluate.add_argument("--holdout", type=float, default=0.3,
+                          help="Share of distinct location strings held out (default: 0.3)")
+    evaluate.add_argument("--name", action="append", default=[],
+                          help=f"Venue names to look up as well (default: {', '.join(NAMED_VENUES)})")
+    lookup = sub.add_parser("lookup", help="Match an address against the gazetteer")
+    lookup.add_argument("address")
+    args = parser.parse_args()
+
+    if args.command in ("build", "check"):
+        events = []
+        for path in args.events:
+            with open(path, "r", encoding="utf-8") as f:
+                events.extend(json.load(f))
+        if args.supabase:
+            events.extend(_supabase_events())
+
+    if args.command == "build":
+        gazetteer = build_gazetteer(events)
+        gazetteer.save(args.path)
+        aliases = sum(1 + len(v["aliases"]) for v in gazetteer.venues)
+        print(f"Saved {len(gazetteer.venues)} venues ({aliases} names) from "
+              f"{len(events)} events to {args.path}")
+    elif args.command == "check":
+        result = check(events, args.holdout, args.name or NAMED_VENUES)
+        n = result["held_out"]
+        print(f"Held out {n} events: {result['hits']} hits ({result['hits'] / max(1, n):.0%}), "
+              f"{result['correct']} within {CHECK_RADIUS_M} m of their geocode, "
+              f"{result['micros_per_lookup']:.0f} µs per lookup")
+        for name, found in result["names"].items():
+            print(f"  {name}: {found}")
+    elif args.command == "lookup":
+        gazetteer = Gazetteer.load(args.path)
+        if gazetteer is None:
+            raise SystemExit(f"No gazetteer at {args.path}; run `build` first")
+        start = time.perf_counter()
+        result = gazetteer.lookup(args.address)
+        print(f"{result} ({(time.perf_counter() - start) * 1e6:.0f} µs)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,482 @@
+"""
+Shared geocoder for the API and the backend pipeline.
+
+Lookups go through the hand-checked venues of the offline gazetteer, an
+in-memory LRU, a SQLite cache, the rest of the gazetteer, then a chain of
+providers (OpenCage, Google, Nominatim) tried in order. Each provider has its
+own token-bucket rate limit, 429 backoff and circuit breaker. Concurrent
+lookups of the same address share one upstream request.
+
+All network work runs on the geocoder's own event loop thread, so it can be
+used from plain threads (geocode_sync), from any asyncio loop
+(await geocode) or in bulk (geocode_many).
+"""
+import asyncio
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import unicodedata
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+import httpx
+
+REGION_SUFFIX = ", South Australia"
+CACHE_PATH = os.getenv("GEOCODE_CACHE_PATH") or os.path.join(
+    tempfile.gettempdir(), "mapster_geocode_cache.sqlite3")
+
+# Venues rarely move, so successful lookups are kept for a long time.
+# Misses are retried sooner in case the address was fixed upstream.
+TTL = int(os.getenv("GEOCODE_CACHE_TTL", 90 * 24 * 3600))
+NEGATIVE_TTL = int(os.getenv("GEOCODE_CACHE_NEGATIVE_TTL", 3 * 24 * 3600))
+MEMORY_ENTRIES = 4096
+MAX_RETRIES = 4
+REQUEST_TIMEOUT = 10
+
+NO_RESULT = {"lat": None, "lng": None}
+
+
+def normalize_address(address: str | None) -> str:
+    """Canonical cache key for an address: case, accents, punctuation and spacing folded."""
+    if not address:
+        return ""
+    text = unicodedata.normalize("NFKD", address)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return " ".join(text.split())
+
+
+# ========= CACHES =========
+
+
+class GeocodeCache:
+    """SQLite-backed cache of geocoding results keyed on (provider, normalized address)."""
+
+    def __init__(self, path: str = CACHE_PATH, ttl: int = TTL, negative_ttl: int = NEGATIVE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS geocodes (
+                provider TEXT NOT NULL,
+                key TEXT NOT NULL,
+                address TEXT,
+                lat REAL,
+                lng REAL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (provider, key)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, address: str | None, provider: str = "opencage"):
+        """
+        Return {"lat", "lng"} for a cached address, or None on a miss.
+        A cached negative result comes back with both values set to None.
+        """
+        key = normalize_address(address)
+        if not key:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT lat, lng, expires_at FROM geocodes WHERE provider = ? AND key = ?",
+                (provider, key),
+            ).fetchone()
+        if not row or row[2] < time.time():
+            return None
+        return {"lat": row[0], "lng": row[1]}
+
+    def set(self, address: str | None, lat, lng, provider: str = "opencage") -> None:
+        key = normalize_address(address)
+        if not key:
+            return
+        now = time.time()
+        ttl = self.ttl if lat is not None and lng is not None else self.negative_ttl
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO geocodes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (provider, key, address, lat, lng, now, now + ttl),
+            )
+            self._conn.commit()
+
+    def prune(self, expired_only: bool = True) -> int:
+        """Delete expired entries (or everything) and return the number removed."""
+        with self._lock:
+            if expired_only:
+                cur = self._conn.execute(
+                    "DELETE FROM geocodes WHERE expires_at < ?", (time.time(),))
+            else:
+                cur = self._conn.execute("DELETE FROM geocodes")
+            self._conn.commit()
+            return cur.rowcount
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._lock:
+            total, positive, expired = self._conn.execute(
+                """
+                SELECT COUNT(*),
+                       COALESCE(SUM(lat IS NOT NULL AND lng IS NOT NULL), 0),
+                       COALESCE(SUM(expires_at < ?), 0)
+                FROM geocodes
+                """,
+                (now,),
+            ).fetchone()
+        return {"total": total, "positive": positive,
+                "negative": total - positive, "expired": expired}
+
+    def entries(self, limit: int | None = None, negative_only: bool = False):
+        sql = "SELECT provider, address, lat, lng, created_at, expires_at FROM geocodes"
+        if negative_only:
+            sql += " WHERE lat IS NULL OR lng IS NULL"
+        sql += " ORDER BY created_at DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            return self._conn.execute(sql).fetchall()
+
+
+class MemoryCache:
+    """Small LRU in front of the SQLite cache; entries expire like the disk tier."""
+
+    def __init__(self, max_entries: int = MEMORY_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[dict, float]] = OrderedDict()
+
+    def get(self, key: str) -> dict | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] < time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def set(self, key: str, coords: dict, ttl: float) -> None:
+        self._entries[key] = (coords, time.time() + ttl)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+# ========= PROVIDERS =========
+
+
+class AsyncTokenBucket:
+    """Token bucket for coroutines on a single event loop."""
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    async def acquire(self) -> None:
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and skips the provider for
+    `reset_after` seconds; then lets one trial request through (half-open).
+    """
+
+    def __init__(self, threshold: int = 5, reset_after: float = 60):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if time.monotonic() - self.opened_at >= self.reset_after:
+            self.opened_at = None
+            self.failures = self.threshold - 1  # one more failure re-opens it
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+class ProviderError(Exception):
+    pass
+
+
+class Provider(ABC):
+    """One upstream geocoding API. Subclasses build the request and parse the response."""
+
+    name = ""
+
+    def __init__(self, rate: float):
+        self.bucket = AsyncTokenBucket(rate)
+        self.breaker = CircuitBreaker()
+
+    @abstractmethod
+    def request(self, query: str) -> tuple[str, dict, dict]:
+        """(url, params, headers) for a query."""
+
+    @abstractmethod
+    def parse(self, data) -> dict | None:
+        """Coordinates from a decoded response, None for no match."""
+
+    async def geocode(self, client: httpx.AsyncClient, query: str) -> dict | None:
+        """Coordinates for a query, None if the provider has no match; raises on errors."""
+        url, params, headers = self.request(query)
+        for attempt in range(MAX_RETRIES + 1):
+            await self.bucket.acquire()
+            resp = await client.get(url, params=params, headers=headers)
+            if resp.status_code != 429:
+                if resp.is_error:  # not raise_for_status: its message would include the API key
+                    raise ProviderError(f"{self.name} returned HTTP {resp.status_code}")
+                return self.parse(resp.json())
+            if attempt < MAX_RETRIES:
+                retry_after = resp.headers.get("Retry-After", "")
+                await asyncio.sleep(float(retry_after) if retry_after.isdigit() else 2 ** attempt)
+        raise ProviderError(f"{self.name} rate limited")
+
+
+class OpenCageProvider(Provider):
+    name = "opencage"
+
+    # The free tier allows 1 request/s; set OPENCAGE_RPS to a paid plan's rate
+    def __init__(self, key: str, rate: float = float(os.getenv("OPENCAGE_RPS", 1))):
+        super().__init__(rate)
+        self.key = key
+
+    def request(self, query):
+        return ("https://api.opencagedata.com/geocode/v1/json",
+                {"q": query, "key": self.key, "limit": 1}, {})
+
+    def parse(self, data):
+        if data.get("results"):
+            coords = data["results"][0]["geometry"]
+            return {"lat": coords["lat"], "lng": coords["lng"]}
+        return None
+
+
+class GoogleProvider(Provider):
+    name = "google"
+
+    def __init__(self, key: str, rate: float = float(os.getenv("GOOGLE_GEOCODE_RPS", 25))):
+        super().__init__(rate)
+        self.key = key
+
+    def request(self, query):
+        return ("https://maps.googleapis.com/maps/api/geocode/json",
+                {"address": query, "key": self.key}, {})
+
+    def parse(self, data):
+        if data.get("status") not in ("OK", "ZERO_RESULTS"):
+            raise ProviderError(f"google: {data.get('status')}")
+        if data.get("results"):
+            loc = data["results"][0]["geometry"]["location"]
+            return {"lat": loc["lat"], "lng": loc["lng"]}
+        return None
+
+
+class NominatimProvider(Provider):
+    name = "nominatim"
+
+    def __init__(self, rate: float = 1.0):  # OSM usage policy: max 1 request/s
+        super().__init__(rate)
+
+    def request(self, query):
+        return ("https://nominatim.openstreetmap.org/search",
+                {"q": query, "format": "json", "limit": 1},
+                {"User-Agent": "Mapster.city/1.0 (contact@mapster.city)"})
+
+    def parse(self, data):
+        if data:
+            return {"lat": float(data[0]["lat"]), "lng": float(data[0]["lon"])}
+        return None
+
+
+def make_provider(name: str) -> Provider | None:
+    """Provider by name, configured from the environment; None if its key is missing."""
+    if name == "opencage":
+        key = os.getenv("OPENCAGE_KEY")
+        return OpenCageProvider(key) if key else None
+    if name == "google":
+        key = os.getenv("GOOGLE_API_KEY")
+        return GoogleProvider(key) if key else None
+    if name == "nominatim":
+        return NominatimProvider()
+    raise ValueError(f"Unknown geocoding provider: {name}")
+
+
+# ========= GEOCODER =========
+
+
+class Geocoder:
+    def __init__(self, providers: list[Provider], cache_path: str = CACHE_PATH,
+                 region_suffix: str = REGION_SUFFIX, gazetteer=None):
+        self.providers = providers
+        self.gazetteer = gazetteer
+        # Results depend on the chain, so the disk cache is namespaced by it
+        self.namespace = "+".join(p.name for p in providers) or "none"
+        self.region_suffix = region_suffix
+        self.memory = MemoryCache()
+        self.disk = GeocodeCache(cache_path)
+        self.stats = {"gazetteer_hits": 0, "memory_hits": 0, "disk_hits": 0, "coalesced": 0, "upstream": 0}
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._loop = None
+        self._client = None
+        self._start_lock = threading.Lock()
+
+    # --- event loop plumbing ---
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="geocoder", daemon=True).start()
+                self._loop = loop
+        return self._loop
+
+    def _submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def geocode_sync(self, address: str | None) -> dict:
+        """Blocking lookup, safe to call from any thread."""
+        return self._submit(self._geocode(address)).result()
+
+    async def geocode(self, address: str | None) -> dict:
+        """Awaitable lookup, usable from any event loop."""
+        return await asyncio.wrap_future(self._submit(self._geocode(address)))
+
+    def geocode_many(self, addresses, concurrency: int = 8) -> dict[str, dict]:
+        """Resolve many addresses with bounded concurrency; returns {normalized address: coords}."""
+        distinct = {}
+        for address in addresses:
+            key = normalize_address(address)
+            if key and key not in distinct:
+                distinct[key] = address
+
+        async def run():
+            limit = asyncio.Semaphore(concurrency)
+
+            async def one(address):
+                async with limit:
+                    return await self._geocode(address)
+
+            return await asyncio.gather(*(one(a) for a in distinct.values()))
+
+        return dict(zip(distinct, self._submit(run()).result()))
+
+    # --- lookup (runs on the geocoder loop) ---
+
+    async def _geocode(self, address: str | None) -> dict:
+        key = normalize_address(address)
+        if not key:
+            return dict(NO_RESULT)
+
+        # Hand-checked venues correct past geocodes, so they come first; venues
+        # derived from past geocodes only stand in for a miss
+        venue = self.gazetteer.lookup(address) if self.gazetteer else None
+        if venue is not None and venue["seeded"]:
+            self.stats["gazetteer_hits"] += 1
+            return {"lat": venue["lat"], "lng": venue["lng"]}
+
+        coords, hit = self.memory.get(key), "memory_hits"
+        if coords is None:
+            coords, hit = self.disk.get(address, provider=self.namespace), "disk_hits"
+            if coords is not None:
+                self.memory.set(key, coords, self.disk.ttl if coords["lat"] is not None else self.disk.negative_ttl)
+        # a cached miss still gives way to a derived venue
+        if coords is not None and (coords["lat"] is not None or venue is None):
+            self.stats[hit] += 1
+            return dict(coords)
+        if venue is not None:
+            self.stats["gazetteer_hits"] += 1
+            return {"lat": venue["lat"], "lng": venue["lng"]}
+
+        if key in self._inflight:
+            self.stats["coalesced"] += 1
+            return dict(await asyncio.shield(self._inflight[key]))
+
+        future = asyncio.get_running_loop().create_future()
+        # Retrieve the error even when no other lookup was waiting on it, so
+        # asyncio does not log "Future exception was never retrieved"
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        try:
+            coords, cacheable = await self._resolve(address)
+            if cacheable:
+                self.disk.set(address, coords["lat"], coords["lng"], provider=self.namespace)
+                self.memory.set(key, coords, self.disk.ttl if coords["lat"] is not None else self.disk.negative_ttl)
+            future.set_result(coords)
+            return dict(coords)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _resolve(self, address: str) -> tuple[dict, bool]:
+        """
+        Try each provider in order. Returns (coords, cacheable): a miss is only
+        cacheable when every provider answered; errors are never cached.
+        """
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=REQUEST_TIMEOUT)
+        query = f"{address}{self.region_suffix}"
+        complete = True
+        for provider in self.providers:
+            if not provider.breaker.allow():
+                complete = False
+                continue
+            self.stats["upstream"] += 1
+            try:
+                coords = await provider.geocode(self._client, query)
+            except Exception as e:
+                provider.breaker.record_failure()
+                complete = False
+                print(f"Geocoding via {provider.name} failed for {address}: {e}")
+                continue
+            provider.breaker.record_success()
+            if coords:
+                print(f"Geocoded ({provider.name}): {address[:50]}... -> {coords['lat']:.4f}, {coords['lng']:.4f}")
+                return coords, True
+        return dict(NO_RESULT), complete
+
+
+def build_geocoder(provider_names: str, cache_path: str = CACHE_PATH) -> Geocoder:
+    """
+    Geocoder for a comma-separated provider chain, e.g. "google,nominatim",
+    backed by the venue gazetteer when one has been built.
+    """
+    from geo.gazetteer import Gazetteer  # gazetteer imports normalize_address from here
+
+    providers = []
+    for name in provider_names.split(","):
+        provider = make_provider(name.strip())
+        if provider is None:
+            print(f"Geocoding provider {name.strip()} has no API key configured; skipping")
+            continue
+        providers.append(provider)
+    return Geocoder(providers, cache_path=cache_path, gazetteer=Gazetteer.load())
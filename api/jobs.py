@@ -0,0 +1,76 @@
+import asyncio
+import time
+import uuid
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobQueue:
+    """
+    In-process job queue: `workers` asyncio tasks pull jobs and run the
+    blocking `handler(payload)` in a worker thread, so the event loop stays
+    free. Finished jobs are kept for `ttl` seconds for polling.
+    """
+
+    def __init__(self, handler, workers: int = 2, max_pending: int = 100, ttl: float = 3600):
+        self.handler = handler
+        self.workers = workers
+        self.ttl = ttl
+        self.max_pending = max_pending
+        self.jobs: dict[str, dict] = {}
+        self._queue: asyncio.Queue | None = None
+        self._tasks: list[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, payload) -> dict:
+        self._prune()
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "result": None,
+            "error": None,
+            "created_at": time.time(),
+            "finished_at": None,
+        }
+        try:
+            self._queue.put_nowait((job["id"], payload))
+        except asyncio.QueueFull:
+            raise QueueFull()
+        self.jobs[job["id"]] = job
+        return job
+
+    def get(self, job_id: str) -> dict | None:
+        return self.jobs.get(job_id)
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.ttl
+        for job_id in [j["id"] for j in self.jobs.values()
+                       if j["finished_at"] and j["finished_at"] < cutoff]:
+            del self.jobs[job_id]
+
+    async def _worker(self) -> None:
+        while True:
+            job_id, payload = await self._queue.get()
+            job = self.jobs[job_id]
+            job["status"] = "running"
+            try:
+                job["result"] = await asyncio.to_thread(self.handler, payload)
+                job["status"] = "done"
+            except Exception as e:
+                print(f"Job {job_id} failed: {e}")
+                job["error"] = str(e)
+                job["status"] = "failed"
+            finally:
+                job["finished_at"] = time.time()
+                self._queue.task_done()
@@ -1,16 +1,42 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Query
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Header, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from processor import process_image_with_openai, get_coordinates_from_location
+from processor import (process_image_with_openai, get_coordinates_from_location, get_coordinates_for_locations,
+                       preprocess_image, InvalidImage)
+from spatial import EventIndex, TIME_PRESETS, tile_bounds, time_window
+from mvt import TileCache, encode_tile
+from formats import FORMATS, encode_events, parse_fields, project
+from jobs import JobQueue, QueueFull
+from poster_cache import PosterCache
+from search import SearchIndex
 from supabase import create_client
 from dotenv import load_dotenv
 from openai import OpenAI
+from contextlib import asynccontextmanager
+from datetime import datetime
+import asyncio
 import hashlib
+import io
+import json
 import os
+import zipfile
 
 load_dotenv()
 
-app = FastAPI()
+POSTER_WORKERS = int(os.getenv("POSTER_WORKERS", 2))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 25 * 1024 * 1024))
+MAX_BATCH_ITEMS = int(os.getenv("MAX_BATCH_ITEMS", 50))
+POSTER_BATCH_CONCURRENCY = int(os.getenv("POSTER_BATCH_CONCURRENCY", 4))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await poster_jobs.start()
+    yield
+    await poster_jobs.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 origins = [
     "http://localhost:5173",
@@ -36,6 +62,9 @@ AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT", "")
 AZURE_OPENAI_KEY = os.getenv("AZURE_OPENAI_KEY")
 AZURE_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-5-mini")
 
+INDEX_REFRESH_SECONDS = float(os.getenv("INDEX_REFRESH_SECONDS", 300))
+INDEX_REFRESH_TOKEN = os.getenv("INDEX_REFRESH_TOKEN")
+
 aoai_client = None
 if AZURE_OPENAI_KEY and AZURE_OPENAI_ENDPOINT:
     aoai_client = OpenAI(api_key=AZURE_OPENAI_KEY, base_url=f"{AZURE_OPENAI_ENDPOINT}openai/v1/")
@@ -46,29 +75,58 @@ def _float_or_none(x):
     except Exception:
         return None
 
+def _load_event_rows(page_size: int = 1000) -> list[dict]:
+    """Every event with coordinates, paged out of Supabase."""
+    rows, start = [], 0
+    while True:
+        res = (
+            supabase.table("events")
+            .select("*")
+            .not_.is_("lat", "null")
+            .not_.is_("lng", "null")
+            .order("id")
+            .range(start, start + page_size - 1)
+            .execute()
+        )
+        page = res.data or []
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        start += page_size
+
+event_index = EventIndex(_load_event_rows, refresh_seconds=INDEX_REFRESH_SECONDS)
+mvt_cache = TileCache()
+search_index = SearchIndex()
+
+
+def _synced_search_index() -> SearchIndex:
+    """The search index, first catching up with the event index if it was reloaded."""
+    grid = event_index.current()
+    if search_index.version != grid.version:
+        search_index.sync(grid.by_id.values(), version=grid.version)
+    return search_index
+
 def _hash_key(source: str | None, link: str | None, title: str | None, date: str | None, location: str | None) -> str:
     base = f"{source or ''}|{link or ''}|{title or ''}|{date or ''}|{location or ''}"
     return hashlib.sha256(base.encode("utf-8")).hexdigest()
 
 
-@app.post("/api/process-poster")
-async def process_poster_endpoint(file: UploadFile = File(...)):
-    """Process uploaded poster image and extract event data."""
+poster_cache = PosterCache()
 
-    image_content = await file.read()
-    event_data = process_image_with_openai(image_content)
-
-    if not event_data:
-        raise HTTPException(status_code=500, detail="Failed to process image.")
 
-    location_text = event_data.get("Location", "")
-    coordinates = get_coordinates_from_location(location_text)
-    event_data.update(coordinates)
+def extract_poster(image_content: bytes, mime_type: str = "image/jpeg") -> dict | None:
+    """Vision extraction, reusing a cached result for identical or near-identical images."""
+    event_data, sha, dhash = poster_cache.lookup(image_content)
+    if event_data is not None:
+        return event_data
+    event_data = process_image_with_openai(image_content, mime_type)
+    if event_data and any(v for k, v in event_data.items() if k != "Source"):
+        poster_cache.store(sha, dhash, event_data)
+    return event_data
 
-    # Upsert to Supabase if configured
-    lat = _float_or_none(event_data.get("Latitude"))
-    lng = _float_or_none(event_data.get("Longitude"))
 
+def poster_row(event_data: dict) -> dict:
+    """Events-table row for extracted (and geocoded) poster data."""
     row = {
         "title": event_data.get("Title") or None,
         "description": event_data.get("Description") or None,
@@ -76,8 +134,8 @@ async def process_poster_endpoint(file: UploadFile = File(...)):
         "time": event_data.get("Time") or None,
         "location": event_data.get("Location") or None,
         "address": None,
-        "lat": lat,
-        "lng": lng,
+        "lat": _float_or_none(event_data.get("Latitude")),
+        "lng": _float_or_none(event_data.get("Longitude")),
         "price": None,
         "features": [],
         "organiser": event_data.get("Organizer") or None,
@@ -86,13 +144,198 @@ async def process_poster_endpoint(file: UploadFile = File(...)):
         "link": None,
     }
     row["source_link_hash"] = _hash_key(row["source"], row["link"], row["title"], row["date"], row["location"])
+    return row
+
+
+def process_poster(image: tuple[bytes, str]) -> dict:
+    """Extract, geocode and store one (preprocessed image, mime type) poster. Blocking; runs on a job worker thread."""
+    event_data = extract_poster(*image)
+
+    if not event_data:
+        raise RuntimeError("Failed to process image.")
+
+    location_text = event_data.get("Location", "")
+    coordinates = get_coordinates_from_location(location_text)
+    event_data.update(coordinates)
 
+    # Upsert to Supabase if configured
     if supabase:
-        supabase.table("events").upsert(row, on_conflict="source_link_hash").execute()
+        supabase.table("events").upsert(poster_row(event_data), on_conflict="source_link_hash").execute()
 
     return event_data
 
 
+poster_jobs = JobQueue(process_poster, workers=POSTER_WORKERS)
+
+
+@app.post("/api/process-poster", status_code=202)
+async def process_poster_endpoint(file: UploadFile = File(...)):
+    """Queue an uploaded poster for processing; poll /api/jobs/{job_id} for the result."""
+
+    if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Image too large.")
+    # Decode straight from the spooled upload and keep only the downscaled JPEG
+    try:
+        image = await asyncio.to_thread(preprocess_image, file.file)
+    except InvalidImage as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    try:
+        job = poster_jobs.submit(image)
+    except QueueFull:
+        raise HTTPException(status_code=503, detail="Too many posters queued, try again shortly.")
+    return {"job_id": job["id"], "status": job["status"]}
+
+
+def _read_batch_uploads(files: list[UploadFile]) -> list[dict]:
+    """
+    Expand a batch upload (images and/or zip archives of images) into
+    preprocessed items. Blocking; decoding happens here so the uploads can
+    be closed before results start streaming. Images past MAX_BATCH_ITEMS
+    are kept as failed items. MAX_UPLOAD_BYTES applies per image: to each
+    zip entry, checked before anything is decompressed, not to the zip.
+    """
+    items = []
+
+    def add(name, size, open_image):
+        if len(items) >= MAX_BATCH_ITEMS:
+            items.append({"filename": name, "error": f"Over the batch limit of {MAX_BATCH_ITEMS} images."})
+        elif size is not None and size > MAX_UPLOAD_BYTES:
+            items.append({"filename": name, "error": "Image too large."})
+        else:
+            try:
+                items.append({"filename": name, "image": preprocess_image(open_image())})
+            except InvalidImage as e:
+                items.append({"filename": name, "error": str(e)})
+
+    def read_entry(archive, info):
+        # file_size comes from the archive itself, so never decompress past the limit
+        with archive.open(info) as entry:
+            data = entry.read(MAX_UPLOAD_BYTES + 1)
+        if len(data) > MAX_UPLOAD_BYTES:
+            raise InvalidImage("Image too large.")
+        return io.BytesIO(data)
+
+    for upload in files:
+        # The per-image limit applies to each entry of a zip, not to the zip
+        if zipfile.is_zipfile(upload.file):
+            try:
+                with zipfile.ZipFile(upload.file) as archive:
+                    for info in archive.infolist():
+                        if info.is_dir() or info.filename.startswith("__MACOSX/"):
+                            continue
+                        add(info.filename, info.file_size, lambda: read_entry(archive, info))
+            except (zipfile.BadZipFile, RuntimeError, NotImplementedError, EOFError) as e:
+                # Corrupt archives, encrypted entries and unsupported compression
+                raise HTTPException(status_code=400, detail=f"Could not read {upload.filename}: {e}")
+        else:
+            upload.file.seek(0)
+            add(upload.filename, upload.size, lambda: upload.file)
+    return items
+
+
+@app.post("/api/process-posters")
+async def process_posters_batch(files: list[UploadFile] = File(...)):
+    """
+    Process many posters (images or zips of images). Streams NDJSON: one
+    "item" line per poster as its extraction finishes, then a "done" line
+    after a single deduplicated geocoding pass and one bulk upsert. Posters
+    that then fail to store get a second, "failed" item line.
+    """
+    items = await asyncio.to_thread(_read_batch_uploads, files)
+    if not items:
+        raise HTTPException(status_code=400, detail="No images found in upload.")
+
+    def item_line(index, **fields):
+        line = {"type": "item", "index": index, "filename": items[index]["filename"], **fields}
+        return json.dumps(line, ensure_ascii=False) + "\n"
+
+    async def stream():
+        limit = asyncio.Semaphore(POSTER_BATCH_CONCURRENCY)
+
+        async def run(index, item):
+            if "error" in item:
+                return index, None, item["error"]
+            async with limit:
+                try:
+                    event_data = await asyncio.to_thread(extract_poster, *item["image"])
+                except Exception as e:
+                    return index, None, str(e)
+            if not event_data:
+                return index, None, "Failed to process image."
+            return index, event_data, None
+
+        extracted = {}
+        tasks = [asyncio.create_task(run(i, item)) for i, item in enumerate(items)]
+        for next_done in asyncio.as_completed(tasks):
+            index, event_data, error = await next_done
+            if error:
+                yield item_line(index, status="failed", error=error)
+            else:
+                extracted[index] = event_data
+                yield item_line(index, status="extracted", event=event_data)
+
+        # One geocode per distinct location, then one bulk write
+        locations = sorted({(e.get("Location") or "").strip() for e in extracted.values()} - {""})
+        try:
+            coords = await asyncio.to_thread(get_coordinates_for_locations, locations,
+                                             POSTER_BATCH_CONCURRENCY)
+        except Exception as e:
+            print(f"Batch geocoding failed: {e}")
+            coords = {}
+        for event_data in extracted.values():
+            event_data.update(coords.get((event_data.get("Location") or "").strip(),
+                                         {"Latitude": "", "Longitude": ""}))
+
+        rows, indexes = {}, {}
+        for index, event_data in extracted.items():
+            row = poster_row(event_data)
+            rows.setdefault(row["source_link_hash"], row)
+            indexes.setdefault(row["source_link_hash"], []).append(index)
+        stored = 0
+        if supabase and rows:
+            def upsert(batch):
+                supabase.table("events").upsert(batch, on_conflict="source_link_hash").execute()
+
+            try:
+                await asyncio.to_thread(upsert, list(rows.values()))
+                stored = len(rows)
+            except Exception as e:
+                print(f"Batch upsert of {len(rows)} posters failed, storing one at a time: {e}")
+                for key, row in rows.items():
+                    try:
+                        await asyncio.to_thread(upsert, [row])
+                        stored += 1
+                    except Exception as e:
+                        for index in indexes[key]:
+                            del extracted[index]
+                            yield item_line(index, status="failed", error=f"Could not store event: {e}")
+
+        yield json.dumps({
+            "type": "done",
+            "processed": len(extracted),
+            "failed": len(items) - len(extracted),
+            "geocoded_locations": len(locations),
+            "stored": stored,
+            "events": [extracted[i] for i in sorted(extracted)],
+        }, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.get("/api/poster-cache/stats")
+def poster_cache_stats():
+    return poster_cache.snapshot()
+
+
+@app.get("/api/jobs/{job_id}")
+def get_job(job_id: str):
+    """Status of a queued poster job; `result` holds the event data once done."""
+    job = poster_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return {k: job[k] for k in ("id", "status", "result", "error")}
+
+
 @app.get("/api/events")
 def list_events(
     sw_lng: float = Query(...),
@@ -100,20 +343,108 @@ def list_events(
     ne_lng: float = Query(...),
     ne_lat: float = Query(...),
     limit: int = Query(500, ge=1, le=1000),
+    fields: str | None = Query(None, description="Comma-separated columns to return, e.g. id,title,lat,lng"),
+    format: str = Query("json", pattern=f"^({'|'.join(FORMATS)})$"),
+    from_: datetime | None = Query(None, alias="from", description="Events still running at or after this time (ISO 8601; Adelaide time if no offset)"),
+    to: datetime | None = Query(None, description="Events starting at or before this time"),
+    when: str | None = Query(None, pattern=f"^({'|'.join(TIME_PRESETS)})$", description="Preset window instead of from/to"),
+    accept_encoding: str | None = Header(None),
+):
+    if not supabase:
+        raise HTTPException(status_code=500, detail="Supabase not configured.")
+    wanted = parse_fields(fields)
+    if when and (from_ or to):
+        raise HTTPException(status_code=400, detail="Use either `when` or `from`/`to`, not both.")
+    try:
+        window = time_window(when, from_, to)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    rows = event_index.bbox(sw_lng, sw_lat, ne_lng, ne_lat, limit=limit, window=window)
+    return encode_events(rows, wanted, format, accept_encoding)
+
+
+@app.get("/api/search")
+def search_events(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    fields: str | None = Query(None, description="Comma-separated columns to return, e.g. id,title,lat,lng"),
+):
+    """Ranked full-text search over title, location, category, organiser and description."""
+    if not supabase:
+        raise HTTPException(status_code=500, detail="Supabase not configured.")
+    wanted = parse_fields(fields)
+    hits = _synced_search_index().search(q, limit=limit)
+    rows = project([row for _, row in hits], wanted)
+    return [{**row, "score": score} for (score, _), row in zip(hits, rows)]
+
+
+@app.get("/api/events/clusters")
+def list_event_clusters(
+    sw_lng: float = Query(...),
+    sw_lat: float = Query(...),
+    ne_lng: float = Query(...),
+    ne_lat: float = Query(...),
+    zoom: float = Query(..., ge=0, le=24),
 ):
+    """Events aggregated into weighted grid cells (~32 px at the given zoom) for clusters and heatmaps."""
     if not supabase:
         raise HTTPException(status_code=500, detail="Supabase not configured.")
-    res = (
-        supabase.table("events")
-        .select("*")
-        .gte("lng", sw_lng)
-        .lte("lng", ne_lng)
-        .gte("lat", sw_lat)
-        .lte("lat", ne_lat)
-        .limit(limit)
-        .execute()
+    return event_index.clusters(sw_lng, sw_lat, ne_lng, ne_lat, zoom)
+
+
+@app.get("/api/events/tiles/{z}/{x}/{y}.mvt")
+def events_vector_tile(z: int, x: int, y: int):
+    """Event points (id, title, category, date) as a Mapbox Vector Tile, layer "events"."""
+    if not supabase:
+        raise HTTPException(status_code=500, detail="Supabase not configured.")
+    if not 0 <= z <= 22 or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=400, detail="Invalid tile coordinates.")
+    grid = event_index.current()
+    west, south, east, north = tile_bounds(z, x, y)
+    # Pad the query slightly so symbols near tile edges are not clipped
+    pad_x, pad_y = (east - west) / 64, (north - south) / 64
+    tile = mvt_cache.get(
+        grid.data_version, z, x, y,
+        lambda: encode_tile(grid.query(west - pad_x, south - pad_y, east + pad_x, north + pad_y), z, x, y),
     )
-    return res.data or []
+    return Response(content=tile, media_type="application/vnd.mapbox-vector-tile")
+
+
+@app.get("/api/events/tiles/{z}/{x}/{y}")
+def events_tile(z: int, x: int, y: int):
+    """Events in one slippy-map tile; cached until the next index refresh."""
+    if not supabase:
+        raise HTTPException(status_code=500, detail="Supabase not configured.")
+    if not 0 <= z <= 22 or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=400, detail="Invalid tile coordinates.")
+    return event_index.tile(z, x, y)
+
+
+@app.get("/api/events/{event_id}")
+def get_event(event_id: str):
+    """Full row for one event, e.g. when its popup opens."""
+    if not supabase:
+        raise HTTPException(status_code=500, detail="Supabase not configured.")
+    row = event_index.current().by_id.get(event_id)
+    if row is None:
+        res = supabase.table("events").select("*").eq("id", event_id).limit(1).execute()
+        if not res.data:
+            raise HTTPException(status_code=404, detail="Event not found.")
+        row = res.data[0]
+    return row
+
+
+@app.post("/api/index/refresh")
+def refresh_index(x_refresh_token: str | None = Header(None)):
+    """Reload the event index now (called by the loader after it writes)."""
+    if not INDEX_REFRESH_TOKEN or x_refresh_token != INDEX_REFRESH_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid refresh token.")
+    if not supabase:
+        raise HTTPException(status_code=500, detail="Supabase not configured.")
+    event_index.refresh()
+    grid = event_index.grid
+    synced = search_index.sync(grid.by_id.values(), version=grid.version)
+    return {"version": grid.version, "data_version": grid.data_version, "search": synced}
 
 
 @app.get("/api/test")
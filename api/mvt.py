@@ -0,0 +1,159 @@
+import math
+import os
+import shutil
+import struct
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Minimal Mapbox Vector Tile (v2.1) encoder for point layers; see
+# https://github.com/mapbox/vector-tile-spec. Only what the events layer
+# needs is implemented, so there is no protobuf dependency.
+
+EXTENT = 4096
+BUFFER = 64  # points this far outside the tile edge (in tile units) are kept
+LAYER_NAME = "events"
+TILE_PROPERTIES = ("id", "title", "category", "date")
+MVT_CACHE_DIR = os.getenv("MVT_CACHE_DIR") or os.path.join(
+    tempfile.gettempdir(), "mapster_mvt")
+MVT_MEMORY_TILES = 1024
+
+_VARINT, _BYTES, _DOUBLE = 0, 2, 1
+
+
+def _varint(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        b = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(b | 0x80)
+        else:
+            out.append(b)
+            return bytes(out)
+
+
+def _key(field: int, wire_type: int) -> bytes:
+    return _varint((field << 3) | wire_type)
+
+
+def _bytes_field(field: int, data: bytes) -> bytes:
+    return _key(field, _BYTES) + _varint(len(data)) + data
+
+
+def _packed(field: int, values) -> bytes:
+    return _bytes_field(field, b"".join(_varint(v) for v in values))
+
+
+def _zigzag(n: int) -> int:
+    return (n << 1) ^ (n >> 63)
+
+
+def _value(v) -> bytes:
+    if isinstance(v, bool):
+        return _key(7, _VARINT) + _varint(int(v))
+    if isinstance(v, int):
+        return _key(6, _VARINT) + _varint(_zigzag(v))
+    if isinstance(v, float):
+        return _key(3, _DOUBLE) + struct.pack("<d", v)
+    return _bytes_field(1, str(v).encode("utf-8"))
+
+
+def _tile_xy(lng: float, lat: float, z: int, x: int, y: int) -> tuple[int, int]:
+    n = 2 ** z
+    lat = max(min(lat, 85.0511), -85.0511)
+    fx = (lng + 180.0) / 360.0 * n
+    fy = (1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n
+    return round((fx - x) * EXTENT), round((fy - y) * EXTENT)
+
+
+def encode_tile(rows: list[dict], z: int, x: int, y: int) -> bytes:
+    """Encode event rows as a single-layer MVT of points with TILE_PROPERTIES."""
+    keys: dict[str, int] = {}
+    values: dict[tuple[type, object], int] = {}
+    features = []
+    for row in rows:
+        px, py = _tile_xy(row["lng"], row["lat"], z, x, y)
+        if not (-BUFFER <= px <= EXTENT + BUFFER and -BUFFER <= py <= EXTENT + BUFFER):
+            continue
+        tags = []
+        for k in TILE_PROPERTIES:
+            v = row.get(k)
+            if v is None or v == "":
+                continue
+            tags.append(keys.setdefault(k, len(keys)))
+            tags.append(values.setdefault((type(v), v), len(values)))
+        feature = b""
+        event_id = row.get("id")
+        if isinstance(event_id, int) and event_id >= 0:
+            feature += _key(1, _VARINT) + _varint(event_id)
+        feature += _packed(2, tags)
+        feature += _key(3, _VARINT) + _varint(1)  # POINT
+        feature += _packed(4, [(1 & 0x7) | (1 << 3), _zigzag(px), _zigzag(py)])  # MoveTo(1)
+        features.append(feature)
+
+    layer = _key(15, _VARINT) + _varint(2)
+    layer += _bytes_field(1, LAYER_NAME.encode("utf-8"))
+    for feature in features:
+        layer += _bytes_field(2, feature)
+    for k in keys:
+        layer += _bytes_field(3, k.encode("utf-8"))
+    for _, v in values:
+        layer += _bytes_field(4, _value(v))
+    layer += _key(5, _VARINT) + _varint(EXTENT)
+    return _bytes_field(3, layer)
+
+
+class TileCache:
+    """
+    Encoded tiles cached in memory (LRU) and on disk under
+    <cache_dir>/<data_version>/z/x/y.mvt. Switching to a new data version
+    drops the old memory entries and on-disk directories.
+    """
+
+    def __init__(self, cache_dir: str = MVT_CACHE_DIR, max_tiles: int = MVT_MEMORY_TILES):
+        self.cache_dir = cache_dir
+        self.max_tiles = max_tiles
+        self.data_version = None
+        self._memory: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _switch_version(self, data_version: str) -> None:
+        # Caller holds self._lock
+        self.data_version = data_version
+        self._memory.clear()
+        if os.path.isdir(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                if name != data_version:
+                    shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+
+    def get(self, data_version: str, z: int, x: int, y: int, build) -> bytes:
+        key = (z, x, y)
+        with self._lock:
+            if data_version != self.data_version:
+                self._switch_version(data_version)
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        path = os.path.join(self.cache_dir, data_version, str(z), str(x), f"{y}.mvt")
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                tile = f.read()
+        else:
+            tile = build()
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(tile)
+                os.replace(tmp, path)
+            except OSError as e:
+                print(f"Could not write tile cache {path}: {e}")
+
+        with self._lock:
+            if data_version == self.data_version:
+                self._memory[key] = tile
+                if len(self._memory) > self.max_tiles:
+                    self._memory.popitem(last=False)
+        return tile
@@ -0,0 +1,148 @@
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from PIL import Image
+
+POSTER_CACHE_PATH = os.getenv("POSTER_CACHE_PATH") or os.path.join(
+    tempfile.gettempdir(), "mapster_poster_cache.sqlite3")
+MEMORY_ENTRIES = 256
+DISK_ENTRIES = 20000
+# Max differing bits (of 64) for two photos to count as the same poster
+DHASH_DISTANCE = 6
+
+
+def dhash(image_content: bytes) -> int | None:
+    """64-bit difference hash; None if the bytes are not a decodable image."""
+    try:
+        with Image.open(io.BytesIO(image_content)) as img:
+            img.draft("L", (64, 64))  # cheap JPEG downscale while decoding
+            small = img.convert("L").resize((9, 8), Image.LANCZOS)
+    except Exception:
+        return None
+    px = list(small.getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (px[row * 9 + col] > px[row * 9 + col + 1])
+    return bits
+
+
+class PosterCache:
+    """
+    Extraction results keyed on the exact image hash, with a perceptual
+    (dHash) fallback so re-photographed posters reuse a prior extraction.
+    Results live in a size-bounded in-memory LRU backed by SQLite.
+    """
+
+    def __init__(self, path: str = POSTER_CACHE_PATH, memory_entries: int = MEMORY_ENTRIES,
+                 disk_entries: int = DISK_ENTRIES, max_distance: int = DHASH_DISTANCE):
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.max_distance = max_distance
+        self.stats = {"exact_hits": 0, "perceptual_hits": 0, "misses": 0}
+        self._memory: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS posters (
+                sha256 TEXT PRIMARY KEY,
+                dhash TEXT,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+        # Perceptual hashes of everything on disk, for near-duplicate search
+        self._dhashes: dict[str, int] = {
+            sha: int(h, 16) for sha, h in self._conn.execute(
+                "SELECT sha256, dhash FROM posters WHERE dhash IS NOT NULL")
+        }
+
+    def _remember(self, sha: str, result: dict) -> None:
+        # Caller holds self._lock
+        self._memory[sha] = result
+        self._memory.move_to_end(sha)
+        if len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _load(self, sha: str) -> dict | None:
+        # Caller holds self._lock
+        if sha in self._memory:
+            self._memory.move_to_end(sha)
+            return self._memory[sha]
+        row = self._conn.execute(
+            "SELECT result FROM posters WHERE sha256 = ?", (sha,)).fetchone()
+        if not row:
+            return None
+        result = json.loads(row[0])
+        self._remember(sha, result)
+        return result
+
+    def _nearest(self, h: int) -> str | None:
+        best, best_distance = None, self.max_distance + 1
+        for sha, other in self._dhashes.items():
+            distance = (h ^ other).bit_count()
+            if distance < best_distance:
+                best, best_distance = sha, distance
+        return best
+
+    def lookup(self, image_content: bytes) -> tuple[dict | None, str, int | None]:
+        """Return (cached result or None, sha256, dhash) for an uploaded image."""
+        sha = hashlib.sha256(image_content).hexdigest()
+        with self._lock:
+            result = self._load(sha)
+            if result is not None:
+                self.stats["exact_hits"] += 1
+                return dict(result), sha, None
+        h = dhash(image_content)
+        with self._lock:
+            if h is not None:
+                near = self._nearest(h)
+                result = self._load(near) if near else None
+                if result is not None:
+                    self.stats["perceptual_hits"] += 1
+                    return dict(result), sha, h
+            self.stats["misses"] += 1
+        return None, sha, h
+
+    def store(self, sha: str, h: int | None, result: dict) -> None:
+        with self._lock:
+            self._remember(sha, dict(result))
+            if h is not None:
+                self._dhashes[sha] = h
+            self._conn.execute(
+                "INSERT OR REPLACE INTO posters VALUES (?, ?, ?, ?)",
+                (sha, f"{h:016x}" if h is not None else None,
+                 json.dumps(result, ensure_ascii=False), time.time()),
+            )
+            # Keep the disk tier bounded: drop the oldest entries
+            evicted = [r[0] for r in self._conn.execute(
+                "SELECT sha256 FROM posters ORDER BY created_at DESC LIMIT -1 OFFSET ?",
+                (self.disk_entries,))]
+            if evicted:
+                self._conn.executemany(
+                    "DELETE FROM posters WHERE sha256 = ?", [(s,) for s in evicted])
+                for s in evicted:
+                    self._dhashes.pop(s, None)
+            self._conn.commit()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lookups = sum(self.stats.values())
+            hits = self.stats["exact_hits"] + self.stats["perceptual_hits"]
+            return {
+                **self.stats,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": self._conn.execute("SELECT COUNT(*) FROM posters").fetchone()[0],
+            }
@@ -1,17 +1,20 @@
 from dotenv import load_dotenv
 from openai import OpenAI
-import googlemaps
-import urllib.parse
-import requests
 import os
 import json
 import base64
+import io
 import re
+from PIL import Image, ImageOps
+from geo.geocoding import build_geocoder, normalize_address
 
 load_dotenv()
 
+POSTER_MAX_DIMENSION = int(os.getenv("POSTER_MAX_DIMENSION", 1600))
+POSTER_JPEG_QUALITY = 85
+
 openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-gmaps = googlemaps.Client(key=os.getenv("GOOGLE_API_KEY"))
+geocoder = build_geocoder(os.getenv("GEOCODE_PROVIDERS", "google,nominatim"))
 
 JSON_FORMAT = """
 {
@@ -46,7 +49,39 @@ PROMPT = f"""
 """
 
 
-def process_image_with_openai(image_content: bytes) -> dict:
+class InvalidImage(ValueError):
+    pass
+
+
+def preprocess_image(fileobj, max_dimension: int = POSTER_MAX_DIMENSION) -> tuple[bytes, str]:
+    """
+    Decode an uploaded image from a file object, apply its EXIF orientation,
+    downscale it to fit within max_dimension and re-encode it as JPEG.
+    Returns (bytes, mime type); raises InvalidImage for anything that is not an image.
+    """
+    try:
+        img = Image.open(fileobj)
+        # Let the JPEG decoder scale down while decoding to keep memory low
+        img.draft("RGB", (max_dimension, max_dimension))
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    except (Image.DecompressionBombError, OSError, SyntaxError, ValueError) as e:
+        raise InvalidImage("Not a supported image.") from e
+
+    if img.mode in ("RGBA", "LA", "P"):
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, "white")
+        background.paste(img, mask=img.getchannel("A"))
+        img = background
+    elif img.mode != "RGB":
+        img = img.convert("RGB")
+
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=POSTER_JPEG_QUALITY, optimize=True)
+    return out.getvalue(), "image/jpeg"
+
+
+def process_image_with_openai(image_content: bytes, mime_type: str = "image/jpeg") -> dict:
     """Extract event data from poster image."""
     base64_image = base64.b64encode(image_content).decode('utf-8')
     try:
@@ -60,7 +95,7 @@ def process_image_with_openai(image_content: bytes) -> dict:
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}"
+                                "url": f"data:{mime_type};base64,{base64_image}"
                             }
                         }
                     ]
@@ -94,35 +129,19 @@ def process_image_with_openai(image_content: bytes) -> dict:
         return None
 
 
-def get_coordinates_from_location(location_string: str) -> dict:
-    """Get coordinates from location string using Google Geocoding API."""
-    if not location_string:
+def _poster_coordinates(coords: dict | None) -> dict:
+    if not coords or coords["lat"] is None:
         return {"Latitude": "", "Longitude": ""}
+    return {"Latitude": str(coords["lat"]), "Longitude": str(coords["lng"])}
 
-    try:
-        geocode_result = gmaps.geocode(f"{location_string}, South Australia")
-        if geocode_result:
-            location = geocode_result[0]['geometry']['location']
-            return {
-                "Latitude": str(location['lat']),
-                "Longitude": str(location['lng'])
-            }
-    except Exception as e:
-        # Google geocoding failed; attempt OpenStreetMap Nominatim as a fallback (no API key required)
-        try:
-            query = urllib.parse.quote(f"{location_string}, South Australia")
-            url = f"https://nominatim.openstreetmap.org/search?q={query}&format=json&limit=1"
-            headers = {"User-Agent": "Mapster.city/1.0 (contact@mapster.city)"}
-            resp = requests.get(url, headers=headers, timeout=10)
-            if resp.ok:
-                results = resp.json()
-                if results:
-                    return {
-                        "Latitude": str(results[0]["lat"]),
-                        "Longitude": str(results[0]["lon"])
-                    }
-        except Exception as e2:
-            print(f"OSM geocoding failed: {e2}")
-
-    # All methods failed
-    return {"Latitude": "", "Longitude": ""}
+
+def get_coordinates_from_location(location_string: str) -> dict:
+    """Get coordinates from location string via the shared geocoder (Google, then Nominatim)."""
+    return _poster_coordinates(geocoder.geocode_sync(location_string))
+
+
+def get_coordinates_for_locations(locations, concurrency: int = 8) -> dict:
+    """{location: coordinates} for many location strings, one lookup per distinct address. Blocking."""
+    locations = list(locations)
+    coords = geocoder.geocode_many(locations, concurrency=concurrency)
+    return {loc: _poster_coordinates(coords.get(normalize_address(loc))) for loc in locations}
@@ -0,0 +1,193 @@
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import Counter
+
+# Per-field term weights (BM25F-style: weighted term frequencies are summed
+# across fields before saturation)
+FIELD_WEIGHTS = {
+    "title": 3.0,
+    "location": 2.0,
+    "category": 1.5,
+    "organiser": 1.5,
+    "description": 1.0,
+}
+K1 = 1.2
+B = 0.75
+# Score multipliers for expanded query terms
+PREFIX_BOOST = 0.7
+TYPO_BOOST = 0.5
+MAX_EXPANSIONS = 30
+MIN_PREFIX_LEN = 2
+MIN_TYPO_LEN = 4
+
+
+def tokenize(text: str | None) -> list[str]:
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.findall(r"\w+", text.lower())
+
+
+def _deletes(term: str) -> set[str]:
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """Levenshtein distance <= 1, also counting one adjacent transposition as one edit."""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la == lb:
+        diff = [i for i in range(la) if a[i] != b[i]]
+        return len(diff) == 1 or (
+            len(diff) == 2 and diff[1] == diff[0] + 1
+            and a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]])
+    if la > lb:
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:]
+
+
+class SearchIndex:
+    """
+    In-memory inverted index over event rows with BM25F ranking, prefix
+    expansion of the last query word and one-edit typo tolerance (via a
+    deletion index). sync() applies only the rows that changed since the
+    last call, keyed on id and content_hash.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.postings: dict[str, dict[str, float]] = {}  # term -> {doc id: weighted tf}
+        self.doc_terms: dict[str, Counter] = {}
+        self.doc_len: dict[str, float] = {}
+        self.doc_hash: dict[str, str] = {}
+        self.rows: dict[str, dict] = {}
+        self.total_len = 0.0
+        self._terms: list[str] = []  # sorted vocabulary, for prefix search
+        self._deletes: dict[str, set[str]] = {}
+        self._lock = threading.Lock()
+
+    # --- maintenance ---
+
+    def _add(self, doc_id: str, row: dict) -> None:
+        terms = Counter()
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(row.get(field)):
+                terms[token] += weight
+        self.doc_terms[doc_id] = terms
+        self.doc_len[doc_id] = sum(terms.values())
+        self.total_len += self.doc_len[doc_id]
+        self.rows[doc_id] = row
+        for term, tf in terms.items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = {}
+                for d in _deletes(term):
+                    self._deletes.setdefault(d, set()).add(term)
+            posting[doc_id] = tf
+
+    def _remove(self, doc_id: str) -> None:
+        for term in self.doc_terms.pop(doc_id, ()):
+            posting = self.postings[term]
+            del posting[doc_id]
+            if not posting:
+                del self.postings[term]
+                for d in _deletes(term):
+                    self._deletes[d].discard(term)
+                    if not self._deletes[d]:
+                        del self._deletes[d]
+        self.total_len -= self.doc_len.pop(doc_id, 0.0)
+        self.rows.pop(doc_id, None)
+        self.doc_hash.pop(doc_id, None)
+
+    def sync(self, rows, version=None) -> dict:
+        """Bring the index in line with `rows`, touching only added, changed and removed events."""
+        incoming = {str(r["id"]): r for r in rows if r.get("id") is not None}
+        with self._lock:
+            removed = [d for d in self.doc_hash if d not in incoming]
+            changed = [d for d, r in incoming.items()
+                       if self.doc_hash.get(d, object()) != (r.get("content_hash") or id(r))]
+            for doc_id in removed:
+                self._remove(doc_id)
+            for doc_id in changed:
+                self._remove(doc_id)
+                row = incoming[doc_id]
+                self._add(doc_id, row)
+                self.doc_hash[doc_id] = row.get("content_hash") or id(row)
+            # Rows that did not change are new objects after a reload; point at them
+            for doc_id, row in incoming.items():
+                self.rows[doc_id] = row
+            if removed or changed:
+                self._terms = sorted(self.postings)
+            self.version = version
+        return {"added_or_changed": len(changed), "removed": len(removed), "documents": len(incoming)}
+
+    # --- querying ---
+
+    def _expand(self, token: str, prefix: bool) -> dict[str, float]:
+        """Index terms a query token matches, with their score multipliers."""
+        matches = {}
+        if token in self.postings:
+            matches[token] = 1.0
+        if prefix and len(token) >= MIN_PREFIX_LEN:
+            i = bisect_left(self._terms, token)
+            expansions = []
+            while i < len(self._terms) and self._terms[i].startswith(token):
+                if self._terms[i] != token:
+                    expansions.append(self._terms[i])
+                i += 1
+            # the most common completions first
+            for term in heapq.nlargest(MAX_EXPANSIONS, expansions, key=lambda t: len(self.postings[t])):
+                matches.setdefault(term, PREFIX_BOOST)
+        if len(token) >= MIN_TYPO_LEN and not matches:
+            # one insertion, deletion or substitution: the two words share a
+            # deletion variant, or one is a deletion variant of the other
+            candidates = set(self._deletes.get(token, ()))
+            for d in _deletes(token):
+                if d in self.postings:
+                    candidates.add(d)
+                candidates |= self._deletes.get(d, set())
+            for term in candidates:
+                if _within_one_edit(token, term):
+                    matches.setdefault(term, TYPO_BOOST)
+        return matches
+
+    def search(self, query: str, limit: int = 20) -> list[tuple[float, dict]]:
+        """Top `limit` (score, row) pairs; every query word must match some field."""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        with self._lock:
+            n = len(self.doc_terms)
+            if n == 0:
+                return []
+            avg_len = self.total_len / n
+            scores = None
+            for i, token in enumerate(tokens):
+                # Only the word being typed is treated as a prefix
+                matches = self._expand(token, prefix=i == len(tokens) - 1)
+                token_scores: dict[str, float] = {}
+                for term, boost in matches.items():
+                    posting = self.postings[term]
+                    idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+                    for doc_id, tf in posting.items():
+                        norm = tf * (K1 + 1) / (tf + K1 * (1 - B + B * self.doc_len[doc_id] / avg_len))
+                        s = boost * idf * norm
+                        if s > token_scores.get(doc_id, 0.0):
+                            token_scores[doc_id] = s
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {d: s + token_scores[d] for d, s in scores.items() if d in token_scores}
+                if not scores:
+                    return []
+            top = heapq.nlargest(limit, scores.items(), key=lambda kv: kv[1])
+            return [(round(score, 4), self.rows[doc_id]) for doc_id, score in top]
@@ -0,0 +1,356 @@
+import hashlib
+import math
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+# Grid cell size in degrees (~1.1 km north-south at Adelaide's latitude)
+CELL_DEG = 0.01
+TILE_CACHE_SIZE = 2048
+MAX_TILES_PER_QUERY = 16
+# Clusters are binned on a grid 2**CLUSTER_SUBDIV cells across each tile
+# (8 x 8 -> 32 px cells on 256 px tiles), for zoom levels 0..MAX_CLUSTER_ZOOM
+CLUSTER_SUBDIV = 3
+MAX_CLUSTER_ZOOM = 16
+
+LOCAL_TZ = ZoneInfo("Australia/Adelaide")
+# Events with a start but no end are taken to last this long
+DEFAULT_DURATION = 3 * 3600
+# Events longer than this (exhibitions, festival runs) are kept apart from the
+# start-sorted lists, so the window searched by bisect stays short
+LONG_EVENT_SECONDS = 7 * 24 * 3600
+TIME_PRESETS = ("now", "today", "weekend")
+
+
+def lng_lat_to_tile(lng: float, lat: float, z: int) -> tuple[int, int]:
+    """Slippy-map tile containing a point."""
+    n = 2 ** z
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = int((lng + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_bounds(z: int, x: int, y: int) -> tuple[float, float, float, float]:
+    """(west, south, east, north) of a slippy-map tile."""
+    n = 2 ** z
+
+    def lat(yy):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * yy / n))))
+
+    return x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)
+
+
+def _timestamp(value) -> float | None:
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=LOCAL_TZ)
+    return dt.timestamp()
+
+
+def event_span(row: dict) -> tuple[float, float] | None:
+    """(start, end) of an event in epoch seconds, from start_at/end_at."""
+    start = _timestamp(row.get("start_at"))
+    if start is None:
+        return None
+    end = _timestamp(row.get("end_at"))
+    return start, max(start, end if end is not None else start + DEFAULT_DURATION)
+
+
+def time_window(when: str | None = None, start: datetime | None = None,
+                end: datetime | None = None, now: datetime | None = None):
+    """
+    (start, end) epoch seconds to filter on, or None for no time filter.
+    Presets, in Adelaide time: now; today (midnight to midnight); weekend
+    (Friday 5pm to Monday midnight, this week's or the coming one).
+    Naive from/to datetimes are taken as Adelaide time; either may be open.
+    """
+    if when:
+        now = (now or datetime.now(LOCAL_TZ)).astimezone(LOCAL_TZ)
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        if when == "now":
+            return now.timestamp(), now.timestamp()
+        if when == "today":
+            return midnight.timestamp(), (midnight + timedelta(days=1)).timestamp()
+        if when == "weekend":
+            friday = midnight - timedelta(days=now.weekday() - 4) if now.weekday() >= 4 \
+                else midnight + timedelta(days=4 - now.weekday())
+            return ((friday + timedelta(hours=17)).timestamp(),
+                    (friday + timedelta(days=3)).timestamp())
+        raise ValueError(f"Unknown time preset: {when}")
+    if start is None and end is None:
+        return None
+    lo = _timestamp(start.isoformat()) if start else float("-inf")
+    hi = _timestamp(end.isoformat()) if end else float("inf")
+    if lo > hi:
+        raise ValueError("`from` must not be after `to`.")
+    return lo, hi
+
+
+def data_version(rows: list[dict]) -> str:
+    """Content fingerprint of the event set; changes whenever the loader changes a row."""
+    h = hashlib.sha1()
+    for key in sorted(f"{r.get('id')}|{r.get('content_hash') or ''}" for r in rows):
+        h.update(key.encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+class GridIndex:
+    """
+    Uniform lat/lng grid over event rows for fast bounding-box lookups.
+    Each cell also keeps its timed events sorted by start, so a bbox plus
+    time-window query only touches rows near the window in each cell.
+    """
+
+    def __init__(self, rows: list[dict], cell_deg: float = CELL_DEG):
+        self.cell_deg = cell_deg
+        self.version = 0
+        self.data_version = ""
+        self.cells: dict[tuple[int, int], list[dict]] = {}
+        self.by_id: dict[str, dict] = {}
+        # cell -> (sorted starts, [(start, end, row)] in that order, [long events])
+        self.timeline: dict[tuple[int, int], tuple[list, list, list]] = {}
+        self.size = 0
+        for row in rows:
+            if row.get("id") is not None:
+                self.by_id[str(row["id"])] = row
+            lat, lng = row.get("lat"), row.get("lng")
+            if lat is None or lng is None:
+                continue
+            cell = self._cell(lng, lat)
+            self.cells.setdefault(cell, []).append(row)
+            self.size += 1
+            span = event_span(row)
+            if span is not None:
+                _, short, long = self.timeline.setdefault(cell, ([], [], []))
+                entry = (span[0], span[1], row)
+                (long if span[1] - span[0] > LONG_EVENT_SECONDS else short).append(entry)
+        for cell, (starts, short, long) in self.timeline.items():
+            short.sort(key=lambda e: e[0])
+            starts.extend(e[0] for e in short)
+
+    def _cell(self, lng: float, lat: float) -> tuple[int, int]:
+        return math.floor(lng / self.cell_deg), math.floor(lat / self.cell_deg)
+
+    def _in_window(self, cell, window: tuple[float, float]):
+        """Rows of a cell whose (start, end) overlaps the window."""
+        if cell not in self.timeline:
+            return
+        lo, hi = window
+        starts, short, long = self.timeline[cell]
+        # short events start at most LONG_EVENT_SECONDS before they end
+        for i in range(bisect_left(starts, lo - LONG_EVENT_SECONDS), bisect_right(starts, hi)):
+            if short[i][1] >= lo:
+                yield short[i][2]
+        for start, end, row in long:
+            if start <= hi and end >= lo:
+                yield row
+
+    def query(self, west: float, south: float, east: float, north: float,
+              limit: int | None = None, window: tuple[float, float] | None = None) -> list[dict]:
+        """Rows in the box; with a window, only those whose time span overlaps it."""
+        x0, y0 = self._cell(west, south)
+        x1, y1 = self._cell(east, north)
+        cells = self.cells if window is None else self.timeline
+        # For wide boxes, walking occupied cells is cheaper than the full range
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(cells):
+            keys = [k for k in cells if x0 <= k[0] <= x1 and y0 <= k[1] <= y1]
+        else:
+            keys = [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+        out = []
+        for k in keys:
+            rows = self.cells.get(k, ()) if window is None else self._in_window(k, window)
+            for row in rows:
+                if west <= row["lng"] <= east and south <= row["lat"] <= north:
+                    out.append(row)
+                    if limit is not None and len(out) >= limit:
+                        return out
+        return out
+
+
+class ClusterIndex:
+    """
+    Hierarchical grid of event clusters. Every point gets an integer Web
+    Mercator cell at the finest level once; coarser zooms are bit shifts of
+    that, so each zoom's bins are built in one pass and then cached.
+    """
+
+    def __init__(self, rows):
+        self.finest = MAX_CLUSTER_ZOOM + CLUSTER_SUBDIV
+        self.points = []
+        for row in rows:
+            x, y = lng_lat_to_tile(row["lng"], row["lat"], self.finest)
+            self.points.append((x, y, row["lat"], row["lng"], row.get("id")))
+        self._levels: dict[int, dict[tuple[int, int], list]] = {}
+        self._lock = threading.Lock()
+
+    def _level(self, zoom: int) -> dict:
+        with self._lock:
+            if zoom in self._levels:
+                return self._levels[zoom]
+        shift = MAX_CLUSTER_ZOOM - zoom
+        cells: dict[tuple[int, int], list] = {}
+        for x, y, lat, lng, event_id in self.points:
+            cell = cells.get((x >> shift, y >> shift))
+            if cell is None:
+                cells[(x >> shift, y >> shift)] = [1, lat, lng, event_id]
+            else:
+                cell[0] += 1
+                cell[1] += lat
+                cell[2] += lng
+        with self._lock:
+            self._levels[zoom] = cells
+        return cells
+
+    def query(self, west: float, south: float, east: float, north: float,
+              zoom: float) -> list[dict]:
+        z = min(max(int(zoom), 0), MAX_CLUSTER_ZOOM)
+        cells = self._level(z)
+        x0, y0 = lng_lat_to_tile(west, north, z + CLUSTER_SUBDIV)
+        x1, y1 = lng_lat_to_tile(east, south, z + CLUSTER_SUBDIV)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(cells):
+            keys = [k for k in cells if x0 <= k[0] <= x1 and y0 <= k[1] <= y1]
+        else:
+            keys = [(x, y) for x in range(x0, x1 + 1)
+                    for y in range(y0, y1 + 1) if (x, y) in cells]
+        out = []
+        for k in keys:
+            count, sum_lat, sum_lng, event_id = cells[k]
+            out.append({
+                "lat": sum_lat / count,
+                "lng": sum_lng / count,
+                "count": count,
+                "id": event_id if count == 1 else None,
+            })
+        return out
+
+
+class EventIndex:
+    """
+    In-memory copy of the events table, refreshed from `load_rows` every
+    `refresh_seconds`. Stale data keeps being served while a background
+    refresh runs; only the very first load blocks.
+    """
+
+    def __init__(self, load_rows, refresh_seconds: float = 300):
+        self.load_rows = load_rows
+        self.refresh_seconds = refresh_seconds
+        self.grid: GridIndex | None = None
+        self.version = 0
+        self.loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._tiles: OrderedDict = OrderedDict()
+        self._clusters: ClusterIndex | None = None
+
+    def _install(self, rows: list[dict]) -> None:
+        # Caller holds self._lock
+        self.version += 1
+        grid = GridIndex(rows)
+        grid.version = self.version
+        grid.data_version = data_version(rows)
+        self.grid = grid
+        self._clusters = None
+        self.loaded_at = time.time()
+        self._tiles.clear()
+
+    def refresh(self) -> None:
+        rows = self.load_rows()
+        with self._lock:
+            self._install(rows)
+            self._refreshing = False
+
+    def _refresh_in_background(self) -> None:
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"Event index refresh failed: {e}")
+            with self._lock:
+                self._refreshing = False
+
+    def current(self) -> GridIndex:
+        if self.grid is None:
+            with self._lock:
+                if self.grid is None:
+                    # First load: build synchronously, holding the lock so
+                    # concurrent requests wait rather than all loading.
+                    self._install(self.load_rows())
+            return self.grid
+        if time.time() - self.loaded_at > self.refresh_seconds:
+            with self._lock:
+                start = not self._refreshing
+                self._refreshing = True
+            if start:
+                threading.Thread(target=self._refresh_in_background, daemon=True).start()
+        return self.grid
+
+    def tile(self, z: int, x: int, y: int) -> list[dict]:
+        """Events inside one slippy-map tile, cached until the next refresh."""
+        grid = self.current()
+        key = (grid.version, z, x, y)
+        with self._lock:
+            if key in self._tiles:
+                self._tiles.move_to_end(key)
+                return self._tiles[key]
+        rows = grid.query(*tile_bounds(z, x, y))
+        with self._lock:
+            self._tiles[key] = rows
+            if len(self._tiles) > TILE_CACHE_SIZE:
+                self._tiles.popitem(last=False)
+        return rows
+
+    def bbox(self, west: float, south: float, east: float, north: float,
+             limit: int | None = None, window: tuple[float, float] | None = None) -> list[dict]:
+        """
+        Events in a bounding box, assembled from cached tiles at the deepest
+        zoom where the box spans at most MAX_TILES_PER_QUERY tiles, so
+        neighbouring pans reuse most of their tiles. Time-filtered queries
+        go straight to the grid's per-cell timelines instead.
+        """
+        grid = self.current()
+        if window is not None:
+            return grid.query(west, south, east, north, limit=limit, window=window)
+        z = 18
+        while z > 0:
+            x0, y0 = lng_lat_to_tile(west, north, z)
+            x1, y1 = lng_lat_to_tile(east, south, z)
+            if (x1 - x0 + 1) * (y1 - y0 + 1) <= MAX_TILES_PER_QUERY:
+                break
+            z -= 1
+        x0, y0 = lng_lat_to_tile(west, north, z)
+        x1, y1 = lng_lat_to_tile(east, south, z)
+        out, seen = [], set()
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                for row in self.tile(z, x, y):
+                    # Points on a shared tile edge come back from both tiles
+                    if id(row) in seen:
+                        continue
+                    if west <= row["lng"] <= east and south <= row["lat"] <= north:
+                        seen.add(id(row))
+                        out.append(row)
+                        if limit is not None and len(out) >= limit:
+                            return out
+        return out
+
+    def clusters(self, west: float, south: float, east: float, north: float,
+                 zoom: float) -> list[dict]:
+        """Pre-aggregated clusters for a bbox; the hierarchy is rebuilt once per refresh."""
+        grid = self.current()
+        with self._lock:
+            clusters = self._clusters
+        if clusters is None or clusters.version != grid.version:
+            clusters = ClusterIndex(row for rows in grid.cells.values() for row in rows)
+            clusters.version = grid.version
+            with self._lock:
+                if grid is self.grid:
+                    self._clusters = clusters
+        return clusters.query(west, south, east, north, zoom)
@@ -0,0 +1,85 @@
+import pytest
+
+from geo.gazetteer import Gazetteer, build_venues
+
+LOCALITIES = {"adelaide", "hindmarsh"}
+LION_ARTS = (-34.9215, 138.5937)
+CITY_CENTROID = (-34.9285, 138.6007)
+PORT_PIRIE = (-33.1858, 138.0169)
+
+
+def event(location, address, point):
+    return {"location": location, "address": address, "lat": point[0], "lng": point[1]}
+
+
+def names(venues):
+    return sorted(v["name"] for v in venues)
+
+
+def test_venue_from_events_at_one_point():
+    [venue] = build_venues([
+        event("Lion Arts Factory", "68 North Terrace, Adelaide SA 5000", LION_ARTS),
+        event("Lion Arts Factory", "Lion Arts Factory, 68 North Tce, Adelaide", LION_ARTS),
+    ], LOCALITIES)
+
+    assert venue["name"] == "Lion Arts Factory" and venue["events"] == 2
+    assert (venue["lat"], venue["lng"]) == LION_ARTS
+
+
+def test_locality_centroid_is_not_a_venue(capsys):
+    # The geocoder put a suburb-only address on the city centroid, so a
+    # venue seen there may have been placed the same way
+    assert build_venues([
+        event("Rundle Mall Rooftop", "Adelaide SA 5000", CITY_CENTROID),
+        event("Rhino Room", "Rhino Room, Adelaide", CITY_CENTROID),
+        event("Various locations", None, CITY_CENTROID),
+    ], LOCALITIES) == []
+    assert "3 events (locality centroid)" in capsys.readouterr().out
+
+
+def test_point_with_several_street_addresses_is_not_a_venue(capsys):
+    assert build_venues([
+        event("Rhino Room", "13 Frome Street, Adelaide", CITY_CENTROID),
+        event("Her Majesty's Theatre", "58 Grote Street, Adelaide", CITY_CENTROID),
+    ], LOCALITIES) == []
+    assert "2 events (several street addresses)" in capsys.readouterr().out
+
+
+def test_point_outside_the_region_is_not_a_venue(capsys):
+    venues = build_venues([
+        event("Rhino Room", "13 Frome Street, Adelaide", PORT_PIRIE),
+        event("Lion Arts Factory", "68 North Terrace, Adelaide", LION_ARTS),
+    ], LOCALITIES)
+
+    assert names(venues) == ["Lion Arts Factory"]
+    assert "1 events (outside the region)" in capsys.readouterr().out
+
+
+@pytest.fixture
+def gazetteer():
+    return Gazetteer([
+        {"name": "Lion Arts Factory", "aliases": ["Lion Arts Factory, 68 North Terrace"],
+         "lat": LION_ARTS[0], "lng": LION_ARTS[1]},
+        {"name": "The Gov", "aliases": ["The Gov, 59 Port Road, Hindmarsh"], "lat": -34.9073, "lng": 138.5706},
+    ], LOCALITIES)
+
+
+@pytest.mark.parametrize("address, venue", [
+    ("Lion Art Factory", "Lion Arts Factory"),  # close spelling
+    ("The Gov Hindmarsh SA 5007", "The Gov"),  # locality and state trimmed
+    ("68 North Tce, Adelaide SA 5000", "Lion Arts Factory"),  # street address of an alias
+    ("Lion Arts Factory, Backstage Lane", "Lion Arts Factory"),  # name leads, rest unknown
+])
+def test_lookup_matches(gazetteer, address, venue):
+    assert gazetteer.lookup(address)["venue"] == venue
+
+
+@pytest.mark.parametrize("address", [
+    "125 North Terrace",  # same street, another number
+    "North Terrace",  # a whole street
+    "Hindmarsh",  # a suburb
+    "Various locations",
+    "Lion Arts",  # too little of the name
+])
+def test_lookup_rejects(gazetteer, address):
+    assert gazetteer.lookup(address) is None
@@ -0,0 +1,32 @@
+import pytest
+
+from geo.gazetteer import Gazetteer
+from geo.geocoding import Geocoder
+
+
+@pytest.fixture
+def geocoder(tmp_path):
+    gazetteer = Gazetteer([
+        {"name": "Adelaide Oval", "lat": -34.9156, "lng": 138.5961, "seeded": True},
+        {"name": "Rhino Room", "lat": -33.1858, "lng": 138.0169},  # derived, and wrong
+    ])
+    return Geocoder([], cache_path=str(tmp_path / "geocode.sqlite3"), gazetteer=gazetteer)
+
+
+def test_cached_answer_wins_over_derived_venue(geocoder):
+    geocoder.disk.set("Rhino Room", -34.9253, 138.6088, provider=geocoder.namespace)
+
+    assert geocoder.geocode_sync("Rhino Room") == {"lat": -34.9253, "lng": 138.6088}
+
+
+def test_seeded_venue_wins_over_cached_answer(geocoder):
+    geocoder.disk.set("Adelaide Oval", -34.9, 138.6, provider=geocoder.namespace)
+
+    assert geocoder.geocode_sync("Adelaide Oval") == {"lat": -34.9156, "lng": 138.5961}
+    assert geocoder.stats["gazetteer_hits"] == 1
+
+
+def test_derived_venue_stands_in_for_a_miss(geocoder):
+    assert geocoder.geocode_sync("Rhino Room") == {"lat": -33.1858, "lng": 138.0169}
+    geocoder.disk.set("Rhino Room", None, None, provider=geocoder.namespace)
+    assert geocoder.geocode_sync("Rhino Room") == {"lat": -33.1858, "lng": 138.0169}
@@ -1,10 +1,16 @@
 import os
 import json
 import hashlib
+import argparse
+from datetime import datetime
+import requests
 from typing import Any, Dict, List
 from dotenv import load_dotenv
 from supabase import create_client
 
+from dedup import find_duplicates, merge_into
+from utils.ndjson import read_records
+
 load_dotenv()
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), "scrapers", "data")
@@ -23,12 +29,33 @@ def key(source, link, title, date, location):
     return hashlib.sha256(base.encode()).hexdigest()
 
 
+def content_hash(row: Dict[str, Any]) -> str:
+    """Hash of every column a sync would write, used to spot changed rows."""
+    body = {k: v for k, v in row.items() if k not in (
+        "source_link_hash", "content_hash")}
+    return hashlib.sha256(json.dumps(body, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+
+def end_at(start, end):
+    """The end timestamp, or None when it is unreadable or before the start."""
+    try:
+        finish = datetime.fromisoformat(end) if end else None
+        if finish and start and finish < datetime.fromisoformat(start):
+            return None
+    except (TypeError, ValueError):
+        return None
+    return end
+
+
 def to_row(e: Dict[str, Any]) -> Dict[str, Any]:
-    return {
+    row = {
         "title": e.get("title"),
         "description": e.get("description"),
         "date": e.get("date"),
         "time": e.get("time"),
+        "start_at": e.get("start"),
+        "end_at": end_at(e.get("start"), e.get("end")),
+        "recurrence": e.get("recurrence"),
         "location": e.get("location"),
         "address": e.get("address"),
         "lat": fnum(e.get("lat")),
@@ -41,6 +68,8 @@ def to_row(e: Dict[str, Any]) -> Dict[str, Any]:
         "link": e.get("link"),
         "source_link_hash": key(e.get("source"), e.get("link"), e.get("title"), e.get("date"), e.get("location")),
     }
+    row["content_hash"] = content_hash(row)
+    return row
 
 
 def chunks(lst: List[Dict[str, Any]], n: int):
@@ -48,7 +77,127 @@ def chunks(lst: List[Dict[str, Any]], n: int):
         yield lst[i: i + n]
 
 
+def build_rows(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # De-duplicate by source_link_hash to avoid
+    # "ON CONFLICT DO UPDATE command cannot affect row a second time" errors
+    unique = {}
+    for e in events:
+        # Skip events without valid lat/lng
+        if fnum(e.get("lat")) is None or fnum(e.get("lng")) is None:
+            continue
+        k = key(e.get("source"), e.get("link"), e.get("title"), e.get("date"), e.get("location"))
+        # keep the first occurrence; copied since merging fills it in place
+        if k not in unique:
+            unique[k] = dict(e)
+    # Cross-source de-duplication (fuzzy title match near the same place and
+    # date). It runs on the normalized events, whose start/end it compares;
+    # rows rename those, so they are only built from the merged events.
+    keys, merged = list(unique), list(unique.values())
+    uf = find_duplicates(merged)
+    for i, e in enumerate(merged):
+        if uf.find(i) != i:
+            merge_into(merged[uf.find(i)], e)
+    rows = []
+    for i, e in enumerate(merged):
+        if uf.find(i) == i:
+            r = to_row(e)
+            # keyed as scraped, not on fields filled in from duplicates
+            r["source_link_hash"] = keys[i]
+            rows.append(r)
+    return rows
+
+
+def fetch_remote_hashes(sb, page_size: int = 1000) -> Dict[str, Dict[str, Any]]:
+    """source_link_hash -> {content_hash, source} for every row in the events table."""
+    remote = {}
+    start = 0
+    while True:
+        res = (
+            sb.table("events")
+            .select("source_link_hash,content_hash,source")
+            .order("source_link_hash")
+            .range(start, start + page_size - 1)
+            .execute()
+        )
+        page = res.data or []
+        for r in page:
+            if r.get("source_link_hash"):
+                remote[r["source_link_hash"]] = r
+        if len(page) < page_size:
+            return remote
+        start += page_size
+
+
+def plan_sync(rows: List[Dict[str, Any]], remote: Dict[str, Dict[str, Any]]):
+    """
+    Split local rows into inserts and updates, and find remote rows to delete.
+    Only rows from sources present locally are deleted, so events from other
+    producers (e.g. community posters) are left alone.
+    """
+    inserts, updates = [], []
+    for r in rows:
+        existing = remote.get(r["source_link_hash"])
+        if existing is None:
+            inserts.append(r)
+        elif existing.get("content_hash") != r["content_hash"]:
+            updates.append(r)
+    local_keys = {r["source_link_hash"] for r in rows}
+    local_sources = {r.get("source") for r in rows}
+    deletes = [
+        k for k, r in remote.items()
+        if k not in local_keys and r.get("source") in local_sources
+    ]
+    return inserts, updates, deletes
+
+
+def sync(sb, rows: List[Dict[str, Any]], dry_run: bool = False):
+    remote = fetch_remote_hashes(sb)
+    inserts, updates, deletes = plan_sync(rows, remote)
+    unchanged = len(rows) - len(inserts) - len(updates)
+    print(f"Remote has {len(remote)} events; local has {len(rows)}")
+    print(f"  insert:    {len(inserts)}")
+    print(f"  update:    {len(updates)}")
+    print(f"  delete:    {len(deletes)}")
+    print(f"  unchanged: {unchanged}")
+    if dry_run:
+        print("Dry run, nothing written")
+        return
+
+    for batch in chunks(inserts + updates, 500):
+        sb.table("events").upsert(
+            batch, on_conflict="source_link_hash").execute()
+    for batch in chunks(deletes, 200):
+        sb.table("events").delete().in_("source_link_hash", batch).execute()
+    print(f"Synced: {len(inserts)} inserted, {len(updates)} updated, "
+          f"{len(deletes)} deleted")
+
+
+def notify_api():
+    """Ask the API to rebuild its event index and tile caches after a load."""
+    url = os.getenv("API_REFRESH_URL")
+    token = os.getenv("INDEX_REFRESH_TOKEN")
+    if not url or not token:
+        return
+    try:
+        resp = requests.post(url, headers={"X-Refresh-Token": token}, timeout=60)
+        resp.raise_for_status()
+        print(f"API index refreshed: {resp.json()}")
+    except Exception as e:
+        print(f"API index refresh failed: {e}")
+
+
 def main():
+    parser = argparse.ArgumentParser(
+        description="Load normalized events into Supabase")
+    parser.add_argument("--sync", action="store_true",
+                        help="Only send inserts, updates and deletes relative to the remote table "
+                             "(needs migrations/001_events_content_hash.sql)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="With --sync, report the planned changes without writing")
+    parser.add_argument("--input", default=INPUT_FILE,
+                        help=f"Normalized events, .json or .ndjson (default: {INPUT_FILE})")
+    args = parser.parse_args()
+
     url = os.getenv("SUPABASE_URL")
     key_sb = os.getenv("SUPABASE_SERVICE_KEY") or os.getenv(
         "SUPABASE_ANON_KEY")
@@ -58,53 +207,28 @@ def main():
 
     sb = create_client(url, key_sb)
 
-    if not os.path.exists(INPUT_FILE):
-        raise SystemExit(f"Missing {INPUT_FILE}")
+    if not os.path.exists(args.input):
+        raise SystemExit(f"Missing {args.input}")
 
-    with open(INPUT_FILE, "r", encoding="utf-8") as f:
-        events = json.load(f)
+    events = read_records(args.input)
 
-    # Build rows and de-duplicate by source_link_hash to avoid
-    # "ON CONFLICT DO UPDATE command cannot affect row a second time" errors
-    dedup = {}
-    for e in events:
-        r = to_row(e)
-        # Skip rows without valid lat/lng
-        if r.get("lat") is None or r.get("lng") is None:
-            continue
-        k = r.get("source_link_hash")
-        if not k:
-            continue
-        # keep the first occurrence
-        if k not in dedup:
-            dedup[k] = r
-    # Cross-source de-duplication: collapse items that are likely the same event
-    # using a canonical fingerprint (title+date+rounded coords)
-
-    def canon_key(row: Dict[str, Any]) -> str:
-        t = (row.get("title") or "").strip().lower()
-        d = (row.get("date") or "").strip().lower()
-        lat = row.get("lat")
-        lng = row.get("lng")
-        try:
-            latr = round(float(lat), 4) if lat is not None else None
-            lngr = round(float(lng), 4) if lng is not None else None
-        except Exception:
-            latr, lngr = None, None
-        return f"{t}|{d}|{latr}|{lngr}"
-
-    canon_map: Dict[str, Dict[str, Any]] = {}
-    for r in dedup.values():
-        ck = canon_key(r)
-        if ck not in canon_map:
-            canon_map[ck] = r
-    rows = list(canon_map.values())
+    rows = build_rows(events)
+    if args.sync:
+        sync(sb, rows, dry_run=args.dry_run)
+        if not args.dry_run:
+            notify_api()
+        return
+
+    # content_hash is only kept up to date by --sync, whose column
+    # migrations/001_events_content_hash.sql adds
+    rows = [{k: v for k, v in r.items() if k != "content_hash"} for r in rows]
     total = 0
     for batch in chunks(rows, 500):
         sb.table("events").upsert(
             batch, on_conflict="source_link_hash").execute()
         total += len(batch)
     print(f"Upserted {total} events")
+    notify_api()
 
 
 if __name__ == "__main__":
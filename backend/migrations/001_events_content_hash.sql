@@ -0,0 +1,3 @@
+-- Per-row content hash written by load_to_supabase.py, used by `--sync`
+-- to send only changed rows.
+alter table events add column if not exists content_hash text;
@@ -0,0 +1,18 @@
+-- Structured event times written by load_to_supabase.py (parsed by
+-- backend/utils/dates.py), for date-range and "happening now" queries.
+alter table events add column if not exists start_at timestamptz;
+alter table events add column if not exists end_at timestamptz;
+alter table events add column if not exists recurrence jsonb;
+
+create index if not exists events_start_at_idx on events (start_at);
+create index if not exists events_end_at_idx on events (end_at);
+
+-- Combined spatial-temporal index: "events overlapping this time window
+-- inside this viewport" is one GiST scan. Events without an end are
+-- treated as instants; greatest() keeps an end before the start from
+-- failing the insert. Dropped first to replace the earlier unguarded index.
+drop index if exists events_when_where_idx;
+create index events_when_where_idx on events using gist (
+    tstzrange(start_at, greatest(start_at, coalesce(end_at, start_at)), '[]'),
+    box(point(lng, lat), point(lng, lat))
+) where start_at is not null and lat is not null and lng is not null;
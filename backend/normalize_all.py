@@ -1,47 +1,102 @@
 import os
 import json
-import requests
+import time
+import hashlib
+import argparse
+from datetime import datetime, timezone
 from dotenv import load_dotenv
 
+from dedup import deduplicate
+from utils import dates
+from utils.geocode import CACHE_PATH, build_geocoder, normalize_address
+from utils.ndjson import read_records
+
 load_dotenv()
 
 # ========= CONFIG =========
 DATA_DIR = os.path.join(os.path.dirname(__file__), "scrapers", "data")
 OUTPUT_FILE = os.path.join(DATA_DIR, "normalized_events.json")
-OPENCAGE_KEY = os.getenv("OPENCAGE_KEY")
+STATE_FILE = os.path.join(DATA_DIR, "normalize_state.json")
+DELTA_FILE = os.path.join(DATA_DIR, "normalized_delta.json")
+# Bump when normalizer output changes so incremental runs redo every record
+NORMALIZE_VERSION = 2
+GEOCODE_WORKERS = int(os.getenv("GEOCODE_WORKERS", 8))
+# Providers tried in order; rate limits come from OPENCAGE_RPS etc.
+# (OpenCage free tier is 1/s)
+GEOCODE_PROVIDERS = os.getenv("GEOCODE_PROVIDERS", "opencage")
+
+geocoder = build_geocoder(GEOCODE_PROVIDERS, cache_path=CACHE_PATH)
+
+# Coordinates resolved by the geocoding stage, keyed on normalized address
+resolved_coords = {}
 
 # ========= HELPERS =========
 
 
 def geocode_opencage(address: str):
-    """Geocode address using OpenCage API."""
-    if not address:
-        return {"lat": None, "lng": None}
-    try:
-        url = "https://api.opencagedata.com/geocode/v1/json"
-        params = {"q": f"{address}, South Australia",
-                  "key": OPENCAGE_KEY, "limit": 1}
-        resp = requests.get(url, params=params, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-        if data.get("results"):
-            coords = data["results"][0]["geometry"]
-            print(
-                f"Geocoded: {address[:50]}... -> {coords['lat']:.4f}, {coords['lng']:.4f}")
-            return {"lat": coords["lat"], "lng": coords["lng"]}
-    except Exception as e:
-        print(f"Geocoding failed for {address}: {e}")
-    return {"lat": None, "lng": None}
+    """Geocode address through the shared geocoder (cache first, then the provider chain)."""
+    return geocoder.geocode_sync(address)
+
+
+def geocode_addresses(addresses, workers: int = GEOCODE_WORKERS):
+    """
+    Resolve a batch of addresses concurrently, one lookup per distinct
+    normalized address. Results are stored in `resolved_coords`.
+    """
+    pending = {}
+    for address in addresses:
+        key = normalize_address(address)
+        if key and key not in resolved_coords and key not in pending:
+            pending[key] = address
+    if not pending:
+        return resolved_coords
+
+    print(f"Geocoding {len(pending)} distinct addresses ({workers} concurrent)...")
+    resolved_coords.update(geocoder.geocode_many(pending.values(), concurrency=workers))
+    print(f"Geocoder: {geocoder.stats}")
+    return resolved_coords
+
+
+def lookup_coords(address):
+    """Coordinates for an address, from the geocoding stage when it ran."""
+    coords = resolved_coords.get(normalize_address(address))
+    if coords is None:
+        coords = geocode_opencage(address)
+    return coords
+
+# ========= ADDRESSES =========
+
+
+def address_adelaidefestival(raw):
+    return raw.get("address")
+
+
+def address_eventbrite(raw):
+    loc = raw.get("Location", "").split("\n")
+    return loc[2] if len(loc) > 2 else None
+
+
+def address_google(raw):
+    return ", ".join(raw.get("address", [])) if raw.get("address") else None
+
+
+def address_southaustralia(raw):
+    return raw.get("full_address")
+
+
+def address_ticketmaster(raw):
+    return raw.get("location") or None
 
 # ========= NORMALIZERS =========
 
 
 def normalize_adelaidefestival(raw):
-    coords = geocode_opencage(raw.get("address"))
+    coords = lookup_coords(address_adelaidefestival(raw))
     return {
         "title": raw.get("title"),
         "date": raw.get("date"),
         "time": "TBD",
+        **dates.parse_festival(raw.get("date")),
         "location": None,
         "address": raw.get("address"),
         "lat": coords["lat"],
@@ -63,22 +118,27 @@ def normalize_eventbrite(raw):
         parts = dt.split("·")
         date = parts[0].replace("Date and time", "").strip()
         time = parts[1].strip() if len(parts) > 1 else None
+    elif dt and dt != "TBD":
+        # All-day events are given without a time
+        date = dt.replace("Date and time", "").strip()
 
     loc = raw.get("Location", "").split("\n")
     location = loc[1] if len(loc) > 1 else None
-    address = loc[2] if len(loc) > 2 else None
-    coords = geocode_opencage(address)
+    address = address_eventbrite(raw)
+    coords = lookup_coords(address)
 
     return {
         "title": raw.get("Title"),
         "date": date,
         "time": time,
+        **dates.parse_eventbrite(dt),
         "location": location,
         "address": address,
         "lat": coords["lat"],
         "lng": coords["lng"],
-        "price": None,
-        "description": None,
+        # Only the browserless scraper reads these
+        "price": raw.get("Price"),
+        "description": raw.get("Description"),
         "features": [],
         "organiser": raw.get("Organizer"),
         "category": raw.get("Category") or "General",
@@ -88,12 +148,14 @@ def normalize_eventbrite(raw):
 
 
 def normalize_google(raw):
-    addr = ", ".join(raw.get("address", [])) if raw.get("address") else None
-    coords = geocode_opencage(addr)
+    addr = address_google(raw)
+    coords = lookup_coords(addr)
     return {
         "title": raw.get("title"),
         "date": raw.get("date", {}).get("start_date"),
         "time": raw.get("date", {}).get("when"),
+        **dates.parse_google(raw.get("date", {}).get("start_date"),
+                              raw.get("date", {}).get("when")),
         "location": raw.get("address", [None])[0],
         "address": addr,
         "lat": coords["lat"],
@@ -109,11 +171,12 @@ def normalize_google(raw):
 
 
 def normalize_southaustralia(raw):
-    coords = geocode_opencage(raw.get("full_address"))
+    coords = lookup_coords(address_southaustralia(raw))
     return {
         "title": raw.get("title"),
         "date": raw.get("dates"),
         "time": "TBD",
+        **dates.parse_southaustralia(raw.get("dates")),
         "location": raw.get("location"),
         "address": raw.get("full_address"),
         "lat": coords["lat"],
@@ -140,14 +203,13 @@ def normalize_ticketmaster(raw):
     organizer = organizer or None
     description = description or None
 
-    address = raw.get("location", "")
-    coords = geocode_opencage(address) if address else {
-        "lat": None, "lng": None}
+    coords = lookup_coords(address_ticketmaster(raw))
 
     return {
         "title": raw.get("title"),
         "date": raw.get("date"),
         "time": raw.get("time"),
+        **dates.parse_ticketmaster(raw.get("date"), raw.get("time")),
         "location": raw.get("venue"),
         "address": raw.get("location"),
         "lat": coords["lat"],
@@ -172,102 +234,213 @@ NORMALIZERS = {
     "ticketmaster.json": normalize_ticketmaster,
 }
 
+ADDRESSES = {
+    "adelaidefestival.json": address_adelaidefestival,
+    "eventbrite.json": address_eventbrite,
+    "google_events.json": address_google,
+    "southaustralia.json": address_southaustralia,
+    "ticketmaster.json": address_ticketmaster,
+}
 
-def deduplicate_events(events):
-    """Remove duplicate normalized events, merging useful info."""
-    seen = {}
-    unique = []
-    for ev in events:
-        key = (
-            ev.get("title", "").strip().lower(),
-            (ev.get("location") or ev.get("address", "")).strip().lower(),
-            (ev.get("date") or "")[:10],
+
+def raw_key(raw, source_name):
+    """Identity of a raw record within its source, for dropping exact repeats."""
+    if source_name == "ticketmaster":
+        return (
+            raw.get("title", "").lower(),
+            raw.get("venue", "").lower(),
+            (raw.get("date") or "")[:10],
         )
-        if key not in seen:
-            seen[key] = ev
-            unique.append(ev)
-        else:
-            ex = seen[key]
-            if ev.get("time") and ev.get("time") != ex.get("time"):
-                if "Multiple times" not in str(ex.get("time")):
-                    ex["time"] = f"{ex['time']} (Multiple times available)"
-            if not ex.get("description") and ev.get("description"):
-                ex["description"] = ev["description"]
-            if not ex.get("organiser") and ev.get("organiser"):
-                ex["organiser"] = ev["organiser"]
-    return unique
+    if source_name == "eventbrite":
+        loc_raw = raw.get("Location", "")
+        location = loc_raw.split("\n")[1] if "\n" in loc_raw else loc_raw
+        date_raw = raw.get("Date & Time", "")
+        date = date_raw.split("·")[0].strip(
+        ) if "·" in date_raw else date_raw
+        return (raw.get("Title", "").lower(), location.lower(), date)
+    title = (raw.get("title") or raw.get("Title") or "").lower()
+    address_field = raw.get("address")
+    location = (
+        ", ".join(address_field) if isinstance(address_field, list) else
+        (raw.get("location") or raw.get("venue") or address_field or "")
+    ).lower()
+    date_field = raw.get("date")
+    date = (
+        date_field.get("start_date", "") if isinstance(date_field, dict)
+        else (date_field or raw.get("dates") or raw.get("Date & Time") or "")
+    )
+    return (title, location, date)
 
 
 def deduplicate_raw_events(raw_events, source_name):
-    """Deduplicate raw events before normalization."""
-    seen = {}
+    """Drop exact repeats within one source before normalization; cross-source matching is in dedup.py."""
+    seen = set()
     unique = []
     for raw in raw_events:
-        if source_name == "ticketmaster":
-            key = (
-                raw.get("title", "").lower(),
-                raw.get("venue", "").lower(),
-                (raw.get("date") or "")[:10],
-            )
-        elif source_name == "eventbrite":
-            loc_raw = raw.get("Location", "")
-            location = loc_raw.split("\n")[1] if "\n" in loc_raw else loc_raw
-            date_raw = raw.get("Date & Time", "")
-            date = date_raw.split("·")[0].strip(
-            ) if "·" in date_raw else date_raw
-            key = (raw.get("Title", "").lower(), location.lower(), date)
-        else:
-            title = (raw.get("title") or raw.get("Title") or "").lower()
-            address_field = raw.get("address")
-            location = (
-                ", ".join(address_field) if isinstance(address_field, list) else
-                (raw.get("location") or raw.get("venue") or address_field or "")
-            ).lower()
-            date_field = raw.get("date")
-            date = (
-                date_field.get("start_date", "") if isinstance(date_field, dict)
-                else (date_field or raw.get("dates") or raw.get("Date & Time") or "")
-            )
-            key = (title, location, date)
+        key = raw_key(raw, source_name)
         if key not in seen:
-            seen[key] = raw
+            seen.add(key)
             unique.append(raw)
     return unique
 
 
-def load_and_normalize():
-    all_events = []
-    total_files = len(NORMALIZERS)
+def fingerprint(filename, raw):
+    """Stable hash of a raw record, tied to its source and the normalizer version."""
+    base = json.dumps([NORMALIZE_VERSION, filename, raw],
+                      sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(base.encode("utf-8")).hexdigest()
 
-    for i, (filename, normalizer) in enumerate(NORMALIZERS.items(), 1):
-        path = os.path.join(DATA_DIR, filename)
-        if not os.path.exists(path):
-            print(f"Missing file: {filename}")
-            continue
 
-        print(f"\nProcessing {filename} ({i}/{total_files})...")
-        with open(path, "r", encoding="utf-8") as f:
-            raw_events = json.load(f)
-        print(f"Found {len(raw_events)} raw events...")
+def event_key(ev):
+    """Identity of a normalized event (same fields as load_to_supabase's source_link_hash)."""
+    base = "|".join(ev.get(k) or "" for k in ("source", "link", "title", "date", "location"))
+    return hashlib.sha256(base.encode("utf-8")).hexdigest()
 
-        unique_raw = deduplicate_raw_events(
-            raw_events, filename.replace(".json", ""))
-        print(
-            f"Processing {len(unique_raw)} unique events (geocoding each)...")
 
-        for j, raw in enumerate(unique_raw, 1):
-            if j % 5 == 0:
-                print(f"  Progress: {j}/{len(unique_raw)} events processed...")
-            all_events.append(normalizer(raw))
+def load_state():
+    if not os.path.exists(STATE_FILE):
+        return {}
+    with open(STATE_FILE, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    if state.get("version") != NORMALIZE_VERSION:
+        return {}
+    return state.get("records", {})
 
-        print(f"Completed {filename}: {len(unique_raw)} events normalized")
 
-    return deduplicate_events(all_events)
+def save_state(records):
+    with open(STATE_FILE, "w", encoding="utf-8") as f:
+        json.dump({"version": NORMALIZE_VERSION, "records": records},
+                  f, ensure_ascii=False)
 
 
-if __name__ == "__main__":
-    events = load_and_normalize()
+def compute_delta(previous, current):
+    """Added, changed and removed events between two normalized outputs."""
+    before = {event_key(ev): ev for ev in previous}
+    after = {event_key(ev): ev for ev in current}
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "added": [ev for k, ev in after.items() if k not in before],
+        "changed": [ev for k, ev in after.items() if k in before and before[k] != ev],
+        "removed": [ev for k, ev in before.items() if k not in after],
+    }
+
+
+def source_path(filename):
+    """A source's scraped file: the streaming pipeline's NDJSON checkpoint when it is newer."""
+    paths = [os.path.join(DATA_DIR, name)
+             for name in (filename, filename.replace(".json", ".ndjson"))]
+    paths = [p for p in paths if os.path.exists(p)]
+    return max(paths, key=os.path.getmtime) if paths else None
+
+
+def read_source(filename):
+    """(fingerprint, raw) pairs for one scraped file, repeats dropped; None if it is missing."""
+    path = source_path(filename)
+    if path is None:
+        print(f"Missing file: {filename}")
+        return None
+    raw_events = read_records(path)
+    print(f"Found {len(raw_events)} raw events in {os.path.basename(path)}...")
+    unique_raw = [
+        (fingerprint(filename, raw), raw)
+        for raw in deduplicate_raw_events(raw_events, filename.replace(".json", ""))
+    ]
+    print(f"{len(unique_raw)} unique events")
+    return unique_raw
+
+
+def normalize_source(filename, unique_raw, previous=None):
+    """
+    Normalized records for one source, keyed on fingerprint. Records in
+    `previous` are carried forward; ones that failed to geocode are redone,
+    since the address may resolve now.
+    """
+    records, pending = {}, []
+    for fp, raw in unique_raw:
+        prev = (previous or {}).get(fp)
+        if prev and (prev.get("lat") is not None or not prev.get("address")):
+            records[fp] = prev
+        else:
+            pending.append((fp, raw))
+    if previous is not None:
+        print(f"Incremental {filename}: reusing {len(records)} records, "
+              f"normalizing {len(pending)} new or changed")
+
+    geocode_addresses(ADDRESSES[filename](raw) for _, raw in pending)
+    normalizer = NORMALIZERS[filename]
+    for fp, raw in pending:
+        records[fp] = normalizer(raw)
+    print(f"Completed {filename}: {len(pending)} events normalized")
+    return records
+
+
+def merge_sources(sources, records):
+    """Cross-source deduplication of every source's records, in source order."""
+    # deduplicate merges fields in place, so hand it copies
+    all_events = [dict(records[fp])
+                  for unique_raw in sources.values() for fp, _ in unique_raw]
+    return deduplicate(all_events)
+
+
+def load_and_normalize(incremental: bool = False):
+    sources = {}
+    total_files = len(NORMALIZERS)
+    previous = load_state() if incremental else {}
+    records = {}
+
+    for i, filename in enumerate(NORMALIZERS, 1):
+        print(f"\nLoading {filename} ({i}/{total_files})...")
+        unique_raw = read_source(filename)
+        if unique_raw is not None:
+            sources[filename] = unique_raw
+
+    # Geocode every distinct address across all sources in one concurrent pass
+    start = time.monotonic()
+    geocode_addresses(
+        ADDRESSES[filename](raw)
+        for filename, unique_raw in sources.items()
+        for fp, raw in unique_raw
+        if fp not in previous
+    )
+    print(f"Geocoding stage finished in {time.monotonic() - start:.1f}s")
+
+    for filename, unique_raw in sources.items():
+        records.update(normalize_source(
+            filename, unique_raw, previous if incremental else None))
+
+    if incremental:
+        save_state(records)
+    return merge_sources(sources, records)
+
+
+def write_outputs(events, previous_events):
+    """Write the normalized events and the delta against the previous output."""
     os.makedirs(DATA_DIR, exist_ok=True)
     with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
         json.dump(events, f, indent=2, ensure_ascii=False)
     print(f"Normalized {len(events)} events -> {OUTPUT_FILE}")
+
+    delta = compute_delta(previous_events, events)
+    with open(DELTA_FILE, "w", encoding="utf-8") as f:
+        json.dump(delta, f, indent=2, ensure_ascii=False)
+    print(f"Delta: {len(delta['added'])} added, {len(delta['changed'])} changed, "
+          f"{len(delta['removed'])} removed -> {DELTA_FILE}")
+
+
+def read_output():
+    if not os.path.exists(OUTPUT_FILE):
+        return []
+    with open(OUTPUT_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Normalize scraped events into normalized_events.json")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only normalize raw records that are new or changed since the last incremental run")
+    args = parser.parse_args()
+
+    previous_events = read_output()
+    events = load_and_normalize(incremental=args.incremental)
+    write_outputs(events, previous_events)
@@ -0,0 +1,195 @@
+"""
+Nightly refresh: every scraper, normalization and the Supabase load in one run.
+
+Scrapers run in parallel as separate processes, each with its own timeout.
+A source is normalized (and geocoded) as soon as its scrape finishes, while
+the slower ones are still running; the cross-source dedup and the load run
+once all of them are done. A source that fails, times out or is not
+selected keeps its data from the previous run.
+
+    python pipeline.py
+    python pipeline.py --sources ticketmaster,southaustralia --skip-load
+    python pipeline.py --stream    # records flow straight through, see streaming.py
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import normalize_all
+from normalize_all import (NORMALIZERS, load_state, merge_sources, normalize_source,
+                           read_output, read_source, save_state, write_outputs)
+
+# ========= CONFIG =========
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRAPERS_DIR = os.path.join(BACKEND_DIR, "scrapers")
+LOG_DIR = os.path.join(normalize_all.DATA_DIR, "logs")
+DEFAULT_TIMEOUT = int(os.getenv("PIPELINE_TIMEOUT", 900))
+NORMALIZE_WORKERS = int(os.getenv("PIPELINE_NORMALIZE_WORKERS", 3))
+
+# source -> (scraper command, file it writes under scrapers/data, timeout in seconds)
+SOURCES = {
+    "eventbrite": (["eventbrite_scraper.py", "--pages",
+                    os.getenv("EVENTBRITE_PAGES", "3")],
+                   "eventbrite.json",
+                   int(os.getenv("EVENTBRITE_TIMEOUT", DEFAULT_TIMEOUT))),
+    "adelaidefestival": (["adelaidefestival_scraper.py"], "adelaidefestival.json",
+                         int(os.getenv("ADELAIDEFESTIVAL_TIMEOUT", DEFAULT_TIMEOUT))),
+    "experienceadelaide": (["experienceadelaide_scraper.py"], "experienceadelaide.json",
+                           int(os.getenv("EXPERIENCEADELAIDE_TIMEOUT", DEFAULT_TIMEOUT))),
+    "google_events": (["google_events_scraper.py"], "google_events.json",
+                      int(os.getenv("GOOGLE_EVENTS_TIMEOUT", DEFAULT_TIMEOUT))),
+    "southaustralia": (["southaustralia_scraper.py"], "southaustralia.json",
+                       int(os.getenv("SOUTHAUSTRALIA_TIMEOUT", DEFAULT_TIMEOUT))),
+    "ticketmaster": (["ticketmaster_scraper.py"], "ticketmaster.json",
+                     int(os.getenv("TICKETMASTER_TIMEOUT", DEFAULT_TIMEOUT))),
+}
+
+
+def run_scraper(source: str, timeout: int) -> tuple[str, float]:
+    """Run one scraper in its own process; (status, seconds). Output goes to logs/<source>.log."""
+    command, _, _ = SOURCES[source]
+    os.makedirs(LOG_DIR, exist_ok=True)
+    log_path = os.path.join(LOG_DIR, f"{source}.log")
+    start = time.monotonic()
+    with open(log_path, "w", encoding="utf-8") as log:
+        proc = subprocess.Popen([sys.executable, *command], cwd=SCRAPERS_DIR,
+                                stdout=log, stderr=subprocess.STDOUT)
+        try:
+            code = proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+            return f"timed out after {timeout}s", time.monotonic() - start
+    status = "ok" if code == 0 else f"exit {code} (see {log_path})"
+    return status, time.monotonic() - start
+
+
+def normalize(source: str, previous):
+    """Normalize a source's scraped file; (source file, unique raw, records, seconds)."""
+    filename = SOURCES[source][1]
+    start = time.monotonic()
+    if filename not in NORMALIZERS:
+        return filename, None, {}, 0.0
+    unique_raw = read_source(filename)
+    records = normalize_source(filename, unique_raw, previous) if unique_raw else {}
+    return filename, unique_raw, records, time.monotonic() - start
+
+
+def run_load(dry_run: bool) -> tuple[str, float]:
+    command = [sys.executable, "load_to_supabase.py", "--sync"]
+    if dry_run:
+        command.append("--dry-run")
+    start = time.monotonic()
+    code = subprocess.call(command, cwd=BACKEND_DIR)
+    return ("ok" if code == 0 else f"exit {code}"), time.monotonic() - start
+
+
+def print_report(report, stages, total):
+    print("\n========= PIPELINE REPORT =========")
+    print(f"{'source':<20}{'scrape':>10}{'normalize':>11}{'events':>8}  status")
+    for source, row in report.items():
+        normalize_time = f"{row['normalize']:.1f}s" if "normalize" in row else "-"
+        print(f"{source:<20}{row['scrape']:>9.1f}s{normalize_time:>11}"
+              f"{row.get('events', '-'):>8}  {row['status']}")
+    for stage, seconds in stages.items():
+        print(f"{stage:<20}{seconds:>9.1f}s")
+    print(f"{'total':<20}{total:>9.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Scrape every source in parallel, normalize and load into Supabase")
+    parser.add_argument("--sources", default=",".join(SOURCES),
+                        help=f"Comma-separated sources to scrape; the others are normalized from "
+                             f"their last data (default: all of {', '.join(SOURCES)})")
+    parser.add_argument("--timeout", type=int,
+                        help="Per-source scrape timeout in seconds, overriding the configured ones")
+    parser.add_argument("--skip-scrape", action="store_true",
+                        help="Normalize the data already on disk without scraping")
+    parser.add_argument("--skip-load", action="store_true",
+                        help="Stop after writing normalized_events.json")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Report the planned Supabase changes without writing")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only normalize raw records that are new or changed since the last incremental run")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream records from the scrapers through normalization into Supabase "
+                             "as they are scraped, with NDJSON checkpoints")
+    args = parser.parse_args()
+
+    sources = [s.strip() for s in args.sources.split(",") if s.strip()]
+    unknown = [s for s in sources if s not in SOURCES]
+    if unknown:
+        raise SystemExit(f"Unknown sources: {', '.join(unknown)}")
+
+    if args.stream:
+        import streaming
+
+        timeouts = {s: args.timeout or SOURCES[s][2] for s in sources}
+        streaming.run({s: (SOURCES[s][0], SOURCES[s][1], timeouts[s]) for s in sources},
+                      dry_run=args.dry_run, skip_load=args.skip_load)
+        return
+
+    pipeline_start = time.monotonic()
+    previous_events = read_output()
+    previous = load_state() if args.incremental else None
+    if args.skip_scrape:
+        sources = []
+    report = {s: {"scrape": 0.0, "status": "ok" if s in sources else "not scraped"}
+              for s in SOURCES}
+    scraped, records = {}, {}
+
+    with ThreadPoolExecutor(max_workers=max(1, len(sources))) as scrapers, \
+            ThreadPoolExecutor(max_workers=NORMALIZE_WORKERS) as normalizers:
+        # Sources not being scraped are normalized from their last data straight away
+        pending = {normalizers.submit(normalize, s, previous): s
+                   for s in SOURCES if s not in sources}
+        if sources:
+            print(f"Scraping {len(sources)} sources in parallel...")
+        scrapes = {scrapers.submit(run_scraper, s, args.timeout or SOURCES[s][2]): s
+                   for s in sources}
+        for future in as_completed(scrapes):
+            source = scrapes[future]
+            status, seconds = future.result()
+            if status != "ok":
+                status += ", using previous data"
+            report[source].update(scrape=seconds, status=status)
+            print(f"[{source}] scrape {status} in {seconds:.1f}s")
+            # Normalize now, while the other scrapers are still running
+            pending[normalizers.submit(normalize, source, previous)] = source
+        for future in as_completed(pending):
+            source = pending[future]
+            try:
+                filename, unique_raw, source_records, seconds = future.result()
+            except Exception as exc:
+                report[source]["status"] += f", normalize failed: {exc}"
+                continue
+            if unique_raw is None:
+                continue
+            scraped[filename] = unique_raw
+            records.update(source_records)
+            report[source].update(normalize=seconds, events=len(unique_raw))
+    stages = {"scrape+normalize": time.monotonic() - pipeline_start}
+
+    # Keep normalize_all's source order so dedup picks the same primary events
+    start = time.monotonic()
+    ordered = {filename: scraped[filename] for filename in NORMALIZERS if filename in scraped}
+    if args.incremental:
+        save_state(records)
+    events = merge_sources(ordered, records)
+    write_outputs(events, previous_events)
+    stages["dedup+write"] = time.monotonic() - start
+
+    if not args.skip_load:
+        status, seconds = run_load(args.dry_run)
+        stages["load"] = seconds
+        print(f"Load {status}")
+
+    print_report(report, stages, time.monotonic() - pipeline_start)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,63 @@
 import os
 import json
-import requests
+import argparse
 from bs4 import BeautifulSoup
-import time
+
+from utils.fetch import fetch_iter, make_session
+from utils.page_store import PageStore
+from utils.stream import emit_ndjson
 
 DATA_PATH = os.path.join(os.path.dirname(
     __file__), "data", "adelaidefestival.json")
 BASE_URL = "https://www.adelaidefestivalcentre.com.au"
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+                  "AppleWebKit/605.1.15 (KHTML, like Gecko) "
+                  "Version/16.4 Safari/605.1.15"
+}
+# Bump when parse_detail changes, so stored pages are parsed again
+PARSER_VERSION = 1
+
+
+def parse_detail(html, link):
+    """Extract one event from its detail page."""
+    detail_soup = BeautifulSoup(html, "html.parser")
+
+    title_el = detail_soup.select_one("h1")
+    title = title_el.get_text(strip=True) if title_el else None
+
+    date_el = detail_soup.select_one(".event-date, time, .date")
+    date = date_el.get_text(strip=True) if date_el else None
+
+    desc_el = detail_soup.select_one(".event-description, .rte, p")
+    description = desc_el.get_text(
+        " ", strip=True) if desc_el else None
+
+    address = None
+    addr_el = detail_soup.find("address") or detail_soup.select_one(
+        ".event-location, .venue, .location")
+    if addr_el:
+        address = addr_el.get_text(" ", strip=True)
+
+    return {
+        "title": title,
+        "date": date,
+        "description": description,
+        "address": address,
+        "link": link
+    }
 
 
-def scrape_adelaidefestival():
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
-                      "AppleWebKit/605.1.15 (KHTML, like Gecko) "
-                      "Version/16.4 Safari/605.1.15"
-    }
+def iter_adelaidefestival():
+    """Yield events from the Adelaide Festival Centre as their detail pages come in."""
+    session = make_session(HEADERS)
 
-    events = []
+    links = []
     page_url = f"{BASE_URL}/whats-on"
 
     while page_url:
         print(f"Fetching {page_url}")
-        resp = requests.get(page_url, headers=headers)
+        resp = session.get(page_url)
         resp.raise_for_status()
         soup = BeautifulSoup(resp.text, "html.parser")
 
@@ -32,43 +68,7 @@ def scrape_adelaidefestival():
                 continue
             if not link.startswith("http"):
                 link = BASE_URL + link
-
-            # Visit detail page for full info
-            try:
-                detail_resp = requests.get(link, headers=headers)
-                detail_resp.raise_for_status()
-                detail_soup = BeautifulSoup(detail_resp.text, "html.parser")
-
-                title_el = detail_soup.select_one("h1")
-                title = title_el.get_text(strip=True) if title_el else None
-
-                date_el = detail_soup.select_one(".event-date, time, .date")
-                date = date_el.get_text(strip=True) if date_el else None
-
-                desc_el = detail_soup.select_one(".event-description, .rte, p")
-                description = desc_el.get_text(
-                    " ", strip=True) if desc_el else None
-
-                address = None
-                addr_el = detail_soup.find("address") or detail_soup.select_one(
-                    ".event-location, .venue, .location")
-                if addr_el:
-                    address = addr_el.get_text(" ", strip=True)
-
-                events.append({
-                    "title": title,
-                    "date": date,
-                    "description": description,
-                    "address": address,
-                    "link": link
-                })
-
-                print(f"{title} ({date})")
-
-                time.sleep(0.5)  # politeness delay to reduce load
-
-            except Exception as e:
-                print(f"Failed to scrape {link}: {e}")
+            links.append(link)
 
         # Pagination
         next_btn = soup.select_one("nav[aria-label=Pagination] a[rel=next]")
@@ -77,6 +77,17 @@ def scrape_adelaidefestival():
         else:
             page_url = None
 
+    # Visit detail pages for full info (concurrent, per-host rate limited)
+    for event in fetch_iter(links, parse_detail, session=session,
+                            store=PageStore("adelaidefestival", PARSER_VERSION)):
+        if event:
+            print(f"{event['title']} ({event['date']})")
+            yield event
+
+
+def scrape_adelaidefestival():
+    events = list(iter_adelaidefestival())
+
     # Save JSON
     os.makedirs(os.path.dirname(DATA_PATH), exist_ok=True)
     with open(DATA_PATH, "w", encoding="utf-8") as f:
@@ -87,4 +98,11 @@ def scrape_adelaidefestival():
 
 
 if __name__ == "__main__":
-    scrape_adelaidefestival()
+    parser = argparse.ArgumentParser(description="Scrape Adelaide Festival Centre events")
+    parser.add_argument("--ndjson", action="store_true",
+                        help="Stream events to stdout as NDJSON instead of writing the JSON file")
+    args = parser.parse_args()
+    if args.ndjson:
+        emit_ndjson(iter_adelaidefestival())
+    else:
+        scrape_adelaidefestival()
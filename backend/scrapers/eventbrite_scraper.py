@@ -1,19 +1,148 @@
 import argparse
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
+import sys
+import threading
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+from utils.browser import DriverPool
 from utils.constants import (
     EVENTBRITE_BASE_URL,
+    EVENTBRITE_DRIVERS,
+    EVENTBRITE_HEADERS,
+    EVENTBRITE_MODE,
     EVENT_CARD_SELECTOR,
     OUTPUT_CSV,
     OUTPUT_JSON,
     WAIT_TIME,
 )
-from utils.helpers import export_to_csv, export_to_json, parse_event_card
+from utils.fetch import fetch_iter, make_session
+from utils.helpers import (
+    export_to_csv,
+    export_to_json,
+    parse_event_detail,
+    parse_event_html,
+    parse_listing_html,
+    read_card,
+)
+from utils.page_store import PageStore
 from utils.paths import source_paths
+from utils.stream import emit_ndjson
+
+# Listing pages are taken off the shared queue before detail pages, so every
+# detail URL is known early and no browser sits idle waiting for one
+LISTING, DETAIL = 0, 1
+# Bump when parse_event_html changes, so stored pages are parsed again
+PARSER_VERSION = 2
+
+
+def scrape_listing(driver, page: int) -> list[tuple[str, str]]:
+    """(title, URL) of each card on one listing page."""
+    url = EVENTBRITE_BASE_URL.format(page=page)
+    print(f"\nLoading: {url}")
+    try:
+        driver.get(url)
+    except TimeoutException:
+        pass
+
+    # Wait until at least one card is present or timeout (10s)
+    try:
+        WebDriverWait(driver, 10).until(
+            EC.presence_of_element_located(
+                (By.CSS_SELECTOR, EVENT_CARD_SELECTOR))
+        )
+    except TimeoutException:
+        # Save page for inspection on failures
+        with open(f"debug_page_{page}.html", "w", encoding="utf-8") as f:
+            f.write(driver.page_source)
+        print(f"No cards found. Saved debug_page_{page}.html")
+        return []
+
+    cards = driver.find_elements(By.CSS_SELECTOR, EVENT_CARD_SELECTOR)
+    print(f"Found {len(cards)} cards on page {page}")
+    return [link for link in map(read_card, cards) if link]
+
+
+def iter_eventbrite(pages: int = 1, drivers: int = EVENTBRITE_DRIVERS, links=(), report=None):
+    """
+    Yield Eventbrite events as their detail pages are read. A pool of
+    headless browsers works through the listing pages and the detail pages
+    they link to from one queue. `pages` is a count or a list of page
+    numbers; `links` are (title, URL) detail pages already known. `report`
+    (a dict) receives the number of pages given up on as "failed".
+    """
+    report = report if report is not None else {}
+    seen, seen_lock = {title for title, _ in links}, threading.Lock()
+    pool = DriverPool(max(1, drivers))
+
+    def handle(driver, task):
+        kind, arg = task
+        if kind == "listing":
+            for title, url in scrape_listing(driver, arg):
+                with seen_lock:
+                    if title in seen:
+                        continue
+                    seen.add(title)
+                pool.put(DETAIL, ("detail", (title, url)))
+            return None
+        data = parse_event_detail(driver, *arg)
+        print(f"{data['Title']}")
+        return [data]
+
+    for page in (range(1, pages + 1) if isinstance(pages, int) else pages):
+        pool.put(LISTING, ("listing", page))
+    for link in links:
+        pool.put(DETAIL, ("detail", link))
+    yield from pool.run(handle)
+    report["failed"] = report.get("failed", 0) + len(pool.skipped)
+
+
+def iter_eventbrite_http(pages: int = 1, drivers: int = EVENTBRITE_DRIVERS, report=None):
+    """
+    Yield Eventbrite events without a browser: listing and detail pages are
+    fetched over pooled HTTP and read from the JSON-LD / server data they
+    embed. Pages that do not parse are handed to the browser pool. `report`
+    is filled in as iter_eventbrite's.
+    """
+    report = report if report is not None else {}
+    session = make_session(EVENTBRITE_HEADERS)
+    listing_urls = [EVENTBRITE_BASE_URL.format(page=page) for page in range(1, pages + 1)]
+    links, retry_pages = [], []
+    for page, page_links in enumerate(fetch_iter(listing_urls, lambda html, url: parse_listing_html(html),
+                                                 session=session), 1):
+        if page_links:
+            print(f"Found {len(page_links)} events on page {page}")
+            links.extend(page_links)
+        else:
+            retry_pages.append(page)
+
+    # Same de-duplication by title as the browser path
+    unique, seen = [], set()
+    for title, url in links:
+        if title not in seen:
+            seen.add(title)
+            unique.append((title, url))
+    links = unique
+
+    retry_links = []
+    details = fetch_iter([url for _, url in links], parse_event_html,
+                         session=session, store=PageStore("eventbrite", PARSER_VERSION))
+    for (title, url), data in zip(links, details):
+        if data:
+            print(f"{data['Title']}")
+            yield data
+        else:
+            retry_links.append((title, url))
+
+    if retry_pages or retry_links:
+        print(f"Embedded data missing on {len(retry_pages)} listing and "
+              f"{len(retry_links)} detail pages; falling back to the browser")
+        try:
+            yield from iter_eventbrite(retry_pages, drivers, links=retry_links, report=report)
+        except Exception as e:
+            print(f"Browser fallback failed: {e}")
+            report["failed"] = len(retry_pages) + len(retry_links)
 
 
 def main():
@@ -21,45 +150,26 @@ def main():
         description="Scrape Eventbrite Adelaide events")
     parser.add_argument("--pages", type=int, default=1,
                         help="Pages to scrape (default: 1)")
+    parser.add_argument("--drivers", type=int, default=EVENTBRITE_DRIVERS,
+                        help=f"Headless browsers to run in parallel (default: {EVENTBRITE_DRIVERS})")
+    parser.add_argument("--mode", choices=("http", "browser"), default=EVENTBRITE_MODE,
+                        help="http: read embedded page data, browser only as fallback; "
+                             f"browser: always drive Chrome (default: {EVENTBRITE_MODE})")
+    parser.add_argument("--ndjson", action="store_true",
+                        help="Stream events to stdout as NDJSON instead of writing files")
     args = parser.parse_args()
 
-    opts = Options()
-    opts.add_argument("--headless=new")
-    opts.add_argument("--disable-gpu")
-    opts.add_argument("--no-sandbox")
-    driver = webdriver.Chrome(options=opts)
-
-    events, seen = [], set()
-    try:
-        for page in range(1, args.pages + 1):
-            url = EVENTBRITE_BASE_URL.format(page=page)
-            print(f"\nLoading: {url}")
-            driver.get(url)
-
-            # Wait until at least one card is present or timeout (10s)
-            try:
-                WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located(
-                        (By.CSS_SELECTOR, EVENT_CARD_SELECTOR))
-                )
-            except Exception:
-                # Save page for inspection on failures
-                with open(f"debug_page_{page}.html", "w", encoding="utf-8") as f:
-                    f.write(driver.page_source)
-                print(f"No cards found. Saved debug_page_{page}.html")
-                continue
-
-            cards = driver.find_elements(By.CSS_SELECTOR, EVENT_CARD_SELECTOR)
-            print(f"Found {len(cards)} cards")
-
-            for c in cards:
-                data = parse_event_card(c, driver, seen)
-                if data:
-                    print(f"{data['Title']}")
-                    events.append(data)
-
-    finally:
-        driver.quit()
+    scrape = iter_eventbrite_http if args.mode == "http" else iter_eventbrite
+    report = {}
+    if args.ndjson:
+        emit_ndjson(scrape(args.pages, args.drivers, report=report))
+        # Partial data: tell the pipeline not to treat this run as complete
+        if report.get("failed"):
+            sys.exit(1)
+        return
+    events = list(scrape(args.pages, args.drivers, report=report))
+    if report.get("failed"):
+        print(f"\nGave up on {report['failed']} pages")
 
     if events:
         # Write dated and latest files for traceability
@@ -69,6 +179,9 @@ def main():
         dated_csv, latest_csv = source_paths("eventbrite", ext="csv")
         export_to_csv(events, dated_csv)
         export_to_csv(events, latest_csv)
+        # The flat copies are what normalize_all reads
+        export_to_json(events, OUTPUT_JSON)
+        export_to_csv(events, OUTPUT_CSV)
         print(f"\nScraped {len(events)} events\n- {dated_json}\n- {latest_json}\n- {dated_csv}\n- {latest_csv}")
     else:
         print("\nNo events scraped. Check selectors or debug_page_*.html.")
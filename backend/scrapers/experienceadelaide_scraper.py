@@ -1,64 +1,85 @@
-import requests
 from bs4 import BeautifulSoup
+import argparse
 import json
 import os
 
+from utils.fetch import fetch_iter, make_session
+from utils.page_store import PageStore
+from utils.stream import emit_ndjson
+
 DATA_PATH = os.path.join(os.path.dirname(
     __file__), "data", "experienceadelaide.json")
+# Bump when parse_detail changes, so stored pages are parsed again
+PARSER_VERSION = 1
 
 
-def scrape_experienceadelaide():
+def parse_detail(html, link):
+    """Extract date, description and location from an event detail page."""
+    detail_soup = BeautifulSoup(html, "html.parser")
+
+    date = detail_soup.select_one("p.event-datetime")
+    date = date.get_text(strip=True) if date else None
+
+    description = detail_soup.select_one(".card-body")
+    description = description.get_text(
+        strip=True) if description else None
+
+    location = None
+    for p in detail_soup.select("p"):
+        if "Adelaide" in p.get_text():  # crude filter for addresses
+            location = p.get_text(strip=True)
+            break
+
+    return {
+        "date": date,
+        "location": location,
+        "description": description,
+    }
+
+
+def iter_experienceadelaide():
+    """Yield events from ExperienceAdelaide as their detail pages come in."""
     base_url = "https://www.experienceadelaide.com.au"
     list_url = f"{base_url}/visit/whats-on/"
 
     headers = {
         "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.4 Safari/605.1.15"
     }
+    session = make_session(headers)
 
     # Fetch listing page
-    resp = requests.get(list_url, headers=headers)
+    resp = session.get(list_url)
     resp.raise_for_status()
     soup = BeautifulSoup(resp.text, "html.parser")
 
-    events = []
-
-    # Iterate over event cards
-    for card in soup.select("div.card a"):  # each event card is a link
+    # Collect event cards (each event card is a link)
+    cards = []
+    for card in soup.select("div.card a"):
         link = card.get("href")
+        if not link:
+            continue
         if not link.startswith("http"):
             link = base_url + link
+        cards.append((card.get_text(strip=True), link))
 
-        title = card.get_text(strip=True)
-
-        # Visit each event detail page
-        try:
-            detail_resp = requests.get(link, headers=headers)
-            detail_resp.raise_for_status()
-            detail_soup = BeautifulSoup(detail_resp.text, "html.parser")
+    # Visit each event detail page (concurrent, per-host rate limited)
+    details = fetch_iter([link for _, link in cards], parse_detail,
+                         session=session, store=PageStore("experienceadelaide", PARSER_VERSION))
 
-            date = detail_soup.select_one("p.event-datetime")
-            date = date.get_text(strip=True) if date else None
+    for (title, link), detail in zip(cards, details):
+        if detail is None:
+            continue
+        yield {
+            "title": title,
+            "date": detail["date"],
+            "location": detail["location"],
+            "description": detail["description"],
+            "link": link
+        }
 
-            description = detail_soup.select_one(".card-body")
-            description = description.get_text(
-                strip=True) if description else None
 
-            location = None
-            for p in detail_soup.select("p"):
-                if "Adelaide" in p.get_text():  # crude filter for addresses
-                    location = p.get_text(strip=True)
-                    break
-
-            events.append({
-                "title": title,
-                "date": date,
-                "location": location,
-                "description": description,
-                "link": link
-            })
-
-        except Exception as e:
-            print(f"Failed to scrape {link}: {e}")
+def scrape_experienceadelaide():
+    events = list(iter_experienceadelaide())
 
     # Save results to JSON
     os.makedirs(os.path.dirname(DATA_PATH), exist_ok=True)
@@ -70,4 +91,11 @@ def scrape_experienceadelaide():
 
 
 if __name__ == "__main__":
-    scrape_experienceadelaide()
+    parser = argparse.ArgumentParser(description="Scrape ExperienceAdelaide events")
+    parser.add_argument("--ndjson", action="store_true",
+                        help="Stream events to stdout as NDJSON instead of writing the JSON file")
+    args = parser.parse_args()
+    if args.ndjson:
+        emit_ndjson(iter_experienceadelaide())
+    else:
+        scrape_experienceadelaide()
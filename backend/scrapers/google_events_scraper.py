@@ -1,8 +1,11 @@
 import os
 import json
+import argparse
 from serpapi import GoogleSearch
 from dotenv import load_dotenv
 
+from utils.stream import emit_ndjson
+
 load_dotenv()
 
 # save inside backend/scrapers/data/
@@ -10,7 +13,7 @@ DATA_PATH = os.path.join(os.path.dirname(
     __file__), "data", "google_events.json")
 
 
-def scrape_google_events():
+def iter_google_events():
     api_key = os.getenv("SERPAPI_KEY")
     if not api_key:
         raise ValueError("Missing SERPAPI_KEY in .env")
@@ -26,15 +29,18 @@ def scrape_google_events():
     search = GoogleSearch(params)
     results = search.get_dict()
 
-    events = []
     for event in results.get("events_results", []):
-        events.append({
+        yield {
             "title": event.get("title"),
             "date": event.get("date"),
             "address": event.get("address"),
             "description": event.get("description"),
             "link": event.get("link"),
-        })
+        }
+
+
+def scrape_google_events():
+    events = list(iter_google_events())
 
     os.makedirs(os.path.dirname(DATA_PATH), exist_ok=True)
     with open(DATA_PATH, "w", encoding="utf-8") as f:
@@ -45,4 +51,11 @@ def scrape_google_events():
 
 
 if __name__ == "__main__":
-    scrape_google_events()
+    parser = argparse.ArgumentParser(description="Fetch Google Events for Adelaide via SerpApi")
+    parser.add_argument("--ndjson", action="store_true",
+                        help="Stream events to stdout as NDJSON instead of writing the JSON file")
+    args = parser.parse_args()
+    if args.ndjson:
+        emit_ndjson(iter_google_events())
+    else:
+        scrape_google_events()
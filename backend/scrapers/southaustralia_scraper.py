@@ -1,22 +1,33 @@
-import requests
 from bs4 import BeautifulSoup
+import argparse
 import json
 import os
 
+from utils.fetch import fetch_iter, make_session
+from utils.page_store import PageStore
+from utils.stream import emit_ndjson
+
 # File where scraped events will be saved
 DATA_PATH = os.path.join(os.path.dirname(
     __file__), "data", "southaustralia.json")
 
 URL = "https://southaustralia.com/destinations/adelaide/what-s-on"
 HEADERS = {"User-Agent": "Mozilla/5.0"}
+# Bump when parse_detail changes, so stored pages are parsed again
+PARSER_VERSION = 1
 
 
-def scrape_southaustralia(limit: int = 50):
-    """
-    Scrape events from SouthAustralia.com (What's On Adelaide).
-    Saves results into data/southaustralia.json
-    """
-    resp = requests.get(URL, headers=HEADERS)
+def parse_detail(html, link):
+    """Extract the full address from an event detail page."""
+    detail_soup = BeautifulSoup(html, "html.parser")
+    addr_tag = detail_soup.select_one("#contactAddress span")
+    return addr_tag.get_text(strip=True) if addr_tag else None
+
+
+def iter_southaustralia(limit: int = 50):
+    """Yield events from SouthAustralia.com (What's On Adelaide) as their detail pages come in."""
+    session = make_session(HEADERS)
+    resp = session.get(URL)
     resp.raise_for_status()
     soup = BeautifulSoup(resp.text, "html.parser")
 
@@ -44,31 +55,38 @@ def scrape_southaustralia(limit: int = 50):
         if link and not link.startswith("http"):
             link = "https://southaustralia.com" + link
 
-        # --- Go into detail page to fetch full address ---
-        full_address = None
-        if link:
-            try:
-                detail_resp = requests.get(link, headers=HEADERS)
-                detail_resp.raise_for_status()
-                detail_soup = BeautifulSoup(detail_resp.text, "html.parser")
-
-                addr_tag = detail_soup.select_one("#contactAddress span")
-                if addr_tag:
-                    full_address = addr_tag.get_text(strip=True)
-
-            except Exception as e:
-                print(f"Failed to fetch detail page {link}: {e}")
-
         events.append({
             "title": title,
             "location": location,
             "price": price,
             "dates": date_info,
             "features": features,
-            "full_address": full_address,
+            "full_address": None,
             "link": link,
         })
 
+    # Events without a link have no detail page to wait for
+    for event in events:
+        if not event["link"]:
+            yield event
+
+    # --- Go into detail pages to fetch full addresses (concurrently) ---
+    with_links = [event for event in events if event["link"]]
+    addresses = fetch_iter([event["link"] for event in with_links],
+                           parse_detail, session=session,
+                           store=PageStore("southaustralia", PARSER_VERSION))
+    for event, full_address in zip(with_links, addresses):
+        event["full_address"] = full_address
+        yield event
+
+
+def scrape_southaustralia(limit: int = 50):
+    """
+    Scrape events from SouthAustralia.com (What's On Adelaide).
+    Saves results into data/southaustralia.json
+    """
+    events = list(iter_southaustralia(limit))
+
     # Save to JSON file
     os.makedirs(os.path.dirname(DATA_PATH), exist_ok=True)
     with open(DATA_PATH, "w", encoding="utf-8") as f:
@@ -79,4 +97,11 @@ def scrape_southaustralia(limit: int = 50):
 
 
 if __name__ == "__main__":
-    scrape_southaustralia()
+    parser = argparse.ArgumentParser(description="Scrape SouthAustralia.com events")
+    parser.add_argument("--ndjson", action="store_true",
+                        help="Stream events to stdout as NDJSON instead of writing the JSON file")
+    args = parser.parse_args()
+    if args.ndjson:
+        emit_ndjson(iter_southaustralia())
+    else:
+        scrape_southaustralia()
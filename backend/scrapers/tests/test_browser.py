@@ -0,0 +1,69 @@
+import itertools
+
+from utils.browser import DriverPool
+
+
+class FakeDriver:
+    def __init__(self, n):
+        self.n = n
+
+    def quit(self):
+        pass
+
+
+def factory(fail_after=None):
+    count = itertools.count(1)
+
+    def make():
+        n = next(count)
+        if fail_after is not None and n > fail_after:
+            raise RuntimeError("chrome did not start")
+        return FakeDriver(n)
+    return make
+
+
+def test_crashed_task_is_retried():
+    pool = DriverPool(2, factory=factory(), retries=2)
+    crashes = [RuntimeError("chrome crashed")]
+
+    def handle(driver, task):
+        kind, arg = task
+        if kind == "listing":
+            if crashes:
+                raise crashes.pop()
+            for i in range(3):
+                pool.put(1, ("detail", i))
+            return None
+        return [arg]
+
+    pool.put(0, ("listing", 1))
+    assert sorted(pool.run(handle)) == [0, 1, 2]
+    assert pool.skipped == []
+
+
+def test_task_failing_every_attempt_is_skipped():
+    pool = DriverPool(1, factory=factory(), retries=2)
+    attempts = []
+
+    def handle(driver, task):
+        attempts.append(task)
+        raise RuntimeError("broken page")
+
+    pool.put(1, "page")
+    assert list(pool.run(handle)) == []
+    assert attempts == ["page"] * 3
+    assert pool.skipped == ["page"]
+
+
+def test_tasks_move_to_a_running_browser_when_a_restart_fails():
+    pool = DriverPool(2, factory=factory(fail_after=2), retries=1)
+
+    def handle(driver, task):
+        if driver.n == 1:
+            raise RuntimeError("chrome crashed")
+        return [task]
+
+    for i in range(5):
+        pool.put(1, i)
+    assert sorted(pool.run(handle)) == [0, 1, 2, 3, 4]
+    assert pool.skipped == []
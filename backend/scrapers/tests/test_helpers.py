@@ -0,0 +1,59 @@
+import os
+
+from utils.helpers import parse_event_html, parse_listing_html
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+URL = "https://www.eventbrite.com.au/e/jazz-night-tickets-1001"
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def test_listing_reads_json_ld_item_list():
+    assert parse_listing_html(fixture("eventbrite_listing.html")) == [
+        ("Jazz Night at the Rhino Room", "https://www.eventbrite.com.au/e/jazz-night-tickets-1001"),
+        ("Gin & Tonic Masterclass", "https://www.eventbrite.com.au/e/gin-masterclass-tickets-1002"),
+    ]
+
+
+def test_listing_falls_back_to_server_data():
+    assert parse_listing_html(fixture("eventbrite_listing_server_data.html")) == [
+        ("Fringe Preview: Comedy Showcase", "https://www.eventbrite.com.au/e/comedy-showcase-tickets-2001"),
+        ("Sunday Farmers' Market", "https://www.eventbrite.com.au/e/farmers-market-tickets-2002"),
+    ]
+
+
+def test_listing_without_data_is_empty():
+    assert parse_listing_html(fixture("eventbrite_no_json_ld.html")) == []
+    assert parse_listing_html(fixture("eventbrite_malformed_json_ld.html")) == []
+
+
+def test_event_reads_json_ld():
+    assert parse_event_html(fixture("eventbrite_event.html"), URL) == {
+        "Title": "Jazz Night at the Rhino Room",
+        "URL": URL,
+        "Date & Time": "Date and time\nSat, 1 Mar 2025 · 7:00 PM - 10:00 PM",
+        "Location": "Location\nRhino Room\n13 Frome Street Adelaide, SA 5000\nGet directions",
+        "Category": "",
+        "Organizer": "Rhino Room Presents",
+        "Price": "AUD 25 - 40",
+        "Description": "Live jazz trio,\ntwo sets, bar open from 6.",
+        "Source": "Eventbrite",
+    }
+
+
+def test_date_only_event_has_no_time():
+    data = parse_event_html(fixture("eventbrite_event_all_day.html"), URL)
+
+    assert data["Title"] == "Adelaide Hills Makers Fair"
+    assert data["Date & Time"] == "Date and time\nSat, 1 Mar 2025 - Sun, 2 Mar 2025"
+    assert data["Location"] == "Location\nHahndorf Institute\n68 Main Street, Hahndorf SA 5245\nGet directions"
+    assert data["Organizer"] == "Hills Makers Collective"
+    assert data["Price"] == "Free"
+
+
+def test_event_without_data_is_none():
+    assert parse_event_html(fixture("eventbrite_no_json_ld.html"), URL) is None
+    assert parse_event_html(fixture("eventbrite_malformed_json_ld.html"), URL) is None
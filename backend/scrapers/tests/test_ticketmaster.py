@@ -0,0 +1,20 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from ticketmaster_scraper import MAX_RETRY_WAIT, retry_wait
+
+
+def test_retry_after_seconds():
+    assert retry_wait("5", 2) == 5
+    assert retry_wait("3600", 2) == MAX_RETRY_WAIT
+
+
+def test_retry_after_http_date():
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 < retry_wait(later, 2) <= 30
+    assert retry_wait("Wed, 21 Oct 2015 07:28:00 GMT", 2) == 0
+
+
+def test_unreadable_retry_after_backs_off():
+    for value in (None, "", "soon", "nan", "-3", "Wed, 21 Oct 2015 07:28:00"):
+        assert retry_wait(value, 2) == 4
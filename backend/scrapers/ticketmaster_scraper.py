@@ -1,200 +1,391 @@
 import os
+import sys
 import json
+import time
+import hashlib
 import requests
-from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
 from dotenv import load_dotenv
 
+from utils.fetch import HostLimiter, make_session
+from utils.stream import emit_ndjson
+
 load_dotenv()
 
 # Save inside backend/scrapers/data/
 DATA_PATH = os.path.join(os.path.dirname(__file__), "data", "ticketmaster.json")
+# Per-shard fingerprints and records from the last run, for --incremental
+STATE_PATH = os.path.join(os.path.dirname(__file__), "data", "ticketmaster_state.json")
 
-def fetch_ticketmaster_events(debug=False):
-    """Fetch Adelaide events from Ticketmaster Discovery API."""
-    api_key = os.getenv("TICKETMASTER_API_KEY")
+BASE_URL = "https://app.ticketmaster.com/discovery/v2/events.json"
+TZ = ZoneInfo("Australia/Adelaide")
+PAGE_SIZE = 200  # the API maximum
+# The API only serves items with size * page < 1000; windows holding more are split
+DEEP_PAGING_LIMIT = 1000
+MIN_WINDOW = timedelta(hours=1)
+WINDOW_DAYS = 365
+# Shards are fixed date ranges (aligned to SHARD_EPOCH so they line up across runs)
+SHARD_DAYS = 30
+SHARD_EPOCH = date(2025, 1, 1)
+REQUESTS_PER_SECOND = float(os.getenv("TICKETMASTER_RPS", 5))
+WORKERS = 5
+MAX_RETRIES = 3
+# Longest wait honoured from a Retry-After header
+MAX_RETRY_WAIT = 60
+# Incremental runs refetch shards starting within REFRESH_DAYS (sales and
+# cancellations change there), shards older than SHARD_MAX_AGE, and new ones
+REFRESH_DAYS = 14
+SHARD_MAX_AGE = timedelta(days=int(os.getenv("TICKETMASTER_SHARD_MAX_AGE_DAYS", 7)))
+
+
+def parse_event(event):
+    """One Discovery API event as a record, or None without a title or link."""
+    # Extract event details
+    event_data = {
+        "id": event.get("id"),
+        "title": event.get("name", ""),
+        "date": "",
+        "time": "",
+        "location": "",
+        "venue": "",
+        "description": "",
+        "organizer": "",
+        "link": event.get("url", ""),
+        "price_range": "",
+        "category": "",
+        "image": ""
+    }
     
-    if not api_key:
-        print("TICKETMASTER_API_KEY not found in environment variables")
-        return []
+    # Extract description from multiple possible fields
+    description_parts = []
+    if event.get("info"):
+        description_parts.append(event["info"])
+    if event.get("pleaseNote"):
+        description_parts.append(f"Please note: {event['pleaseNote']}")
+    if event.get("additionalInfo"):
+        description_parts.append(event["additionalInfo"])
+    event_data["description"] = " | ".join(description_parts)
     
-    print("Fetching Adelaide events from Ticketmaster Discovery API...")
+    # Extract organizer/promoter information
+    organizer_parts = []
+    if "promoter" in event:
+        if isinstance(event["promoter"], dict):
+            organizer_parts.append(event["promoter"].get("name", ""))
+        elif isinstance(event["promoter"], list) and event["promoter"]:
+            organizer_parts.append(event["promoter"][0].get("name", ""))
     
-    # Base API endpoint
-    base_url = "https://app.ticketmaster.com/discovery/v2/events.json"
-    
-    # Parameters for Adelaide, Australia events
-    params = {
-        "apikey": api_key,
-        "city": "Adelaide",
-        "countryCode": "AU",
-        "size": 100,  # Max events per request
-        "page": 0,
-        "sort": "date,asc",  # Sort by date ascending
-        "startDateTime": datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ"),  # Only future events
-        "endDateTime": (datetime.now() + timedelta(days=365)).strftime("%Y-%m-%dT%H:%M:%SZ")  # Next year
-    }
+    # Check for organizer in embedded data
+    if "_embedded" in event:
+        if "venues" in event["_embedded"] and event["_embedded"]["venues"]:
+            venue_data = event["_embedded"]["venues"][0]
+            if "boxOfficeInfo" in venue_data:
+                box_office = venue_data["boxOfficeInfo"]
+                if "openHoursDetail" in box_office:
+                    organizer_parts.append(f"Box Office: {box_office['openHoursDetail']}")
+        
+        # Look for promoter in embedded attractions
+        if "attractions" in event["_embedded"]:
+            for attraction in event["_embedded"]["attractions"]:
+                if attraction.get("name") and attraction["name"] not in event_data["title"]:
+                    organizer_parts.append(f"Featuring: {attraction['name']}")
     
-    all_events = []
-    max_pages = 5  # Limit to avoid too many API calls
+    event_data["organizer"] = " | ".join(filter(None, organizer_parts))
     
-    try:
-        for page in range(max_pages):
-            params["page"] = page
-            
-            print(f"Fetching page {page + 1}...")
-            response = requests.get(base_url, params=params, timeout=10)
-            
-            if response.status_code != 200:
-                print(f"API error: {response.status_code} - {response.text}")
-                break
-            
-            data = response.json()
-            
-            # Check if we have events
-            if "_embedded" not in data or "events" not in data["_embedded"]:
-                print(f"No events found on page {page + 1}")
+    # Parse date and time
+    if "dates" in event and "start" in event["dates"]:
+        start_date = event["dates"]["start"]
+        if "localDate" in start_date:
+            event_data["date"] = start_date["localDate"]
+        if "localTime" in start_date:
+            event_data["time"] = start_date["localTime"]
+    
+    # Parse venue information
+    if "_embedded" in event and "venues" in event["_embedded"]:
+        venue = event["_embedded"]["venues"][0]
+        event_data["venue"] = venue.get("name", "")
+        
+        # Build location string
+        location_parts = []
+        if "address" in venue:
+            address = venue["address"]
+            if "line1" in address:
+                location_parts.append(address["line1"])
+        if "city" in venue:
+            location_parts.append(venue["city"]["name"])
+        if "state" in venue:
+            location_parts.append(venue["state"]["name"])
+        
+        event_data["location"] = ", ".join(location_parts)
+    
+    # Parse price range
+    if "priceRanges" in event and event["priceRanges"]:
+        price_range = event["priceRanges"][0]
+        min_price = price_range.get("min", 0)
+        max_price = price_range.get("max", 0)
+        currency = price_range.get("currency", "AUD")
+        
+        if min_price == max_price:
+            event_data["price_range"] = f"{currency} {min_price}"
+        else:
+            event_data["price_range"] = f"{currency} {min_price} - {max_price}"
+    
+    # Parse category/classification
+    if "classifications" in event and event["classifications"]:
+        classification = event["classifications"][0]
+        categories = []
+        if "segment" in classification:
+            categories.append(classification["segment"]["name"])
+        if "genre" in classification:
+            categories.append(classification["genre"]["name"])
+        event_data["category"] = " / ".join(categories)
+    
+    # Parse image
+    if "images" in event and event["images"]:
+        # Get the largest image
+        images = sorted(event["images"], key=lambda x: x.get("width", 0), reverse=True)
+        event_data["image"] = images[0]["url"]
+    
+    # Only add events with required fields
+    if event_data["title"] and event_data["link"]:
+        return event_data
+    return None
+
+
+class DiscoveryClient:
+    """Event search requests, spaced to the API's rate limit and retried on 429/5xx."""
+
+    def __init__(self, api_key: str, rps: float = REQUESTS_PER_SECOND, workers: int = WORKERS):
+        self.api_key = api_key
+        self.session = make_session(pool_size=workers)
+        self.limiter = HostLimiter(concurrency=workers, interval=1 / rps)
+        self.requests = 0
+
+    def page(self, start: datetime, end: datetime, page: int) -> dict:
+        params = {
+            "apikey": self.api_key,
+            "city": "Adelaide",
+            "countryCode": "AU",
+            "size": PAGE_SIZE,
+            "page": page,
+            "sort": "date,asc",
+            "startDateTime": _utc(start),
+            "endDateTime": _utc(end),
+        }
+        for attempt in range(MAX_RETRIES + 1):
+            self.requests += 1
+            response = self.limiter.get(self.session, BASE_URL, params=params)
+            if response.status_code == 200:
+                return response.json()
+            retryable = response.status_code == 429 or response.status_code >= 500
+            if not retryable or attempt == MAX_RETRIES:
                 break
-            
-            events = data["_embedded"]["events"]
-            print(f"Found {len(events)} events on page {page + 1}")
-            
-            for event in events:
+            time.sleep(retry_wait(response.headers.get("Retry-After"), attempt))
+        raise RuntimeError(f"API error: {response.status_code} - {response.text[:200]}")
+
+
+def retry_wait(retry_after: str | None, attempt: int) -> float:
+    """
+    Seconds to wait before a retry: Retry-After as seconds or an HTTP date,
+    else exponential backoff, capped at MAX_RETRY_WAIT.
+    """
+    wait_s = 2 ** attempt
+    retry_after = (retry_after or "").strip()
+    if retry_after.isdigit():
+        wait_s = int(retry_after)
+    elif retry_after:
+        try:
+            wait_s = (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            pass  # not a date either, or one without a timezone
+    return min(max(wait_s, 0), MAX_RETRY_WAIT)
+
+
+def _utc(moment: datetime) -> str:
+    return moment.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def shard_windows(now: datetime, days: int = WINDOW_DAYS):
+    """(key, start, end) local-time shards covering now .. now + days."""
+    today = now.date()
+    first = SHARD_EPOCH + timedelta(days=(today - SHARD_EPOCH).days // SHARD_DAYS * SHARD_DAYS)
+    last = today + timedelta(days=days)
+    shards, day = [], first
+    while day < last:
+        end_day = day + timedelta(days=SHARD_DAYS)
+        start = max(now, datetime.combine(day, datetime.min.time(), tzinfo=TZ))
+        end = datetime.combine(min(end_day, last), datetime.min.time(), tzinfo=TZ)
+        shards.append((f"{day.isoformat()}/{end_day.isoformat()}", start, end))
+        day = end_day
+    return shards
+
+
+def _fingerprint(records) -> str:
+    body = json.dumps(sorted(records, key=lambda r: r.get("id") or r["link"]),
+                      sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+def load_state() -> dict:
+    if not os.path.exists(STATE_PATH):
+        return {"shards": {}}
+    with open(STATE_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(state: dict) -> None:
+    os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
+    with open(STATE_PATH, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+
+
+def _is_stale(entry, start: datetime, end: datetime, now: datetime, through: str | None) -> bool:
+    fetched_at = datetime.fromisoformat(entry["fetched_at"])
+    return (start - now < timedelta(days=REFRESH_DAYS)
+            or now - fetched_at > SHARD_MAX_AGE
+            # the last run's window stopped part way into this shard
+            or through is None or _utc(end) > through)
+
+
+def _upcoming(record, today: str) -> bool:
+    return not record.get("date") or record["date"] >= today
+
+
+def iter_ticketmaster_events(debug=False, incremental=False, report=None):
+    """
+    Yield Adelaide events from the Ticketmaster Discovery API.
+
+    The year ahead is cut into date shards. Each shard's first page gives
+    its totalPages, and the remaining pages are fetched concurrently (at
+    most TICKETMASTER_RPS requests a second). A shard holding more events
+    than the deep-paging cap is split in half until every part can be paged
+    through. With `incremental`, shards fetched recently and not starting
+    soon are served from the stored state instead of the API.
+    `report` (a dict) receives request and shard counts.
+    """
+    report = report if report is not None else {}
+    api_key = os.getenv("TICKETMASTER_API_KEY")
+    
+    if not api_key:
+        print("TICKETMASTER_API_KEY not found in environment variables")
+        return
+    
+    print("Fetching Adelaide events from Ticketmaster Discovery API...")
+    started = time.monotonic()
+    now = datetime.now(TZ)
+    state = load_state()
+    previous = state.get("shards", {})
+    client = DiscoveryClient(api_key)
+
+    todo, reused = [], []
+    today = now.date().isoformat()
+    for key, start, end in shard_windows(now):
+        entry = previous.get(key)
+        if incremental and entry and not _is_stale(entry, start, end, now, state.get("through")):
+            reused.append(key)
+        else:
+            todo.append((key, start, end))
+
+    shards = {key: previous[key] for key in reused}
+    yielded = set()
+    for key in reused:
+        for record in shards[key]["records"]:
+            if _upcoming(record, today):
+                yielded.add(record.get("id") or record["link"])
+                yield record
+
+    found = {key: {} for key, _, _ in todo}
+    failed = set()
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        pending = {pool.submit(client.page, start, end, 0): (key, start, end, 0)
+                   for key, start, end in todo}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                key, start, end, page = pending.pop(future)
                 try:
-                    # Debug: Print first event structure to understand available fields
-                    if debug and page == 0 and events.index(event) == 0:
-                        print("\nDEBUG: First event structure:")
-                        import json as json_debug
-                        print(json_debug.dumps(event, indent=2)[:2000] + "...")
-                        print("DEBUG: Available top-level keys:", list(event.keys()))
-                        if "_embedded" in event:
-                            print("DEBUG: Embedded keys:", list(event["_embedded"].keys()))
-                    
-                    # Extract event details
-                    event_data = {
-                        "title": event.get("name", ""),
-                        "date": "",
-                        "time": "",
-                        "location": "",
-                        "venue": "",
-                        "description": "",
-                        "organizer": "",
-                        "link": event.get("url", ""),
-                        "price_range": "",
-                        "category": "",
-                        "image": ""
-                    }
-                    
-                    # Extract description from multiple possible fields
-                    description_parts = []
-                    if event.get("info"):
-                        description_parts.append(event["info"])
-                    if event.get("pleaseNote"):
-                        description_parts.append(f"Please note: {event['pleaseNote']}")
-                    if event.get("additionalInfo"):
-                        description_parts.append(event["additionalInfo"])
-                    event_data["description"] = " | ".join(description_parts)
-                    
-                    # Extract organizer/promoter information
-                    organizer_parts = []
-                    if "promoter" in event:
-                        if isinstance(event["promoter"], dict):
-                            organizer_parts.append(event["promoter"].get("name", ""))
-                        elif isinstance(event["promoter"], list) and event["promoter"]:
-                            organizer_parts.append(event["promoter"][0].get("name", ""))
-                    
-                    # Check for organizer in embedded data
-                    if "_embedded" in event:
-                        if "venues" in event["_embedded"] and event["_embedded"]["venues"]:
-                            venue_data = event["_embedded"]["venues"][0]
-                            if "boxOfficeInfo" in venue_data:
-                                box_office = venue_data["boxOfficeInfo"]
-                                if "openHoursDetail" in box_office:
-                                    organizer_parts.append(f"Box Office: {box_office['openHoursDetail']}")
-                        
-                        # Look for promoter in embedded attractions
-                        if "attractions" in event["_embedded"]:
-                            for attraction in event["_embedded"]["attractions"]:
-                                if attraction.get("name") and attraction["name"] not in event_data["title"]:
-                                    organizer_parts.append(f"Featuring: {attraction['name']}")
-                    
-                    event_data["organizer"] = " | ".join(filter(None, organizer_parts))
-                    
-                    # Parse date and time
-                    if "dates" in event and "start" in event["dates"]:
-                        start_date = event["dates"]["start"]
-                        if "localDate" in start_date:
-                            event_data["date"] = start_date["localDate"]
-                        if "localTime" in start_date:
-                            event_data["time"] = start_date["localTime"]
-                    
-                    # Parse venue information
-                    if "_embedded" in event and "venues" in event["_embedded"]:
-                        venue = event["_embedded"]["venues"][0]
-                        event_data["venue"] = venue.get("name", "")
-                        
-                        # Build location string
-                        location_parts = []
-                        if "address" in venue:
-                            address = venue["address"]
-                            if "line1" in address:
-                                location_parts.append(address["line1"])
-                        if "city" in venue:
-                            location_parts.append(venue["city"]["name"])
-                        if "state" in venue:
-                            location_parts.append(venue["state"]["name"])
-                        
-                        event_data["location"] = ", ".join(location_parts)
-                    
-                    # Parse price range
-                    if "priceRanges" in event and event["priceRanges"]:
-                        price_range = event["priceRanges"][0]
-                        min_price = price_range.get("min", 0)
-                        max_price = price_range.get("max", 0)
-                        currency = price_range.get("currency", "AUD")
-                        
-                        if min_price == max_price:
-                            event_data["price_range"] = f"{currency} {min_price}"
-                        else:
-                            event_data["price_range"] = f"{currency} {min_price} - {max_price}"
-                    
-                    # Parse category/classification
-                    if "classifications" in event and event["classifications"]:
-                        classification = event["classifications"][0]
-                        categories = []
-                        if "segment" in classification:
-                            categories.append(classification["segment"]["name"])
-                        if "genre" in classification:
-                            categories.append(classification["genre"]["name"])
-                        event_data["category"] = " / ".join(categories)
-                    
-                    # Parse image
-                    if "images" in event and event["images"]:
-                        # Get the largest image
-                        images = sorted(event["images"], key=lambda x: x.get("width", 0), reverse=True)
-                        event_data["image"] = images[0]["url"]
-                    
-                    # Only add events with required fields
-                    if event_data["title"] and event_data["link"]:
-                        all_events.append(event_data)
-                
+                    data = future.result()
                 except Exception as e:
-                    print(f"Error processing event: {e}")
+                    print(f"Shard {key} page {page + 1} failed: {e}")
+                    failed.add(key)
                     continue
-            
-            # Check if we have more pages
-            page_info = data.get("page", {})
-            total_pages = page_info.get("totalPages", 1)
-            
-            if page + 1 >= total_pages:
-                print(f"Reached last page ({total_pages} total pages)")
-                break
-    
+                info = data.get("page", {})
+                total = info.get("totalElements", 0)
+                if page == 0:
+                    if total > DEEP_PAGING_LIMIT and end - start > MIN_WINDOW:
+                        middle = start + (end - start) / 2
+                        print(f"Shard {key}: {total} events in {start:%Y-%m-%d %H:%M} - "
+                              f"{end:%Y-%m-%d %H:%M}, splitting")
+                        for a, b in ((start, middle), (middle, end)):
+                            pending[pool.submit(client.page, a, b, 0)] = (key, a, b, 0)
+                        continue
+                    if total > DEEP_PAGING_LIMIT:
+                        print(f"Shard {key}: only the first {DEEP_PAGING_LIMIT} of {total} "
+                              f"events can be paged")
+                    pages = min(info.get("totalPages", 1), DEEP_PAGING_LIMIT // PAGE_SIZE)
+                    for p in range(1, pages):
+                        pending[pool.submit(client.page, start, end, p)] = (key, start, end, p)
+
+                events = data.get("_embedded", {}).get("events", [])
+                if debug and events and not yielded:
+                    print("\nDEBUG: First event structure:")
+                    print(json.dumps(events[0], indent=2)[:2000] + "...")
+                    print("DEBUG: Available top-level keys:", list(events[0].keys()))
+                for event in events:
+                    try:
+                        record = parse_event(event)
+                    except Exception as e:
+                        print(f"Error processing event: {e}")
+                        continue
+                    if record is None:
+                        continue
+                    ident = record.get("id") or record["link"]
+                    found[key][ident] = record
+                    if ident not in yielded:
+                        yielded.add(ident)
+                        yield record
+
+    changed = 0
+    for key, _, _ in todo:
+        if key in failed:
+            # Keep the last good copy of a shard that could not be fetched
+            if key in previous:
+                shards[key] = previous[key]
+                for record in previous[key]["records"]:
+                    ident = record.get("id") or record["link"]
+                    if ident not in yielded and _upcoming(record, today):
+                        yielded.add(ident)
+                        yield record
+            continue
+        records = list(found[key].values())
+        fingerprint = _fingerprint(records)
+        changed += fingerprint != previous.get(key, {}).get("fingerprint")
+        shards[key] = {"fetched_at": now.isoformat(), "fingerprint": fingerprint,
+                       "count": len(records), "records": records}
+    save_state({"through": _utc(now + timedelta(days=WINDOW_DAYS)), "shards": shards})
+
+    report.update(requests=client.requests, fetched=len(todo) - len(failed),
+                  reused=len(reused), changed=changed, failed=len(failed))
+    print(f"Ticketmaster: {len(yielded)} events, {client.requests} requests in "
+          f"{time.monotonic() - started:.1f}s; shards: {len(todo) - len(failed)} fetched "
+          f"({changed} changed), {len(reused)} reused, {len(failed)} failed")
+
+
+def fetch_ticketmaster_events(debug=False, incremental=False):
+    """Fetch Adelaide events from Ticketmaster Discovery API."""
+    try:
+        all_events = list(iter_ticketmaster_events(debug, incremental))
     except requests.RequestException as e:
         print(f"Network error: {e}")
         return []
     except Exception as e:
         print(f"Unexpected error: {e}")
         return []
+    if not all_events:
+        return []
+    all_events.sort(key=lambda e: (e["date"], e["time"]))
     
     # Save results
     os.makedirs(os.path.dirname(DATA_PATH), exist_ok=True)
@@ -217,6 +408,13 @@ def fetch_ticketmaster_events(debug=False):
     return all_events
 
 if __name__ == "__main__":
-    import sys
     debug_mode = "--debug" in sys.argv
-    fetch_ticketmaster_events(debug=debug_mode)
\ No newline at end of file
+    incremental = "--incremental" in sys.argv
+    if "--ndjson" in sys.argv:
+        report = {}
+        emit_ndjson(iter_ticketmaster_events(debug_mode, incremental, report))
+        # Partial data: tell the pipeline not to treat this run as complete
+        if report.get("failed"):
+            sys.exit(1)
+    else:
+        fetch_ticketmaster_events(debug=debug_mode, incremental=incremental)
\ No newline at end of file
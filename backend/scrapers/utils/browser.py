@@ -0,0 +1,134 @@
+import itertools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+
+from utils.constants import BLOCKED_RESOURCES, PAGE_LOAD_TIMEOUT, TASK_RETRIES
+
+_STOP = object()
+
+
+def make_driver() -> webdriver.Chrome:
+    """
+    Headless Chrome that skips images, fonts and stylesheets and returns from
+    get() at DOMContentLoaded; callers wait explicitly for what they need.
+    """
+    opts = Options()
+    opts.add_argument("--headless=new")
+    opts.add_argument("--disable-gpu")
+    opts.add_argument("--no-sandbox")
+    opts.add_argument("--blink-settings=imagesEnabled=false")
+    opts.page_load_strategy = "eager"
+    opts.add_experimental_option("prefs", {
+        "profile.managed_default_content_settings.images": 2,
+        "profile.managed_default_content_settings.fonts": 2,
+    })
+    driver = webdriver.Chrome(options=opts)
+    driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_RESOURCES})
+    return driver
+
+
+class DriverPool:
+    """
+    N browsers sharing one work queue. Tasks with a lower priority number are
+    taken first, and a task's handler may queue more tasks (a listing page
+    queues its detail pages), so listing and detail pages are worked on at
+    the same time. A task whose handler fails is queued again up to
+    `retries` times; tasks given up on are listed in `skipped`.
+    """
+
+    def __init__(self, size: int, factory=make_driver, retries: int = TASK_RETRIES):
+        self.size = size
+        self.factory = factory
+        self.retries = retries
+        self.skipped = []
+        self._work = queue.PriorityQueue()
+        self._order = itertools.count()
+        self._alive = 0
+        self._lock = threading.Lock()
+
+    def put(self, priority: int, task, attempt: int = 0) -> None:
+        self._work.put((priority, next(self._order), attempt, task))
+
+    def _start_drivers(self) -> list:
+        drivers, errors = [], []
+        with ThreadPoolExecutor(max_workers=self.size) as pool:
+            for future in [pool.submit(self.factory) for _ in range(self.size)]:
+                try:
+                    drivers.append(future.result())
+                except Exception as e:
+                    errors.append(e)
+        if not drivers:
+            raise errors[0]
+        if errors:
+            print(f"Started {len(drivers)} of {self.size} browsers: {errors[0]}")
+        return drivers
+
+    def _restart(self, driver):
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        try:
+            return self.factory()
+        except Exception as e:
+            print(f"Could not restart browser: {e}")
+            return None
+
+    def _worker(self, driver, handle, results) -> None:
+        while True:
+            priority, _, attempt, task = self._work.get()
+            try:
+                if task is _STOP:
+                    if driver is not None:
+                        driver.quit()
+                    return
+                if driver is None:
+                    # no browser left anywhere; keep draining so the queue still finishes
+                    print(f"Skipping {task}: no browser")
+                    self.skipped.append(task)
+                    continue
+                for result in handle(driver, task) or ():
+                    results.put(result)
+            except Exception as e:
+                print(f"Task {task} failed (attempt {attempt + 1}): {e}")
+                if attempt < self.retries:
+                    self.put(priority, task, attempt + 1)
+                else:
+                    self.skipped.append(task)
+                # A crashed browser fails every later task, so replace it
+                driver = self._restart(driver)
+                if driver is None:
+                    with self._lock:
+                        self._alive -= 1
+                        if self._alive:
+                            return  # leave the queue to the browsers still running
+            finally:
+                self._work.task_done()
+
+    def run(self, handle):
+        """Run handle(driver, task) over the queue until it drains, yielding results as they come."""
+        drivers = self._start_drivers()
+        self._alive = len(drivers)
+        results = queue.Queue()
+        workers = [threading.Thread(target=self._worker, args=(d, handle, results), daemon=True)
+                   for d in drivers]
+        for w in workers:
+            w.start()
+
+        def finish():
+            self._work.join()
+            for _ in workers:
+                self.put(float("inf"), _STOP)
+            for w in workers:
+                w.join()
+            results.put(_STOP)
+
+        threading.Thread(target=finish, daemon=True).start()
+        while (result := results.get()) is not _STOP:
+            yield result
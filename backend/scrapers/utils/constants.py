@@ -15,6 +15,33 @@ ANCHOR_SELECTOR = "a.event-card__link"
 # Two lines inside the card: [0] date/time, [1] location
 CLAMP_PARAGRAPH_SELECTOR = "p.event-card__clamp-line"
 
+# Detail page blocks waited on (explicitly, up to DETAIL_WAIT seconds)
+LOCATION_SELECTOR = "div[data-testid='location']"
+DATE_TIME_SELECTOR = "div[data-testid='dateAndTime']"
+ORGANIZER_SELECTOR = "div[data-testid='organizerBrief'] strong.organizer-info__name-link"
+DETAIL_WAIT = 10
+PAGE_LOAD_TIMEOUT = 30
+
+# "http" reads the JSON-LD / server data the pages embed, over plain HTTP,
+# and only starts browsers for pages where that fails; "browser" always uses them
+EVENTBRITE_MODE = os.getenv("EVENTBRITE_MODE", "http")
+EVENTBRITE_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+                  "AppleWebKit/605.1.15 (KHTML, like Gecko) "
+                  "Version/16.4 Safari/605.1.15",
+    "Accept-Language": "en-AU,en;q=0.9",
+}
+
+# Browser pool: headless Chromes sharing the listing and detail pages
+EVENTBRITE_DRIVERS = int(os.getenv("EVENTBRITE_DRIVERS", 4))
+# Times a failed page (crashed or hung browser) is queued again before it is skipped
+TASK_RETRIES = int(os.getenv("EVENTBRITE_TASK_RETRIES", 2))
+# Requests the browsers never make (Chrome DevTools URL patterns)
+BLOCKED_RESOURCES = [
+    "*.png*", "*.jpg*", "*.jpeg*", "*.gif*", "*.webp*", "*.svg*", "*.ico*",
+    "*.woff*", "*.ttf*", "*.otf*", "*.css*", "*img.evbuc.com*",
+]
+
 # Outputs (always write into backend/scrapers/data/)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.normpath(os.path.join(BASE_DIR, "..", "data"))
@@ -32,3 +59,8 @@ TICKETMASTER_API_KEY = os.getenv("TICKETMASTER_API_KEY")
 SOUTH_AUSTRALIA_BASE_URL = "https://southaustralia.com/destinations/adelaide/what-s-on"
 
 
+# Detail-page fetching (HTML scrapers)
+FETCH_WORKERS = 16  # total concurrent detail requests
+PER_HOST_CONCURRENCY = 4  # max in-flight requests to any one host
+POLITENESS_INTERVAL = 0.1  # min seconds between request starts per host
+REQUEST_TIMEOUT = 15
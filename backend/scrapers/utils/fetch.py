@@ -0,0 +1,121 @@
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.constants import (
+    FETCH_WORKERS,
+    PER_HOST_CONCURRENCY,
+    POLITENESS_INTERVAL,
+    REQUEST_TIMEOUT,
+)
+from utils.page_store import PageStore
+
+
+def make_session(headers: dict | None = None, pool_size: int = FETCH_WORKERS) -> requests.Session:
+    """Keep-alive session whose connection pool is large enough for the fetch workers."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if headers:
+        session.headers.update(headers)
+    return session
+
+
+class HostLimiter:
+    """Caps in-flight requests per host and spaces out request starts."""
+
+    def __init__(self, concurrency: int = PER_HOST_CONCURRENCY, interval: float = POLITENESS_INTERVAL):
+        self.concurrency = concurrency
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._slots: dict[str, threading.Semaphore] = {}
+        self._next_start: dict[str, float] = {}
+
+    def _slot(self, host: str) -> threading.Semaphore:
+        with self._lock:
+            if host not in self._slots:
+                self._slots[host] = threading.Semaphore(self.concurrency)
+            return self._slots[host]
+
+    def _wait_turn(self, host: str) -> None:
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start.get(host, now))
+            self._next_start[host] = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+    def get(self, session: requests.Session, url: str, **kwargs) -> requests.Response:
+        host = urlsplit(url).netloc
+        with self._slot(host):
+            self._wait_turn(host)
+            return session.get(url, timeout=REQUEST_TIMEOUT, **kwargs)
+
+
+def fetch_iter(urls, parse, session: requests.Session | None = None,
+               workers: int = FETCH_WORKERS, limiter: HostLimiter | None = None,
+               store: PageStore | None = None):
+    """
+    Fetch every URL concurrently and run parse(html, url) on each body,
+    yielding results in the same order as `urls` as soon as each is ready;
+    failed pages yield None.
+
+    With a `store`, requests are conditional (ETag / Last-Modified) and pages
+    that come back 304 or with an unchanged body hash reuse the stored record
+    instead of being parsed again, unless they were stored by another
+    version of the parser (see PageStore).
+    """
+    urls = list(urls)
+    session = session or make_session()
+    limiter = limiter or HostLimiter()
+    counts = {"parsed": 0, "not_modified": 0, "same_hash": 0}
+    counts_lock = threading.Lock()
+
+    def count(outcome):
+        with counts_lock:
+            counts[outcome] += 1
+
+    def work(url):
+        try:
+            entry = store.get(url) if store else None
+            headers = store.conditional_headers(entry) if store else None
+            resp = limiter.get(session, url, headers=headers)
+            if entry and resp.status_code == 304:
+                count("not_modified")
+                return entry["record"]
+            resp.raise_for_status()
+
+            body_hash = hashlib.sha256(resp.content).hexdigest()
+            if entry and entry["body_hash"] == body_hash:
+                record = entry["record"]
+                count("same_hash")
+            else:
+                record = parse(resp.text, url)
+                count("parsed")
+            if store and record is not None:
+                store.put(url, resp.headers.get("ETag"),
+                          resp.headers.get("Last-Modified"), body_hash, record)
+            return record
+        except Exception as e:
+            print(f"Failed to scrape {url}: {e}")
+            return None
+
+    if not urls:
+        return
+    with ThreadPoolExecutor(max_workers=min(workers, len(urls))) as pool:
+        yield from pool.map(work, urls)
+    if store:
+        print(f"Detail pages: {counts['parsed']} parsed, "
+              f"{counts['not_modified']} not modified, "
+              f"{counts['same_hash']} unchanged body")
+
+
+def fetch_all(urls, parse, **kwargs) -> list:
+    """fetch_iter collected into a list."""
+    return list(fetch_iter(urls, parse, **kwargs))
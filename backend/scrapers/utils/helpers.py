@@ -1,77 +1,227 @@
-import time
-import json
 import csv
+import html as html_lib
+import json
+import re
+from datetime import datetime
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.remote.webdriver import WebDriver
 from selenium.webdriver.remote.webelement import WebElement
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
 import os
 
+from utils.constants import (
+    DATE_TIME_SELECTOR,
+    DETAIL_WAIT,
+    LOCATION_SELECTOR,
+    ORGANIZER_SELECTOR,
+)
 
-def parse_event_card(card: WebElement, driver: WebDriver, seen_titles: set[str]):
-    """
-    Parse one Eventbrite card with deep scrape for Location, Date/Time, Organizer.
-    """
+
+def read_card(card: WebElement) -> tuple[str, str] | None:
+    """(title, detail URL) from an Eventbrite listing card."""
     try:
-        # --- Title + URL from card ---
         anchor = card.find_element(By.TAG_NAME, "a")
         url = anchor.get_attribute("href")
         title = anchor.get_attribute("aria-label") or anchor.text.strip()
+    except WebDriverException:
+        return None
+    if not title or not url:
+        return None
+    return title, url
 
-        if not title or title in seen_titles:
-            return None
-        seen_titles.add(title)
 
-        # --- Open detail page ---
-        driver.execute_script("window.open(arguments[0]);", url)
-        driver.switch_to.window(driver.window_handles[-1])
-        time.sleep(2)  # wait for detail page to load
+def _text(driver: WebDriver, selector: str, default: str) -> str:
+    try:
+        return driver.find_element(By.CSS_SELECTOR, selector).text.strip() or default
+    except WebDriverException:
+        return default
 
-        # --- Location ---
-        try:
-            location = driver.find_element(By.CSS_SELECTOR, "div[data-testid='location']").text.strip()
-        except:
-            location = "Unknown"
 
-        # --- Date & Time ---
-        try:
-            date_time = driver.find_element(By.CSS_SELECTOR, "div[data-testid='dateAndTime']").text.strip()
-        except:
-            date_time = "TBD"
+def parse_event_detail(driver: WebDriver, title: str, url: str, wait: float = DETAIL_WAIT):
+    """
+    Open an Eventbrite detail page and read Location, Date/Time and Organizer,
+    waiting only until the location or date block is on the page.
+    """
+    try:
+        driver.get(url)
+    except TimeoutException:
+        pass  # the blocks we need are often there before the load finishes
+    try:
+        WebDriverWait(driver, wait).until(EC.any_of(
+            EC.presence_of_element_located((By.CSS_SELECTOR, LOCATION_SELECTOR)),
+            EC.presence_of_element_located((By.CSS_SELECTOR, DATE_TIME_SELECTOR)),
+        ))
+    except TimeoutException:
+        print(f"⚠️ No location or date after {wait}s: {url}")
 
-        # --- Organizer ---
-        try:
-            organizer = driver.find_element(
-                By.CSS_SELECTOR,
-                "div[data-testid='organizerBrief'] strong.organizer-info__name-link"
-            ).text.strip()
-        except:
-            organizer = "Unknown"
-
-        # TODO: Category can be added later if needed
-        category = ""
-
-        # Close tab and return to listing
-        driver.close()
-        driver.switch_to.window(driver.window_handles[0])
-
-        return {
-            "Title": title,
-            "URL": url,
-            "Date & Time": date_time,
-            "Location": location,
-            "Category": category,
-            "Organizer": organizer,
-            "Source": "Eventbrite",
-        }
-
-    except Exception as e:
-        print(f"⚠️ Failed to parse a card: {e}")
+    # TODO: Category can be added later if needed
+    return {
+        "Title": title,
+        "URL": url,
+        "Date & Time": _text(driver, DATE_TIME_SELECTOR, "TBD"),
+        "Location": _text(driver, LOCATION_SELECTOR, "Unknown"),
+        "Category": "",
+        "Organizer": _text(driver, ORGANIZER_SELECTOR, "Unknown"),
+        "Source": "Eventbrite",
+    }
+
+
+# ========= BROWSERLESS (embedded JSON) =========
+
+_LD_JSON = re.compile(
+    r'<script[^>]*type=["\']application/ld\+json["\'][^>]*>(.*?)</script>', re.S | re.I)
+_SERVER_DATA = re.compile(r"window\.__SERVER_DATA__\s*=\s*")
+
+
+def _json_ld(page: str):
+    """Every JSON-LD object on a page, with lists and @graph flattened."""
+    for block in _LD_JSON.findall(page):
         try:
-            driver.close()
-            driver.switch_to.window(driver.window_handles[0])
-        except:
-            pass
+            data = json.loads(block.strip(), strict=False)
+        except json.JSONDecodeError:
+            continue
+        stack = data if isinstance(data, list) else [data]
+        while stack:
+            obj = stack.pop(0)
+            if isinstance(obj, list):
+                stack.extend(obj)
+            elif isinstance(obj, dict):
+                if "@graph" in obj:
+                    stack.extend(obj["@graph"])
+                yield obj
+
+
+def _server_data(page: str) -> dict:
+    """The `window.__SERVER_DATA__` state Eventbrite renders pages from, or {}."""
+    m = _SERVER_DATA.search(page)
+    if not m:
+        return {}
+    try:
+        data, _ = json.JSONDecoder(strict=False).raw_decode(page, m.end())
+    except json.JSONDecodeError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _is_event(obj: dict) -> bool:
+    types = obj.get("@type")
+    types = types if isinstance(types, list) else [types]
+    return any(isinstance(t, str) and (t.endswith("Event") or t == "Festival") for t in types)
+
+
+def parse_listing_html(page: str) -> list[tuple[str, str]]:
+    """(title, URL) of each event on a listing page, from its JSON-LD ItemList or server data."""
+    links = []
+    for obj in _json_ld(page):
+        if obj.get("@type") != "ItemList":
+            continue
+        for element in obj.get("itemListElement") or []:
+            item = element.get("item") or element
+            if item.get("url") and item.get("name"):
+                links.append((html_lib.unescape(item["name"]), item["url"]))
+    if not links:
+        results = (((_server_data(page).get("search_data") or {})
+                    .get("events") or {}).get("results") or [])
+        links = [(html_lib.unescape(r["name"]), r["url"])
+                 for r in results if r.get("name") and r.get("url")]
+    return list(dict.fromkeys(links))
+
+
+def _parse_iso(value) -> datetime | None:
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def _has_time(value) -> bool:
+    """Whether an ISO startDate/endDate carries a time, not just "2025-03-01"."""
+    return len(str(value).strip()) > 10
+
+
+def _format_when(start: datetime, end: datetime | None, timed: bool = True) -> str:
+    """
+    The detail page's date text, in a form normalize_all parses: "Sat, 4 Oct
+    2025 · 12:00 PM - 10:00 PM". Without `timed` only the days are given.
+    """
+    def day(d):
+        return f"{d:%a}, {d.day} {d:%b %Y}"
+
+    def clock(d):
+        return d.strftime("%I:%M %p").lstrip("0")
+
+    days = day(start) if end is None or end.date() == start.date() else f"{day(start)} - {day(end)}"
+    if not timed:
+        return days
+    return f"{days} · {clock(start)}" if end is None else f"{days} · {clock(start)} - {clock(end)}"
+
+
+def _format_location(location) -> str:
+    """The detail page's location block: "Location\\n<venue>\\n<address>\\nGet directions"."""
+    if isinstance(location, list):
+        location = location[0] if location else None
+    if not isinstance(location, dict):
+        return "Unknown"
+    if location.get("@type") == "VirtualLocation":
+        return "Location\nOnline event"
+    name = html_lib.unescape(location.get("name") or "").strip()
+    address = location.get("address")
+    if isinstance(address, dict):
+        street = " ".join(filter(None, [address.get("streetAddress"), address.get("addressLocality")]))
+        region = " ".join(filter(None, [address.get("addressRegion"), address.get("postalCode")]))
+        address = ", ".join(filter(None, [street, region]))
+    lines = ["Location", name or address or "Unknown"]
+    if address:
+        lines += [address, "Get directions"]
+    return "\n".join(lines)
+
+
+def _format_price(offers) -> str | None:
+    offers = offers if isinstance(offers, list) else [offers] if offers else []
+    prices, currency = [], None
+    for offer in offers:
+        for field in ("lowPrice", "highPrice", "price"):
+            try:
+                prices.append(float(offer[field]))
+            except (KeyError, TypeError, ValueError):
+                pass
+        currency = currency or offer.get("priceCurrency")
+    if not prices:
+        return None
+    low, high = min(prices), max(prices)
+    if high == 0:
+        return "Free"
+    currency = currency or "AUD"
+    return f"{currency} {low:g}" if low == high else f"{currency} {low:g} - {high:g}"
+
+
+def parse_event_html(page: str, url: str) -> dict | None:
+    """
+    An Eventbrite detail page's record from its JSON-LD, in the same shape
+    as parse_event_detail's. None when the page has no event data.
+    """
+    event = next((obj for obj in _json_ld(page) if _is_event(obj) and obj.get("name")), None)
+    if event is None:
         return None
+    start, end = _parse_iso(event.get("startDate")), _parse_iso(event.get("endDate"))
+    when = _format_when(start, end, _has_time(event.get("startDate"))) if start else None
+    organizer = event.get("organizer")
+    if isinstance(organizer, list):
+        organizer = organizer[0] if organizer else None
+    organizer = organizer.get("name") if isinstance(organizer, dict) else organizer
+    return {
+        "Title": html_lib.unescape(event["name"]).strip(),
+        "URL": url,
+        "Date & Time": f"Date and time\n{when}" if start else "TBD",
+        "Location": _format_location(event.get("location")),
+        "Category": "",
+        "Organizer": html_lib.unescape(organizer).strip() if organizer else "Unknown",
+        "Price": _format_price(event.get("offers")),
+        "Description": html_lib.unescape(event.get("description") or "").strip() or None,
+        "Source": "Eventbrite",
+    }
 
 
 def export_to_csv(events: list[dict[str, str]], filename: str) -> None:
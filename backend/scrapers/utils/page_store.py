@@ -0,0 +1,78 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from utils.paths import DATA_DIR
+
+STORE_PATH = os.getenv("PAGE_STORE_PATH") or os.path.join(
+    DATA_DIR, "page_store.sqlite3")
+
+
+class PageStore:
+    """
+    Remembers ETag, Last-Modified, body hash and the extracted record for each
+    detail page so unchanged pages can be skipped on the next scrape.
+    Entries are namespaced per scraper since each one extracts different records,
+    and tagged with the scraper's parser version: entries written by another
+    version are treated as missing, so a parser change reaches every page.
+    """
+
+    def __init__(self, namespace: str, version: int = 1, path: str = STORE_PATH):
+        self.namespace = namespace
+        self.version = version
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                namespace TEXT NOT NULL,
+                url TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                body_hash TEXT,
+                record TEXT,
+                fetched_at REAL NOT NULL,
+                parser_version INTEGER,
+                PRIMARY KEY (namespace, url)
+            )
+            """
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(pages)")]
+        if "parser_version" not in columns:
+            # Stores from before versioning; their entries are re-parsed once
+            self._conn.execute("ALTER TABLE pages ADD COLUMN parser_version INTEGER")
+        self._conn.commit()
+
+    def get(self, url: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, body_hash, record FROM pages "
+                "WHERE namespace = ? AND url = ? AND parser_version = ?",
+                (self.namespace, url, self.version),
+            ).fetchone()
+        if not row or row[3] is None:
+            return None
+        return {"etag": row[0], "last_modified": row[1],
+                "body_hash": row[2], "record": json.loads(row[3])}
+
+    def put(self, url: str, etag: str | None, last_modified: str | None,
+            body_hash: str, record) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (namespace, url, etag, last_modified, "
+                "body_hash, record, fetched_at, parser_version) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.namespace, url, etag, last_modified, body_hash,
+                 json.dumps(record, ensure_ascii=False), time.time(), self.version),
+            )
+            self._conn.commit()
+
+    def conditional_headers(self, entry: dict | None) -> dict:
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
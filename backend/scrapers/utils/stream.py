@@ -0,0 +1,20 @@
+import contextlib
+import json
+import sys
+
+
+def emit_ndjson(records) -> int:
+    """
+    Write records to stdout as NDJSON as they are produced, for the streaming
+    pipeline to read. Progress prints go to stderr meanwhile so they cannot
+    corrupt the stream.
+    """
+    out = sys.stdout
+    count = 0
+    with contextlib.redirect_stdout(sys.stderr):
+        for record in records:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            count += 1
+    print(f"Streamed {count} records", file=sys.stderr)
+    return count
@@ -0,0 +1,313 @@
+"""
+Streaming refresh: records flow from the scrapers to Supabase as they are
+produced, instead of through whole-file JSON dumps between stages.
+
+    scraper processes (--ndjson on stdout)
+      -> one reader per source: drops raw repeats, checkpoints to data/<source>.ndjson
+      -> normalize workers: geocode and normalize
+      -> loader: cross-source dedup, batched upserts
+
+Stages are joined by bounded queues, so a slow stage holds back the ones
+before it rather than letting records pile up in memory. The loader upserts
+every STREAM_BATCH_SIZE rows or STREAM_FLUSH_SECONDS, whichever comes first.
+Rows missing from the new data are deleted at the end, but only for sources
+whose scrape completed. Run through `python pipeline.py --stream`.
+"""
+import os
+import sys
+import json
+import time
+import queue
+import threading
+import subprocess
+
+from supabase import create_client
+
+from dedup import Deduplicator, merge_into
+from load_to_supabase import chunks, content_hash, fetch_remote_hashes, notify_api, to_row
+from normalize_all import DATA_DIR, GEOCODE_WORKERS, NORMALIZERS, raw_key
+from utils.ndjson import NdjsonWriter
+
+# ========= CONFIG =========
+SCRAPERS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scrapers")
+LOG_DIR = os.path.join(DATA_DIR, "logs")
+NORMALIZED_CHECKPOINT = os.path.join(DATA_DIR, "normalized_events.ndjson")
+QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", 500))
+BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", 200))
+FLUSH_SECONDS = float(os.getenv("STREAM_FLUSH_SECONDS", 2))
+NORMALIZE_WORKERS = int(os.getenv("STREAM_NORMALIZE_WORKERS", GEOCODE_WORKERS))
+# The row kept for a cross-source group: the batch load's source order, then
+# the smallest source_link_hash, so it does not depend on which scraper is first
+SOURCE_PRIORITY = {filename: n for n, filename in enumerate(NORMALIZERS)}
+
+_DONE = object()
+
+
+def _stream_source(source, command, filename, timeout, out, report, started):
+    """
+    Run a scraper with --ndjson and pass its unique records on as they
+    arrive. The raw checkpoint replaces the previous one only when the
+    scrape completes.
+    """
+    row = report[source]
+    os.makedirs(LOG_DIR, exist_ok=True)
+    checkpoint = NdjsonWriter(os.path.join(DATA_DIR, filename.replace(".json", ".ndjson")))
+    timed_out = threading.Event()
+    seen = set()
+    name = filename.replace(".json", "")
+    with open(os.path.join(LOG_DIR, f"{source}.log"), "w", encoding="utf-8") as log:
+        proc = subprocess.Popen([sys.executable, *command, "--ndjson"], cwd=SCRAPERS_DIR,
+                                stdout=subprocess.PIPE, stderr=log, text=True, encoding="utf-8")
+
+        def kill():
+            timed_out.set()
+            proc.kill()
+
+        timer = threading.Timer(timeout, kill)
+        timer.start()
+        for line in proc.stdout:
+            try:
+                raw = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            row["raw"] += 1
+            if row["first"] is None:
+                row["first"] = time.monotonic() - started
+            key = raw_key(raw, name)
+            if key in seen:
+                continue
+            seen.add(key)
+            checkpoint.write(raw)
+            if filename in NORMALIZERS:
+                out.put((filename, raw))
+        code = proc.wait()
+        timer.cancel()
+
+    row["scrape"] = time.monotonic() - started
+    row["unique"] = checkpoint.count
+    if timed_out.is_set():
+        row["status"] = f"timed out after {timeout}s"
+    elif code != 0:
+        row["status"] = f"exit {code}"
+    elif not checkpoint.count:
+        # An empty scrape is treated as a failure so its rows are not all deleted
+        row["status"] = "no records"
+    else:
+        row["status"] = "ok"
+    if row["status"] == "ok":
+        checkpoint.commit()
+    else:
+        checkpoint.abort()
+    print(f"[{source}] {row['status']}: {checkpoint.count} records in {row['scrape']:.1f}s")
+
+
+def read_scraper(source, command, filename, timeout, out, report, started):
+    try:
+        _stream_source(source, command, filename, timeout, out, report, started)
+    except Exception as e:
+        report[source]["status"] = f"failed: {e}"
+        print(f"[{source}] failed: {e}")
+
+
+def normalize_worker(inbox, out, errors):
+    while True:
+        item = inbox.get()
+        if item is _DONE:
+            return
+        filename, raw = item
+        try:
+            out.put((filename, NORMALIZERS[filename](raw)))
+        except Exception as e:
+            errors.append(f"{filename}: {e}")
+
+
+class StreamLoader:
+    """
+    Cross-source dedup and batched upserts over a stream of normalized
+    events. Only rows whose content hash differs from the remote table are
+    written; when a later duplicate fills gaps in a row already written, the
+    row is written again. Each group keeps the row of its preferred event
+    (SOURCE_PRIORITY), whatever order the events arrive in.
+    """
+
+    def __init__(self, sb=None, dry_run: bool = False):
+        self.sb = sb
+        self.dry_run = dry_run
+        self.remote = fetch_remote_hashes(sb) if sb else {}
+        self.dedup = Deduplicator()
+        self.index: dict[str, int] = {}  # source_link_hash -> dedup index
+        self.keys: list[str] = []  # dedup index -> source_link_hash
+        self.ranks: list[tuple] = []  # dedup index -> preference for being kept
+        self.groups: dict[int, list[int]] = {}  # dedup root -> members, preferred first
+        self.live: set[str] = set()  # hashes of the rows kept
+        self.labels: dict[str, set] = {}  # source file -> row "source" values
+        self.pending: dict[str, dict] = {}
+        self.absorbed: set[str] = set()
+        self.pending_since = None
+        self.checkpoint = NdjsonWriter(NORMALIZED_CHECKPOINT)
+        self.stats = {"events": 0, "no_coords": 0, "duplicates": 0, "written": 0,
+                      "unchanged": 0, "deleted": 0, "failed": 0, "batches": 0, "first_write": None}
+        self.started = time.monotonic()
+
+    def add(self, filename: str, ev: dict) -> None:
+        self.stats["events"] += 1
+        self.checkpoint.write(ev)
+        row = to_row(ev)
+        if row.get("lat") is None or row.get("lng") is None:
+            self.stats["no_coords"] += 1
+            return
+        key = row["source_link_hash"]
+        if key in self.index:
+            return
+        self.labels.setdefault(filename, set()).add(row.get("source"))
+        i = len(self.dedup.events)
+        # Dedup compares the normalized start/end, which rows rename
+        root, absorbed = self.dedup.add(dict(ev))
+        self.index[key] = i
+        self.keys.append(key)
+        self.ranks.append((SOURCE_PRIORITY.get(filename, len(SOURCE_PRIORITY)), key))
+
+        group, kept_before = [i], []
+        for r in ([root] if root != i else []) + absorbed:
+            kept_before.append(self.groups[r][0])
+            group += self.groups.pop(r)
+        if root != i:
+            self.stats["duplicates"] += 1 + len(absorbed)
+        group.sort(key=self.ranks.__getitem__)
+        self.groups[root] = group
+        # A preferred event joined the group, or this one bridged two groups:
+        # rows kept until now are replaced by the group's row
+        for j in kept_before:
+            if j != group[0]:
+                self.live.discard(self.keys[j])
+                self.pending.pop(self.keys[j], None)
+                self.absorbed.add(self.keys[j])
+        kept = self.keys[group[0]]
+        self.live.add(kept)
+
+        merged = dict(self.dedup.events[group[0]])
+        for j in group[1:]:
+            merge_into(merged, self.dedup.events[j])
+        merged = to_row(merged)
+        # keyed as scraped, not on fields filled in from duplicates
+        merged["source_link_hash"] = kept
+        merged["content_hash"] = content_hash(merged)
+        self.pending[kept] = merged
+        if self.pending_since is None:
+            self.pending_since = time.monotonic()
+        if len(self.pending) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        rows = [r for k, r in self.pending.items()
+                if self.remote.get(k, {}).get("content_hash") != r["content_hash"]]
+        self.stats["unchanged"] += len(self.pending) - len(rows)
+        self.pending, self.pending_since = {}, None
+        if not rows:
+            return
+        if self.sb and not self.dry_run:
+            try:
+                self.sb.table("events").upsert(rows, on_conflict="source_link_hash").execute()
+            except Exception as e:
+                # Left out of `remote`, so the next run sends these rows again
+                print(f"Upsert of {len(rows)} rows failed: {e}")
+                self.stats["failed"] += len(rows)
+                return
+        for r in rows:
+            self.remote[r["source_link_hash"]] = {
+                "content_hash": r["content_hash"], "source": r.get("source")}
+        self.stats["written"] += len(rows)
+        self.stats["batches"] += 1
+        if self.stats["first_write"] is None:
+            self.stats["first_write"] = time.monotonic() - self.started
+
+    def consume(self, inbox) -> None:
+        while True:
+            try:
+                item = inbox.get(timeout=FLUSH_SECONDS)
+            except queue.Empty:
+                item = None
+            if item is _DONE:
+                self.flush()
+                return
+            if item is not None:
+                self.add(*item)
+            if self.pending_since is not None and \
+                    time.monotonic() - self.pending_since >= FLUSH_SECONDS:
+                self.flush()
+
+    def finish(self, completed) -> None:
+        """Delete rows that are gone from completed sources, and commit the checkpoint."""
+        self.flush()
+        labels = set().union(*(self.labels.get(f, set()) for f in completed))
+        deletes = sorted(
+            k for k, r in self.remote.items()
+            if k not in self.live and (k in self.absorbed or r.get("source") in labels))
+        if self.sb and not self.dry_run:
+            for batch in chunks(deletes, 200):
+                self.sb.table("events").delete().in_("source_link_hash", batch).execute()
+        self.stats["deleted"] = len(deletes)
+        self.checkpoint.commit()
+
+
+def run(sources: dict, dry_run: bool = False, skip_load: bool = False) -> None:
+    """Stream the given sources ({name: (command, file, timeout)}) through to Supabase."""
+    sb = None
+    if not skip_load:
+        url = os.getenv("SUPABASE_URL")
+        key_sb = os.getenv("SUPABASE_SERVICE_KEY") or os.getenv("SUPABASE_ANON_KEY")
+        if not url or not key_sb:
+            raise SystemExit("Missing SUPABASE_URL or SUPABASE_*_KEY in environment")
+        sb = create_client(url, key_sb)
+
+    started = time.monotonic()
+    loader = StreamLoader(sb, dry_run=dry_run)
+    raw_queue = queue.Queue(maxsize=QUEUE_SIZE)
+    event_queue = queue.Queue(maxsize=QUEUE_SIZE)
+    errors = []
+    report = {s: {"status": "running", "raw": 0, "unique": 0, "first": None, "scrape": 0.0}
+              for s in sources}
+
+    readers = [threading.Thread(target=read_scraper, args=(
+        s, command, filename, timeout, raw_queue, report, started))
+        for s, (command, filename, timeout) in sources.items()]
+    workers = [threading.Thread(target=normalize_worker, args=(raw_queue, event_queue, errors))
+               for _ in range(NORMALIZE_WORKERS)]
+    loader_thread = threading.Thread(target=loader.consume, args=(event_queue,))
+    print(f"Streaming {len(sources)} sources ({NORMALIZE_WORKERS} normalize workers, "
+          f"queues of {QUEUE_SIZE}, batches of {BATCH_SIZE})...")
+    for t in [*readers, *workers, loader_thread]:
+        t.start()
+
+    for t in readers:
+        t.join()
+    for _ in workers:
+        raw_queue.put(_DONE)
+    for t in workers:
+        t.join()
+    event_queue.put(_DONE)
+    loader_thread.join()
+
+    completed = [sources[s][1] for s, row in report.items() if row["status"] == "ok"]
+    loader.finish(completed)
+    if loader.stats["written"] or loader.stats["deleted"]:
+        if sb and not dry_run:
+            notify_api()
+
+    print("\n========= STREAM REPORT =========")
+    print(f"{'source':<20}{'first':>8}{'scrape':>9}{'raw':>7}{'unique':>8}  status")
+    for source, row in report.items():
+        first = f"{row['first']:.1f}s" if row["first"] is not None else "-"
+        print(f"{source:<20}{first:>8}{row['scrape']:>8.1f}s{row['raw']:>7}{row['unique']:>8}  {row['status']}")
+    stats = loader.stats
+    first_write = f"{stats['first_write']:.1f}s" if stats["first_write"] is not None else "-"
+    action = "written" if sb and not dry_run else "to write"
+    print(f"Normalized {stats['events']} events ({stats['no_coords']} without coordinates, "
+          f"{stats['duplicates']} duplicates, {len(errors)} errors)")
+    print(f"Rows {action}: {stats['written']} in {stats['batches']} batches "
+          f"(first after {first_write}), {stats['unchanged']} unchanged, "
+          f"{stats['deleted']} deleted, {stats['failed']} failed")
+    for error in errors[:10]:
+        print(f"  normalize error: {error}")
+    print(f"Checkpoint: {NORMALIZED_CHECKPOINT}")
+    print(f"Total: {time.monotonic() - started:.1f}s")
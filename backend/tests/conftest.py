@@ -0,0 +1,20 @@
+import pytest
+
+
+@pytest.fixture
+def event():
+    """Factory for a normalized event: one evening's Jazz Night at the Rhino Room."""
+    def make(day, source="Eventbrite", **fields):
+        return {
+            "title": "Jazz Night",
+            "date": f"Sat {day} Mar",
+            "start": f"2025-03-{day:02d}T19:00:00+10:30",
+            "end": f"2025-03-{day:02d}T22:00:00+10:30",
+            "location": "Rhino Room",
+            "lat": -34.9253,
+            "lng": 138.6088,
+            "source": source,
+            "link": f"https://example.com/{source}/{day}",
+            **fields,
+        }
+    return make
@@ -0,0 +1,19 @@
+from datetime import date
+
+from utils import dates
+
+REF = date(2025, 11, 1)
+
+
+def test_range_across_new_year_with_year_on_the_end():
+    assert dates.parse_text("30 Dec - 2 Jan 2026", REF) == {
+        "start": "2025-12-30T00:00:00+10:30", "end": "2026-01-02T23:59:59+10:30", "recurrence": None}
+    assert dates.parse_festival("Tue 30 Dec - Fri 2 Jan 2026", REF)["start"] == "2025-12-30T00:00:00+10:30"
+
+
+def test_range_across_new_year_with_year_on_the_start():
+    assert dates.parse_text("28 Dec 2025 - 3 Jan", REF)["end"] == "2026-01-03T23:59:59+10:30"
+
+
+def test_year_carries_within_one_year():
+    assert dates.parse_text("1 Jan - 3 Jan 2026", REF)["start"] == "2026-01-01T00:00:00+10:30"
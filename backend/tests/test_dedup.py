@@ -0,0 +1,14 @@
+from dedup import deduplicate
+
+
+def undated(event, text, source="Eventbrite"):
+    return event(1, source=source, date=text, start=None, end=None)
+
+
+def test_undated_events_with_different_date_text_stay_separate(event):
+    assert len(deduplicate([undated(event, "TBA"), undated(event, "Coming soon")])) == 2
+    assert len(deduplicate([undated(event, "TBA"), undated(event, "Coming soon", "GoogleEvents")])) == 2
+
+
+def test_undated_events_with_the_same_date_text_merge(event):
+    assert len(deduplicate([undated(event, "TBA"), undated(event, " tba", "GoogleEvents")])) == 1
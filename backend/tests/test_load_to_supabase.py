@@ -0,0 +1,30 @@
+from load_to_supabase import build_rows, key
+
+
+def test_same_title_and_venue_on_different_dates_stay_separate(event):
+    rows = build_rows([event(1), event(8)])
+
+    assert sorted(r["start_at"] for r in rows) == [
+        "2025-03-01T19:00:00+10:30", "2025-03-08T19:00:00+10:30"]
+
+
+def test_same_event_from_two_sources_is_merged(event):
+    first = event(1, organiser=None)
+    rows = build_rows([first, event(1, source="GoogleEvents", organiser="Rhino Room")])
+
+    assert len(rows) == 1
+    # filled in from the duplicate, but keyed on the event as scraped
+    assert rows[0]["organiser"] == "Rhino Room"
+    assert rows[0]["source_link_hash"] == key(
+        first["source"], first["link"], first["title"], first["date"], first["location"])
+
+
+def test_events_without_coordinates_are_skipped(event):
+    assert build_rows([event(1, lat=None)]) == []
+
+
+def test_end_before_start_is_dropped(event):
+    [row] = build_rows([event(1, end="2025-02-28T22:00:00+10:30")])
+
+    assert row["start_at"] == "2025-03-01T19:00:00+10:30"
+    assert row["end_at"] is None
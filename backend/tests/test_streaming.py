@@ -0,0 +1,102 @@
+import pytest
+
+streaming = pytest.importorskip("streaming")
+
+from load_to_supabase import to_row
+
+
+class Table:
+    """Records the deletes StreamLoader.finish() sends."""
+
+    def __init__(self):
+        self.deleted = []
+
+    def delete(self):
+        return self
+
+    def in_(self, column, values):
+        self.deleted += values
+        return self
+
+    def execute(self):
+        return None
+
+
+class Client:
+    def __init__(self):
+        self.events = Table()
+
+    def table(self, name):
+        return self.events
+
+
+@pytest.fixture
+def loader(tmp_path, monkeypatch):
+    monkeypatch.setattr(streaming, "NORMALIZED_CHECKPOINT", str(tmp_path / "normalized_events.ndjson"))
+    return streaming.StreamLoader()
+
+
+def test_row_is_written_again_when_a_later_duplicate_fills_it_in(loader, event):
+    loader.add("eventbrite.json", event(1, organiser=None))
+    loader.flush()
+    loader.add("ticketmaster.json", event(1, source="Ticketmaster", organiser="Rhino Room"))
+    loader.add("google_events.json", event(1, source="GoogleEvents"))
+    [row] = loader.pending.values()
+    loader.flush()
+
+    assert row["source"] == "Eventbrite" and row["organiser"] == "Rhino Room"
+    assert loader.stats["written"] == 2 and loader.stats["duplicates"] == 2
+    assert set(loader.remote) == loader.live == {row["source_link_hash"]}
+
+
+def test_event_bridging_two_groups_leaves_one_row(loader, event):
+    # Two evenings from one source stay apart, until a listing covering both joins them
+    first, third = event(1), event(3)
+    loader.add("eventbrite.json", first)
+    loader.add("eventbrite.json", third)
+    loader.flush()
+    assert len(loader.live) == 2
+
+    loader.add("ticketmaster.json", event(1, source="Ticketmaster", end="2025-03-03T22:00:00+10:30"))
+
+    [kept] = loader.live
+    assert len(loader.absorbed) == 1 and kept not in loader.absorbed
+    assert list(loader.pending) == [kept]
+    assert {kept, *loader.absorbed} == set(loader.remote)
+
+
+def test_finish_deletes_rows_gone_from_completed_sources(loader, event):
+    ticketmaster = event(1, source="Ticketmaster")
+    loader.add("ticketmaster.json", ticketmaster)
+    loader.flush()
+    # Eventbrite's listing is preferred, so the row written for Ticketmaster's goes
+    loader.add("eventbrite.json", event(1))
+    loader.add("ticketmaster.json", event(8, source="Ticketmaster"))
+    loader.flush()
+    loader.remote.update({
+        "gone-eventbrite": {"content_hash": "x", "source": "Eventbrite"},
+        "gone-ticketmaster": {"content_hash": "x", "source": "Ticketmaster"},
+    })
+    loader.sb = Client()
+
+    loader.finish(["eventbrite.json"])
+
+    # Ticketmaster's scrape did not complete, so its missing rows stay
+    absorbed = to_row(ticketmaster)["source_link_hash"]
+    assert sorted(loader.sb.events.deleted) == sorted(["gone-eventbrite", absorbed])
+    assert loader.stats["deleted"] == 2
+
+
+def test_kept_row_does_not_depend_on_arrival_order(loader, event):
+    events = [("ticketmaster.json", event(1, source="Ticketmaster")),
+              ("eventbrite.json", event(1, organiser="Rhino Room"))]
+    kept = []
+    for order in (events, events[::-1]):
+        loader = streaming.StreamLoader()
+        for filename, ev in order:
+            loader.add(filename, ev)
+        kept.append((loader.live, list(loader.pending.values())))
+
+    assert kept[0] == kept[1]
+    live, [row] = kept[0]
+    assert row["source"] == "Eventbrite" and live == {row["source_link_hash"]}
@@ -0,0 +1,240 @@
+"""
+Parse each source's free-text dates into ISO timestamps (Adelaide time).
+
+Every parser returns {"start", "end", "recurrence"}:
+- start/end: ISO 8601 timestamps with the local UTC offset. When no time of
+  day is given, start is midnight and end is the last second of the day.
+- recurrence: for listings that repeat over a period (South Australia's
+  "from - until, Next Occurrence"), {"from", "until", "next"} ISO dates;
+  otherwise None.
+Values are None when the text cannot be parsed. The same strings recur
+across thousands of listings, so parsing is memoized.
+"""
+import re
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+TZ = ZoneInfo("Australia/Adelaide")
+CACHE_SIZE = 8192
+
+_MONTHS = {m: i for i, m in enumerate(
+    ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), 1)}
+_WEEKDAYS = {d: i for i, d in enumerate(("mon", "tue", "wed", "thu", "fri", "sat", "sun"))}
+
+_WEEKDAY = r"(?:(?P<{0}>mon|tue|wed|thu|fri|sat|sun)[a-z]*\.?,?\s+)?"
+_MONTH = r"(?P<{0}>jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?"
+_DAY = r"(?P<{0}>\d{{1,2}})(?:st|nd|rd|th)?"
+_YEAR = r"(?:,?\s+(?P<{0}>'\d{{2}}|\d{{4}})(?![:\d]))?"
+_DATE = re.compile(
+    "(?:" + _WEEKDAY.format("wd1") + _DAY.format("d1") + r"\s+" + _MONTH.format("m1") + _YEAR.format("y1") + ")"
+    "|(?:" + _WEEKDAY.format("wd2") + _MONTH.format("m2") + r"\s+" + _DAY.format("d2") + _YEAR.format("y2") + ")",
+    re.IGNORECASE,
+)
+_TIME = re.compile(r"(?<![\d:])(\d{1,2})(?::(\d{2}))?(?::\d{2})?\s*([ap]\.?m\.?)?(?![\d:])", re.IGNORECASE)
+
+
+def _empty() -> dict:
+    return {"start": None, "end": None, "recurrence": None}
+
+
+def _infer_year(month: int, day: int, weekday: int | None, ref: date) -> int | None:
+    """Year for a date given without one: the weekday must fit, else the nearest to ref."""
+    best = None
+    for year in (ref.year - 1, ref.year, ref.year + 1):
+        try:
+            d = date(year, month, day)
+        except ValueError:
+            continue
+        if weekday is not None and d.weekday() != weekday:
+            continue
+        if best is None or abs((d - ref).days) < abs((best - ref).days):
+            best = d
+    return best.year if best else None
+
+
+def _dates(text: str, ref: date) -> list[tuple[date, int, int]]:
+    """Dates mentioned in text, as (date, start offset, end offset)."""
+    found = []
+    for m in _DATE.finditer(text):
+        n = "1" if m["d1"] else "2"
+        day, month = int(m["d" + n]), _MONTHS[m["m" + n][:3].lower()]
+        wd = m["wd" + n]
+        weekday = _WEEKDAYS[wd[:3].lower()] if wd else None
+        year = m["y" + n]
+        if year:
+            year = 2000 + int(year[1:]) if year.startswith("'") else int(year)
+        found.append([day, month, year, weekday, m.start(), m.end()])
+
+    # A year given on one date carries to its neighbours ("5 - 7 Oct 2025"),
+    # a year back or forward where a range crosses new year ("30 Dec - 2 Jan 2026")
+    anchor = next((i for i, f in enumerate(found) if f[2]), None)
+    if anchor is not None:
+        for i in range(anchor - 1, -1, -1):
+            if not found[i][2]:
+                found[i][2] = _carry(found[i], found[i + 1], -1)
+        for i in range(anchor + 1, len(found)):
+            if not found[i][2]:
+                found[i][2] = _carry(found[i], found[i - 1], 1)
+    out = []
+    for day, month, year, weekday, start, end in found:
+        year = year or _infer_year(month, day, weekday, ref)
+        if year is None:
+            continue
+        try:
+            d = date(year, month, day)
+        except ValueError:
+            continue
+        if out and d < out[-1][0] and anchor is None:
+            d = d.replace(year=d.year + 1)  # range running into the new year
+        out.append((d, start, end))
+    return out
+
+
+def _carry(f: list, neighbour: list, step: int) -> int | None:
+    """
+    The year of date f from the neighbour after it (step -1) or before it
+    (step 1): the same year, or one back/forward if f would land on the
+    wrong side of the neighbour.
+    """
+    year = neighbour[2]
+    if year is None:
+        return None
+    here, there = (f[1], f[0]), (neighbour[1], neighbour[0])
+    if (step < 0 and here > there) or (step > 0 and here < there):
+        return year + step
+    return year
+
+
+def _times(text: str) -> list[list]:
+    """Times of day in text as [hour, minute, meridiem or None], dates already blanked out."""
+    times = [[int(h), int(mm or 0), (ap or "").replace(".", "").lower() or None]
+             for h, mm, ap in _TIME.findall(text)]
+    times = [t for t in times if t[0] < 24 and t[1] < 60]
+    # A bare number only counts as a time next to one with am/pm ("7 - 10pm")
+    if not any(t[2] for t in times) and not re.search(r"\d:\d", text):
+        return []
+    return times
+
+
+def _to_24h(t) -> time:
+    hour, minute, meridiem = t
+    if meridiem == "pm" and hour < 12:
+        hour += 12
+    elif meridiem == "am" and hour == 12:
+        hour = 0
+    return time(hour, minute)
+
+
+def _stamp(d: date, t: time) -> str:
+    return datetime.combine(d, t, tzinfo=TZ).isoformat()
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse(text: str, ref: date) -> tuple[str | None, str | None]:
+    dates = _dates(text, ref)
+    if not dates:
+        return None, None
+    blanked = text
+    for _, s, e in reversed(dates):
+        blanked = blanked[:s] + " " * (e - s) + blanked[e:]
+    times = _times(blanked)[:2]
+
+    start_day = dates[0][0]
+    end_day = dates[1][0] if len(dates) > 1 else start_day
+    if not times:
+        return _stamp(start_day, time(0, 0)), _stamp(end_day, time(23, 59, 59))
+
+    if len(times) == 2 and times[0][2] is None:
+        # "7 - 10pm": the start shares the end's am/pm unless that puts it after the end
+        times[0][2] = times[1][2]
+        if len(dates) == 1 and _to_24h(times[0]) > _to_24h(times[1]):
+            times[0][2] = "am"
+    start = _to_24h(times[0])
+    if len(times) == 1:
+        return _stamp(start_day, start), None
+    end = _to_24h(times[1])
+    if len(dates) == 1 and end <= start:
+        end_day = start_day + timedelta(days=1)  # "10pm - 3am"
+    return _stamp(start_day, start), _stamp(end_day, end)
+
+
+def parse_text(text: str | None, ref: date | None = None) -> dict:
+    """Parse a free-text date/time; year-less dates are resolved around ref (today)."""
+    result = _empty()
+    if not text:
+        return result
+    result["start"], result["end"] = _parse(" ".join(text.split()), ref or date.today())
+    return result
+
+
+def parse_eventbrite(text: str | None, ref: date | None = None) -> dict:
+    """"Date and time\\nSaturday, October 4 · 12 - 10pm ACST" and the other card layouts."""
+    if not text:
+        return _empty()
+    text = text.replace("Date and time", "").replace("Starts on", "").replace("·", " ")
+    return parse_text(text, ref)
+
+
+def parse_festival(text: str | None, ref: date | None = None) -> dict:
+    """Festival Centre day labels: "27 Sept", "29 Sept '25"."""
+    return parse_text(text, ref)
+
+
+def parse_google(start_date: str | None, when: str | None, ref: date | None = None) -> dict:
+    """Google's "when" ("Sat, 27 Sept, 7:00 – 8:30 pm"), falling back to start_date ("Sept 27")."""
+    result = parse_text((when or "").replace("–", " - "), ref)
+    if result["start"] is None:
+        result = parse_text(start_date, ref)
+    return result
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_southaustralia(text: str, ref: date):
+    period, _, next_text = text.partition("Next Occurrence")
+    dates = _dates(period, ref)
+    if not dates:
+        return None, None, None
+    first, last = dates[0][0], dates[-1][0]
+    nxt = _dates(next_text, ref)
+    recurrence = None
+    if last > first:
+        recurrence = (first.isoformat(), last.isoformat(), nxt[0][0].isoformat() if nxt else None)
+    return _stamp(first, time(0, 0)), _stamp(last, time(23, 59, 59)), recurrence
+
+
+def parse_southaustralia(text: str | None, ref: date | None = None) -> dict:
+    """"Sat 30th Aug 2025 - Sun 1st Feb 2026 Next Occurrence : Sat 27th Sep 2025"."""
+    result = _empty()
+    if not text:
+        return result
+    start, end, recurrence = _parse_southaustralia(" ".join(text.split()), ref or date.today())
+    result["start"], result["end"] = start, end
+    if recurrence:
+        result["recurrence"] = dict(zip(("from", "until", "next"), recurrence))
+    return result
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_ticketmaster(local_date: str, local_time: str):
+    try:
+        d = date.fromisoformat(local_date[:10])
+    except ValueError:
+        return None, None
+    try:
+        return _stamp(d, time.fromisoformat(local_time)), None
+    except ValueError:
+        return _stamp(d, time(0, 0)), _stamp(d, time(23, 59, 59))
+
+
+def parse_ticketmaster(local_date: str | None, local_time: str | None) -> dict:
+    """Ticketmaster localDate ("2025-09-28") and localTime ("19:30:00", may be empty)."""
+    result = _empty()
+    if local_date:
+        result["start"], result["end"] = _parse_ticketmaster(local_date, local_time or "")
+    return result
+
+
+def cache_info() -> dict:
+    return {f.__name__: f.cache_info()._asdict()
+            for f in (_parse, _parse_southaustralia, _parse_ticketmaster)}
@@ -1,28 +1,17 @@
 import os
-import requests
-from dotenv import load_dotenv
 
-load_dotenv()
-
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-
-
-def geocode_google(address: str | None) -> dict:
-    if not address or not GOOGLE_API_KEY:
-        return {"lat": None, "lng": None}
-    try:
-        resp = requests.get(
-            "https://maps.googleapis.com/maps/api/geocode/json",
-            params={"address": address, "key": GOOGLE_API_KEY},
-            timeout=10,
-        )
-        resp.raise_for_status()
-        data = resp.json()
-        if data.get("results"):
-            loc = data["results"][0]["geometry"]["location"]
-            return {"lat": loc.get("lat"), "lng": loc.get("lng")}
-    except Exception:
-        pass
-    return {"lat": None, "lng": None}
+# The geocoder lives with the API service (deployed on its own from api/) in
+# the `geo` package, which requirements.txt installs from ../api.
+from geo.geocoding import (
+    Geocoder,
+    GeocodeCache,
+    build_geocoder,
+    normalize_address,
+)
 
+DATA_DIR = os.path.join(os.path.dirname(
+    os.path.dirname(__file__)), "scrapers", "data")
+CACHE_PATH = os.getenv("GEOCODE_CACHE_PATH") or os.path.join(
+    DATA_DIR, "geocode_cache.sqlite3")
 
+__all__ = ["CACHE_PATH", "Geocoder", "GeocodeCache", "build_geocoder", "normalize_address"]
@@ -0,0 +1,48 @@
+"""
+Inspect and prune the on-disk geocode cache. Run from backend/:
+
+    python -m utils.geocode_cache stats
+"""
+import time
+import argparse
+
+from utils.geocode import CACHE_PATH, GeocodeCache
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Inspect and prune the on-disk geocode cache")
+    parser.add_argument("--path", default=CACHE_PATH,
+                        help=f"Cache file (default: {CACHE_PATH})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="Show entry counts")
+    ls = sub.add_parser("list", help="List cached entries, newest first")
+    ls.add_argument("--limit", type=int, default=50)
+    ls.add_argument("--negative", action="store_true",
+                    help="Only show failed lookups")
+    prune = sub.add_parser("prune", help="Remove expired entries")
+    prune.add_argument("--all", action="store_true",
+                       help="Remove every entry, not just expired ones")
+    args = parser.parse_args()
+
+    cache = GeocodeCache(args.path)
+    if args.command == "stats":
+        s = cache.stats()
+        print(f"{args.path}")
+        print(f"  entries:  {s['total']}")
+        print(f"  positive: {s['positive']}")
+        print(f"  negative: {s['negative']}")
+        print(f"  expired:  {s['expired']}")
+    elif args.command == "list":
+        now = time.time()
+        for provider, address, lat, lng, _, expires_at in cache.entries(args.limit, args.negative):
+            coords = f"{lat:.4f}, {lng:.4f}" if lat is not None and lng is not None else "(no result)"
+            days = (expires_at - now) / 86400
+            print(f"[{provider}] {address[:60]:<60} {coords:<22} expires in {days:.1f}d")
+    elif args.command == "prune":
+        removed = cache.prune(expired_only=not args.all)
+        print(f"Removed {removed} entries")
+
+
+if __name__ == "__main__":
+    main()
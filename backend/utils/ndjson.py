@@ -0,0 +1,52 @@
+"""
+Newline-delimited JSON checkpoints: one record per line, written as records
+arrive and read back one at a time, so no stage needs the whole file in memory.
+"""
+import json
+import os
+
+
+def read_ndjson(path: str):
+    """Yield the records of an NDJSON file; a torn last line (from a killed writer) is skipped."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def read_records(path: str) -> list:
+    """Records from a .json array or an .ndjson file."""
+    if path.endswith(".ndjson"):
+        return list(read_ndjson(path))
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class NdjsonWriter:
+    """
+    Appends records to `<path>.tmp` and only replaces `path` on commit(), so a
+    run that fails part way leaves the previous checkpoint in place.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(f"{path}.tmp", "w", encoding="utf-8")
+
+    def write(self, record) -> None:
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.count += 1
+
+    def commit(self) -> None:
+        self._file.close()
+        os.replace(f"{self.path}.tmp", self.path)
+
+    def abort(self) -> None:
+        self._file.close()
+        os.remove(f"{self.path}.tmp")